@@ -0,0 +1,96 @@
+import glob
+from pathlib import Path
+
+from recipe import Recipe
+from cookbook import Cookbook
+from table import IngredientTable
+
+class Source:
+    """A recipe file, a cookbook or a glob of recipe files, with the factor its recipes are scaled by"""
+    __slots__ = ("spec", "path", "key", "factor")
+
+    def __init__(self, spec:str, path:Path, key:str=None, factor:float=1):
+        self.spec = spec
+        self.path = path
+        #one recipe of a cookbook, None for all of them
+        self.key = key
+        self.factor = factor
+
+    @classmethod
+    def parse(cls, spec:str, cwd:Path):
+        """Parses `path[@factor]`, where path can be a glob, a cookbook, or `book.jsonl:key`.
+        Raises ValueError for a bad factor."""
+        path, factor = spec, 1.0
+        if "@" in spec:
+            path, factor_str = spec.rsplit("@", 1)
+            factor = float(factor_str)
+        key = None
+        if ":" in path:
+            book, book_key = path.rsplit(":", 1)
+            if Cookbook.is_cookbook(book):
+                path, key = book, book_key
+        return cls(spec, cwd/path, key, factor)
+
+    def iter_recipes(self):
+        """Generator, yields the source's recipes. Raises OSError or ValueError for unreadable ones."""
+        if Cookbook.is_cookbook(self.path):
+            book = Cookbook(self.path)
+            try:
+                if self.key is not None:
+                    my_recipe = book.get(self.key)
+                    if my_recipe is None:
+                        raise ValueError(f"no recipe {self.key} in {self.path.name}")
+                    yield my_recipe
+                else:
+                    for _, my_recipe in book.items():
+                        yield my_recipe
+            finally:
+                book.close()
+            return
+        if glob.has_magic(str(self.path)):
+            paths = sorted(glob.glob(str(self.path)))
+            if not paths:
+                raise ValueError(f"nothing matches {self.spec}")
+        elif self.path.is_file():
+            paths = [self.path]
+        else:
+            raise FileNotFoundError(f"no recipe file {self.spec}")
+        for path in paths:
+            #only the ingredients section gets decoded
+            yield Recipe(Path(path), lazy=True)
+
+def read_specs(path:Path):
+    """Returns the specs listed in a menu file, one per line, # for comments"""
+    specs = []
+    with open(path, "r") as infile:
+        for line in infile:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                specs.append(line)
+    return specs
+
+def aggregate(sources:list):
+    """Totals the ingredients of every recipe of the sources, scaled by their factors,
+    in ml and gram where the unit converts. The recipes go into one IngredientTable,
+    so scaling and conversion each run once, batched over every row.
+    Returns (totals as name:{unit:amount}, recipe count, list of (spec, error)).
+    """
+    table = IngredientTable()
+    factors = []
+    errors = []
+    for source in sources:
+        try:
+            for my_recipe in source.iter_recipes():
+                try:
+                    ingredients = my_recipe.ingredients
+                except (ValueError, KeyError, TypeError) as e:
+                    #one broken file of a glob
+                    errors.append((str(my_recipe.my_filepath), f"{type(e).__name__}: {e}"))
+                    continue
+                table.append_ingredients(ingredients)
+                factors.append(source.factor)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            errors.append((source.spec, f"{type(e).__name__}: {e}"))
+    table.scale_recipes(factors)
+    table.to_metric()
+    return table.totals(), len(factors), errors
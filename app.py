@@ -1,6 +1,28 @@
 import sys
+import time
 import pathlib
-from frontend import Frontend
+
+#for --startup-report
+STARTED = time.perf_counter()
+
+def pop_option(args:list, flag:str, default=None):
+    """Removes `flag value` from args and returns value, or default if the flag is absent"""
+    if flag in args:
+        i = args.index(flag)
+        if i + 1 < len(args):
+            value = args[i+1]
+            del args[i:i+2]
+            return value
+        del args[i]
+    return default
+
+def end_startup_report(report, phase:str):
+    """Ends the startup report, if there is one, with a last phase and prints it.
+    For the modes that hand over to a loop of their own rather than run a script."""
+    if report is not None:
+        report.phase(phase)
+        report.uninstall()
+        report.print_report()
 
 def main():
     """
@@ -20,18 +42,110 @@ def main():
         bless = False
         args.remove("-b")
 
+    stats_path = pop_option(args, "--stats")
+    if stats_path is not None:
+        #app.py --stats out.json|out.prom [usual arguments], writes the stats when the program exits
+        import atexit
+        from stats import STATS
+        atexit.register(STATS.dump, stats_path)
+
+    report = None
+    if ("--startup-report" in args):
+        #app.py --startup-report [usual arguments], prints phase and import timings to stderr
+        from startup import StartupReport
+        args.remove("--startup-report")
+        report = StartupReport(STARTED)
+        report.install()
+        report.phase("interpreter and app.py")
+
+    if ("--measure-memory" in args):
+        #app.py --measure-memory PATH [-n N]
+        from measure import print_memory_report
+        end_startup_report(report, "import measure")
+        count = int(pop_option(args, "-n", 1000))
+        root = pop_option(args, "--measure-memory", ".")
+        print_memory_report(pathlib.Path(root), count)
+        return
+
+    if ("--daemon" in args):
+        #app.py --daemon [--socket PATH]
+        from daemon import daemon_main
+        end_startup_report(report, "import daemon")
+        args.remove("--daemon")
+        daemon_main(pop_option(args, "--socket"))
+        return
+
+    if ("--client" in args):
+        #app.py --client [--socket PATH] [--session NAME] [command...], commands from stdin if none
+        from client import client_main
+        end_startup_report(report, "import client")
+        args.remove("--client")
+        socket_path = pop_option(args, "--socket")
+        session = pop_option(args, "--session")
+        sys.exit(client_main(args, socket_path, session))
+
+    if ("--batch" in args):
+        #app.py --batch scripts/*.txt -j N [--report out.json] [-v]
+        import glob
+        from batch import batch_main
+        end_startup_report(report, "import batch")
+        args.remove("--batch")
+        jobs = pop_option(args, "-j")
+        if jobs is not None:
+            try:
+                jobs = int(jobs)
+            except ValueError:
+                jobs = 0
+            if jobs < 1:
+                print("usage: app.py --batch scripts... [-j workers] [--report out.json] [-v], "
+                    "workers is a positive whole number", file=sys.stderr)
+                sys.exit(2)
+        report_path = pop_option(args, "--report")
+        verbose = "-v" in args
+        if verbose:
+            args.remove("-v")
+        scripts = []
+        for arg in args:
+            #shells without globbing pass the pattern through
+            matches = sorted(glob.glob(arg)) if glob.has_magic(arg) else [arg]
+            scripts.extend(matches)
+        sys.exit(batch_main(scripts, jobs, report_path, verbose))
+
+    #imported here, so the client and the other modes don't pay for it
+    from frontend import Frontend
+    if report is not None:
+        report.phase("import frontend")
     my_frontend = Frontend()
-    my_frontend.init_settings()
+    #colors are only loaded when first printed
     my_frontend.init_terminal(bless)
+    script_path = pathlib.Path(args[0]) if len(args) > 0 else None
+    if script_path is None or script_path.exists():
+        #one-shot commands skip the settings file
+        my_frontend.init_settings()
+    if report is not None:
+        report.phase("frontend")
 
-    if len(args) > 0:
-        script_path = pathlib.Path(args[0])
-        if script_path.exists():
-            my_frontend.script_mode(script_path)
+    try:
+        if script_path is None:
+            if report is not None:
+                report.uninstall()
+                report.print_report()
+                report = None
+            my_frontend.console_mode()
+        elif script_path.exists():
+            from plan import PlanError
+            try:
+                my_frontend.script_mode(script_path)
+            except PlanError as e:
+                print(e, file=sys.stderr)
+                sys.exit(1)
         else: 
             my_frontend.interpret_command(" ".join(args))
-    else:
-        my_frontend.console_mode()
+    finally:
+        if report is not None:
+            report.phase("command" if script_path is None or not script_path.exists() else "script")
+            report.uninstall()
+            report.print_report()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
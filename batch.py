@@ -0,0 +1,115 @@
+import io
+import os
+import sys
+import json
+import time
+import traceback
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from frontend import Frontend
+from stats import STATS
+
+class ScriptResult:
+    """Outcome of running one rcpscript file in a batch"""
+    script:str
+    status:int
+    written:list
+    seconds:float
+    error:str
+    output:str
+    #the worker's Stats.get_dict for this script, merged into the parent's stats
+    stats:dict
+
+    def __init__(self, script:str, status:int=0, written=None, seconds:float=0.0, error:str=None, output:str="", stats:dict=None):
+        self.script = script
+        self.status = status
+        self.written = [] if written is None else written
+        self.seconds = seconds
+        self.error = error
+        self.output = output
+        self.stats = stats
+
+    def get_dict(self):
+        return {
+            "script": self.script,
+            "status": self.status,
+            "written": self.written,
+            "seconds": self.seconds,
+            "error": self.error
+        }
+
+def run_script(script:str, cwd:str):
+    """Runs a script with a fresh Frontend rooted at cwd, capturing its output.
+    Meant to be called inside a worker process.
+    """
+    result = ScriptResult(script)
+    #workers run several scripts, count each one on its own
+    STATS.reset()
+    start = time.perf_counter()
+    buffer = io.StringIO()
+    my_frontend = Frontend(cwd)
+    my_frontend.interactive = False
+    try:
+        with redirect_stdout(buffer):
+            my_frontend.init_terminal(False)
+            my_frontend.script_mode(Path(cwd)/script)
+    except Exception as e:
+        result.status = 1
+        result.error = f"{type(e).__name__}: {e}"
+        buffer.write(traceback.format_exc())
+    result.written = [str(path) for path in my_frontend.saved_paths]
+    result.seconds = time.perf_counter() - start
+    result.output = buffer.getvalue()
+    result.stats = STATS.get_dict()
+    return result
+
+def run_batch(scripts:list, jobs:int=None, cwd:Path=None, verbose:bool=False):
+    """Fans the scripts out over a process pool.
+    Results are printed as they complete and returned in the order of `scripts`.
+    """
+    cwd = str(Path(os.getcwd()) if cwd is None else cwd)
+    results = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(run_script, script, cwd): script for script in scripts}
+        for future in as_completed(futures):
+            script = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                #the worker itself died, not just the script
+                result = ScriptResult(script, 1, error=f"{type(e).__name__}: {e}")
+            results[script] = result
+            if result.stats is not None:
+                STATS.merge(result.stats)
+            state = "ok" if result.status == 0 else "FAILED"
+            print(f"  {state} - {script} ({result.seconds:.3f}s, {len(result.written)} written)")
+            if result.error is not None:
+                print(f"\t{result.error}")
+            if verbose and result.output:
+                print(result.output, end="" if result.output.endswith("\n") else "\n")
+    return [results[script] for script in scripts]
+
+def print_summary(results:list, wall:float):
+    failed = sum(1 for result in results if result.status != 0)
+    written = sum(len(result.written) for result in results)
+    busy = sum(result.seconds for result in results)
+    print(f"{len(results)} script(s), {failed} failed, {written} recipe(s) written.")
+    print(f"wall time {wall:.3f}s, script time {busy:.3f}s")
+
+def write_report(results:list, report_path:Path):
+    with open(report_path, "w") as outfile:
+        json.dump([result.get_dict() for result in results], outfile, indent=4)
+
+def batch_main(scripts:list, jobs:int=None, report_path:Path=None, verbose:bool=False):
+    """Entry point for `app.py --batch`. Returns the process exit status."""
+    if len(scripts) == 0:
+        print("No scripts given.", file=sys.stderr)
+        return 2
+    start = time.perf_counter()
+    results = run_batch(scripts, jobs, verbose=verbose)
+    print_summary(results, time.perf_counter() - start)
+    if report_path is not None:
+        write_report(results, report_path)
+    return 0 if all(result.status == 0 for result in results) else 1
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Deterministic synthetic recipe corpora for the benchmarks.
+
+usage: python bench/corpus.py OUTDIR [-n recipes] [--seed N]
+
+Recipes are written 1000 to a directory (OUTDIR/0000/r0000000.json, ...),
+so corpora of a million recipes stay listable. The same count and seed
+always give the same files.
+"""
+import sys
+import json
+import random
+from pathlib import Path
+
+#the benchmarks run from the repository root or from bench/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from units import VOLUME_CONV, MASS_CONV
+
+PER_DIR = 1000
+
+INGREDIENTS = ("flour", "sugar", "salt", "butter", "water", "milk", "yeast", "egg", "canola oil",
+    "olive oil", "baking soda", "baking powder", "vanilla extract", "cinnamon", "honey", "rice",
+    "onion", "garlic", "tomato", "chicken stock", "lemon juice", "parsley", "black pepper", "cream")
+#units a recipe can use, "" for counted ingredients like eggs
+UNITS = tuple(VOLUME_CONV) + tuple(MASS_CONV) + ("", "pinch", "clove")
+WORDS = ("stir", "mix", "bake", "whisk", "fold", "pour", "knead", "rest", "chop", "slice", "simmer",
+    "the", "a", "into", "until", "smooth", "golden", "minutes", "bowl", "pan", "oven", "gently", "well")
+
+def make_recipe(rng:random.Random, number:int, ingredients:tuple=(3, 20), steps:tuple=(2, 15)):
+    """Returns one recipe as the dict Recipe.get_dict returns"""
+    names = rng.sample(INGREDIENTS, min(rng.randint(*ingredients), len(INGREDIENTS)))
+    my_dict = {
+        "title": f"Recipe {number} {rng.choice(WORDS).title()}",
+        "ingredients": {name: [round(rng.uniform(0.1, 500), 3), rng.choice(UNITS)] for name in names},
+        "steps": [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 30))).capitalize() + "."
+            for _ in range(rng.randint(*steps))],
+        "metadata": {"author": f"Author {rng.randint(1, 500)}", "serves": rng.randint(1, 12)}
+    }
+    if rng.random() < 0.5:
+        my_dict["metadata"]["srcurl"] = f"https://example.com/recipes/{number}"
+    return my_dict
+
+def recipe_path(root:Path, number:int):
+    return root/f"{number // PER_DIR:04d}"/f"r{number:07d}.json"
+
+def generate(root:Path, count:int=1000, seed:int=0):
+    """Writes count recipes under root. Returns their paths."""
+    rng = random.Random(seed)
+    paths = []
+    for number in range(count):
+        path = recipe_path(root, number)
+        if number % PER_DIR == 0:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as outfile:
+            json.dump(make_recipe(rng, number), outfile, indent=4)
+        paths.append(path)
+    return paths
+
+def main():
+    args = sys.argv[1:]
+    count = 1000
+    seed = 0
+    if "-n" in args:
+        i = args.index("-n")
+        count = int(args[i+1])
+        del args[i:i+2]
+    if "--seed" in args:
+        i = args.index("--seed")
+        seed = int(args[i+1])
+        del args[i:i+2]
+    if len(args) != 1:
+        print(__doc__)
+        sys.exit(2)
+    generate(Path(args[0]), count, seed)
+    print(f"{count} recipes written to {args[0]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Tokenizing and dispatch throughput of script commands.
+
+usage: python bench/dispatch.py [script] [-n repeats]
+
+The script's recipe mode commands (everything but open, save and close)
+are repeated n times into one large script and run against one open recipe,
+through the legacy tokenizer and if/elif dispatch and through the current ones.
+"""
+import io
+import sys
+import contextlib
+import tempfile
+from pathlib import Path
+
+#the benchmarks run from the repository root or from bench/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from frontend import Frontend
+from recipe import Recipe
+from formats import best_of
+
+def legacy_tokenizer(line:str):
+    """The character at a time tokenizer commands.tokenize replaced, for reference"""
+    WHITESPACE=0
+    TOKEN=1
+    DQUOTE=2
+    SQUOTE=3
+    state = WHITESPACE
+    reg0 = 0
+    for i in range(len(line)):
+        char = line[i]
+        if state == WHITESPACE:
+            if char == "\"":
+                state = DQUOTE
+                reg0 = i+1
+            elif char == "'":
+                state = SQUOTE
+                reg0 = i+1
+            elif not char.isspace():
+                state = TOKEN
+                reg0 = i
+        elif state == TOKEN:
+            if char.isspace():
+                state = WHITESPACE
+                yield line[reg0:i]
+                reg0=i+1
+        elif state == SQUOTE:
+            if char == "'":
+                state = WHITESPACE
+                yield line[reg0:i]
+                reg0 = i+1
+        elif state == DQUOTE:
+            if char == '"':
+                state = WHITESPACE
+                yield line[reg0:i]
+                reg0 = i+1
+    yield line[reg0:]
+    yield None
+
+def legacy_dispatch(frontend:Frontend, cmd:str):
+    """The if/elif recipe mode dispatch the command registry replaced, for reference.
+    Tokenizes with legacy_tokenizer and calls the same Recipe methods as the registry,
+    so the difference is tokenizing and dispatch. open, save and close are left out,
+    as the benchmark scripts don't have them."""
+    COLORS = frontend.COLORS
+    if cmd.strip() == "":
+        return True
+    my_recipe = frontend.my_recipe
+    tokens = legacy_tokenizer(cmd)
+    root = next(tokens)
+    if root == "help":
+        arg = next(tokens)
+        RCP_COMMANDS = {"help": "prints all available commands", "display": "prints the whole recipe as a Markdown",
+            "get": "get some information about the recipe", "add": "add information to the recipe",
+            "set": "changes recipe information", "remove": "removes a step",
+            "metric": "converts a recipe's ingredients to metric", "scale": "scales ingredients by a factor"}
+        if arg in RCP_COMMANDS:
+            print(f"\t{arg}\t{RCP_COMMANDS[arg]}")
+        else:
+            for cmd_name, helptxt in RCP_COMMANDS.items():
+                print(f"\t{cmd_name}\t{helptxt}")
+    elif root == "display":
+        print(str(my_recipe))
+    elif root == "get":
+        what = next(tokens)
+        if what == "metadata":
+            key = next(tokens)
+            print(f"{key} = {my_recipe.cli_get_metadata(key)}")
+        elif what == "title":
+            print(f"{my_recipe.title}")
+        elif what == "step":
+            for number, step in enumerate(my_recipe.steps):
+                print(f"Step {number+1}. {step}")
+        else:
+            print(f"{COLORS['WARN']} invalid get argument.")
+            RECIPE_GET_DICT = {"title": "get title of the recipe.", "metadata": "get metadata by key.",
+                "units": "get supported convertible units"}
+            for get_cmd, help_txt in RECIPE_GET_DICT.items():
+                print(f"{COLORS['ACCENT']}{get_cmd}\t{COLORS['NORM']}{help_txt}")
+    elif root == "add":
+        what = next(tokens)
+        if what == "step":
+            my_step = " ".join(list(tokens)[:-1])
+            i = len(my_recipe.steps) + 1
+            print(f"{COLORS['ACCENT']}Added: {COLORS['NORM']} Step {i}. {my_step}")
+            my_recipe.cli_add_step(my_step)
+        elif what == "ingredient":
+            ingr = next(tokens)
+            amount = float(next(tokens))
+            unit = next(tokens)
+            my_recipe.cli_add_ingredient(ingr, amount, unit)
+        elif what == "metadata":
+            key = next(tokens)
+            val = next(tokens)
+            if key is not None and val is not None:
+                my_recipe.cli_custom_metadata(key, val)
+        else:
+            print(f"{COLORS['WARN']} invalid add argument.")
+            RECIPE_ADD_DICT = {"metadata": "add or set metadata by key and value.", "step": "add a step to the recipe.",
+                "ingredient": "add an ingredient."}
+            for add_cmd, help_txt in RECIPE_ADD_DICT.items():
+                print(f"{COLORS['ACCENT']}{add_cmd}\t{COLORS['NORM']}{help_txt}")
+    elif root == "set":
+        what = next(tokens)
+        if what == "title":
+            my_recipe.cli_set_title(next(tokens))
+        elif what == "author":
+            my_recipe.cli_set_author(next(tokens))
+        elif what == "serves":
+            my_recipe.cli_set_serves(int(next(tokens)))
+        elif what == "srcurl":
+            my_recipe.cli_set_srcurl(next(tokens))
+        elif what == "metadata":
+            key = next(tokens)
+            val = next(tokens)
+            if key is not None and val is not None:
+                my_recipe.cli_custom_metadata(key, val)
+        else:
+            print(f"{COLORS['WARN']} invalid set argument.")
+            RECIPE_SET_DICT = {"title": "set title of the recipe.", "author": "set the author of the recipe.",
+                "serves": "number of people served by the recipe.", "srcurl": "the source url of the recipe.",
+                "metadata": "custom metadata."}
+            for set_cmd, help_txt in RECIPE_SET_DICT.items():
+                print(f"{COLORS['ACCENT']}{set_cmd}\t{COLORS['NORM']}{help_txt}")
+    elif root == "remove":
+        what = next(tokens)
+        if what == "metadata":
+            my_recipe.cli_remove_metadata(next(tokens))
+        elif what == "step":
+            try:
+                my_recipe.cli_remove_step(int(next(tokens)) - 1)
+            except (IndexError, ValueError):
+                print(f"{COLORS['WARN']} Invalid index. There are {len(my_recipe.steps)} steps in the recipe.")
+            except TypeError:
+                my_recipe.cli_remove_step()
+        elif what == "ingredient":
+            if my_recipe.cli_remove_ingredient(next(tokens)) == False:
+                print("No matching ingredient found!")
+        else:
+            print(f"{COLORS['WARN']} invalid remove argument.")
+    elif root == "metric":
+        my_recipe.cli_to_metric(next(tokens))
+    elif root == "scale":
+        my_recipe.cli_scale(float(next(tokens)))
+    else:
+        print(f"{COLORS['WARN']}Command {root} not recognized.")
+    return True
+
+def script_lines(script:Path, repeats:int):
+    lines = []
+    with open(script, "r") as infile:
+        for line in infile:
+            words = line.split()
+            if words and words[0] not in ("open", "save", "close"):
+                lines.append(line)
+    return lines*repeats
+
+def bench_tokenizers(lines:list):
+    """Returns a dict of tokenizer:lines/s"""
+    frontend = Frontend()
+    def legacy():
+        for line in lines:
+            list(legacy_tokenizer(line))
+    def current():
+        for line in lines:
+            list(frontend.tokenizer(line))
+    return {"legacy": len(lines)/best_of(legacy), "current": len(lines)/best_of(current)}
+
+def bench_dispatch(lines:list):
+    """Returns a dict of dispatcher:commands/s, legacy_dispatch and interpret_command, printing discarded"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        frontend = Frontend(tmp_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            frontend.interpret_command("open bench.json")
+        def timed(dispatch):
+            def run():
+                #a fresh recipe each run, so growing step lists don't skew the later runs
+                frontend.my_recipe = Recipe()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for line in lines:
+                        dispatch(line)
+            return len(lines)/best_of(run)
+        return {"legacy": timed(lambda line: legacy_dispatch(frontend, line)),
+            "current": timed(frontend.interpret_command)}
+
+def main():
+    args = sys.argv[1:]
+    repeats = 200
+    if "-n" in args:
+        i = args.index("-n")
+        repeats = int(args[i+1])
+        del args[i:i+2]
+    script = Path(args[0]) if args else Path(__file__).resolve().parent.parent/"rcpscript.txt"
+    lines = script_lines(script, repeats)
+    tokenizers = bench_tokenizers(lines)
+    print(f"{len(lines)} command lines")
+    print(f"tokenize  legacy {tokenizers['legacy']:10.0f} lines/s  current {tokenizers['current']:10.0f} lines/s  \
+x{tokenizers['current']/tokenizers['legacy']:.2f}")
+    dispatch = bench_dispatch(lines)
+    print(f"dispatch  legacy {dispatch['legacy']:10.0f} cmds/s   current {dispatch['current']:10.0f} cmds/s   \
+x{dispatch['current']/dispatch['legacy']:.2f}")
+
+if __name__ == "__main__":
+    main()
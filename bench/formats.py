@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Load/save throughput of the JSON and binary recipe formats.
+
+usage: python bench/formats.py [recipe file] [-n iterations]
+"""
+import sys
+import json
+import time
+import tempfile
+from pathlib import Path
+
+#the benchmarks run from the repository root or from bench/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from recipe import Recipe
+import rcpbin
+
+def best_of(func, repeat:int=5):
+    """Returns the fastest of several timed runs, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return best
+
+def bench_codecs(my_recipe:Recipe, iterations:int=2000):
+    """In-memory encode/decode, without the filesystem.
+    Returns a dict of format:{"encode": recipes/s, "decode": recipes/s}"""
+    json_text = json.dumps(my_recipe.get_dict(), indent=4)
+    bin_data = rcpbin.dumps(my_recipe)
+    def json_encode():
+        for _ in range(iterations):
+            json.dumps(my_recipe.get_dict(), indent=4)
+    def json_decode():
+        for _ in range(iterations):
+            Recipe().load_dict(json.loads(json_text))
+    def bin_encode():
+        for _ in range(iterations):
+            rcpbin.dumps(my_recipe)
+    def bin_decode():
+        for _ in range(iterations):
+            rcpbin.loads(bin_data)
+    return {
+        "json": {"encode": iterations/best_of(json_encode), "decode": iterations/best_of(json_decode)},
+        "binary": {"encode": iterations/best_of(bin_encode), "decode": iterations/best_of(bin_decode)}
+    }
+
+def bench_formats(src:Path, iterations:int=2000):
+    """Returns a dict of format:{"load": recipes/s, "save": recipes/s, "bytes": file size}"""
+    my_recipe = Recipe(src)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, suffix in (("json", ".json"), ("binary", rcpbin.SUFFIX)):
+            path = Path(tmp_dir)/("recipe" + suffix)
+            my_recipe.write_file(path)
+            def save():
+                for _ in range(iterations):
+                    my_recipe.write_file(path)
+            def load():
+                for _ in range(iterations):
+                    Recipe().read_file(path)
+            results[name] = {
+                "save": iterations/best_of(save),
+                "load": iterations/best_of(load),
+                "bytes": path.stat().st_size
+            }
+    return results
+
+def main():
+    args = sys.argv[1:]
+    iterations = 2000
+    if "-n" in args:
+        i = args.index("-n")
+        iterations = int(args[i+1])
+        del args[i:i+2]
+    src = Path(args[0]) if args else Path(__file__).resolve().parent.parent/"bread.json"
+    results = bench_formats(src, iterations)
+    codecs = bench_codecs(Recipe(src), iterations)
+    for name, result in results.items():
+        print(f"{name:8}load {result['load']:10.0f}/s  save {result['save']:10.0f}/s  {result['bytes']} bytes")
+        print(f"{'':8}decode {codecs[name]['decode']:8.0f}/s  encode {codecs[name]['encode']:8.0f}/s  (in memory)")
+    json_result = results["json"]
+    bin_result = results["binary"]
+    print(f"binary speedup: load x{bin_result['load']/json_result['load']:.2f}, save x{bin_result['save']/json_result['save']:.2f}")
+    print(f"in memory: decode x{codecs['binary']['decode']/codecs['json']['decode']:.2f}, \
+encode x{codecs['binary']['encode']/codecs['json']['encode']:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Benchmark suite over a synthetic corpus, with regression checks against a baseline.
+
+usage: python bench/suite.py [-n recipes] [--seed N] [--corpus DIR] [--sample K]
+                             [-o results.json] [--compare baseline.json] [--threshold 0.1]
+
+Without --corpus, a corpus of n recipes (default 1000) is generated by corpus.py
+into a temporary directory. Per-recipe benchmarks run over the first K recipes
+(default 1000), so big corpora mainly cost generation time.
+Results are written as JSON with -o. With --compare, every benchmark slower
+than the baseline by more than the threshold (a fraction) is reported, and the
+exit status is 1 if there is any.
+"""
+import io
+import sys
+import json
+import platform
+import contextlib
+import tempfile
+from pathlib import Path
+
+#the benchmarks run from the repository root or from bench/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from recipe import Recipe
+from frontend import Frontend
+from formats import best_of
+from corpus import generate, recipe_path
+
+#how many recipes each end to end script opens, scales, converts and saves
+SCRIPT_RECIPES = 200
+
+def corpus_paths(root:Path, count:int):
+    """The first count recipes of a corpus, in order"""
+    paths = []
+    for number in range(count):
+        path = recipe_path(root, number)
+        if not path.exists():
+            break
+        paths.append(path)
+    return paths
+
+def make_script(paths:list):
+    """Returns the lines of a script editing every recipe of paths, saving the results under out/"""
+    lines = []
+    for number, path in enumerate(paths):
+        lines.append(f"open \"{path}\"\n")
+        lines.append("get title\n")
+        lines.append("scale 2\n")
+        lines.append("metric\n")
+        lines.append(f"add step \"Serve {number} warm\"\n")
+        lines.append(f"save out/{number}.json\n")
+        lines.append("close\n")
+    return lines
+
+def bench_recipes(paths:list, out_dir:Path):
+    """Returns a dict of benchmark:(rate, unit) for the recipe methods"""
+    recipes = [Recipe(path) for path in paths]
+    amounts = [amt for my_recipe in recipes for amt in my_recipe.stored_ingredients.values()]
+    out_paths = [out_dir/f"{number}.json" for number in range(len(recipes))]
+    def read_json():
+        for path in paths:
+            Recipe().read_json(path)
+    def write_json():
+        for my_recipe, path in zip(recipes, out_paths):
+            my_recipe.write_json(path)
+    def to_str():
+        #dropping the cached Markdown, so every recipe is rendered
+        for my_recipe in recipes:
+            my_recipe._rendered = None
+            str(my_recipe)
+    def to_str_cached():
+        for my_recipe in recipes:
+            str(my_recipe)
+    def scale_ingredients():
+        #the view is lazy, so reading the scaled amounts is part of scaling
+        for my_recipe in recipes:
+            my_recipe.scale_ingredients(2)
+            my_recipe.ingredients
+            my_recipe.clear_view()
+    def convert_amount():
+        for amt in amounts:
+            amt.convert_amount("ml")
+    return {
+        "read_json": (len(paths)/best_of(read_json), "recipes/s"),
+        "write_json": (len(recipes)/best_of(write_json), "recipes/s"),
+        "__str__": (len(recipes)/best_of(to_str), "recipes/s"),
+        "__str__ cached": (len(recipes)/best_of(to_str_cached), "recipes/s"),
+        "scale_ingredients": (len(recipes)/best_of(scale_ingredients), "recipes/s"),
+        "convert_amount": (len(amounts)/best_of(convert_amount), "amounts/s")
+    }
+
+def bench_script(paths:list, work_dir:Path):
+    """Returns a dict of benchmark:(rate, unit) for tokenizing and running a script.
+    The script, its plan cache and what it saves go in work_dir, the recipes are only read."""
+    lines = make_script(paths)
+    frontend = Frontend(work_dir)
+    def tokenizer():
+        for line in lines:
+            list(frontend.tokenizer(line))
+    results = {"tokenizer": (len(lines)/best_of(tokenizer), "lines/s")}
+    (work_dir/"out").mkdir(exist_ok=True)
+    script = work_dir/"bench_script.txt"
+    with open(script, "w") as outfile:
+        outfile.writelines(lines)
+    def script_mode():
+        my_frontend = Frontend(work_dir)
+        my_frontend.interactive = False
+        with contextlib.redirect_stdout(io.StringIO()):
+            my_frontend.script_mode(script)
+    #the first run compiles and caches the plan, like any script run twice
+    results["script_mode"] = (len(lines)/best_of(script_mode), "commands/s")
+    return results
+
+def run_suite(root:Path, sample:int):
+    paths = corpus_paths(root, sample)
+    #nothing is written into the corpus, which may be the user's own with --corpus
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = bench_recipes(paths, Path(tmp_dir))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results.update(bench_script(paths[:SCRIPT_RECIPES], Path(tmp_dir)))
+    return {name: {"rate": rate, "unit": unit} for name, (rate, unit) in results.items()}
+
+def compare(results:dict, baseline:dict, threshold:float):
+    """Prints each benchmark against the baseline. Returns the names of the regressions."""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"{name:20}{result['rate']:12.0f} {result['unit']:12} (not in baseline)")
+            continue
+        ratio = result["rate"]/old["rate"]
+        flag = ""
+        if ratio < 1 - threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:20}{result['rate']:12.0f} {result['unit']:12} x{ratio:.2f}{flag}")
+    return regressions
+
+def main():
+    args = sys.argv[1:]
+    options = {"-n": "1000", "--seed": "0", "--corpus": None, "--sample": "1000",
+        "-o": None, "--compare": None, "--threshold": "0.1"}
+    for option in options:
+        if option in args:
+            i = args.index(option)
+            options[option] = args[i+1]
+            del args[i:i+2]
+    if args:
+        print(__doc__)
+        sys.exit(2)
+    count = int(options["-n"])
+    sample = int(options["--sample"])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if options["--corpus"] is None:
+            root = Path(tmp_dir)
+            generate(root, count, int(options["--seed"]))
+        else:
+            root = Path(options["--corpus"]).resolve()
+        results = run_suite(root, sample)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus": options["--corpus"] or {"recipes": count, "seed": int(options["--seed"])},
+            "sample": sample
+        },
+        "results": results
+    }
+    if options["-o"] is not None:
+        with open(options["-o"], "w") as outfile:
+            json.dump(report, outfile, indent=4)
+    regressions = []
+    if options["--compare"] is not None:
+        with open(options["--compare"], "r") as infile:
+            baseline = json.load(infile)["results"]
+        regressions = compare(results, baseline, float(options["--threshold"]))
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {float(options['--threshold']):.0%}: {', '.join(regressions)}")
+    else:
+        for name, result in results.items():
+            print(f"{name:20}{result['rate']:12.0f} {result['unit']}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+from recipe import Recipe
+from journal import Journal
+from locking import FileLock
+from index import scan_recipes
+
+#units convert_metric produces
+METRIC_UNITS = ("gram", "ml")
+
+#results of process_file
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "FAILED"
+
+#files per task
+CHUNK = 16
+#chunks in flight per worker in run_chunks, enough to keep the workers busy without reading ahead of them
+PENDING_PER_JOB = 4
+
+def is_metric(my_recipe:Recipe):
+    """True if no ingredient would change under convert_metric"""
+    for amt in my_recipe.ingredients.values():
+        if amt.is_convertible_unit() and amt.unit not in METRIC_UNITS:
+            return False
+    return True
+
+def atomic_write(my_recipe:Recipe, dest:Path):
+    """Writes the recipe through a temp file and rename, so readers never see a half written recipe.
+    Takes dest's lock, and drops a journal left next to dest, as it belongs to the file being replaced."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with FileLock(dest):
+        my_recipe.rewrite(dest)
+
+def atomic_copy(src:Path, dest:Path):
+    """Copies a recipe file through a temp file and rename. Call with dest's lock held."""
+    tmp_path = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    try:
+        shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dest)
+        Journal(dest).remove()
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def process_file(src:str, dest:str, action:str, factor:float=1):
+    """Converts or scales one recipe file. Runs in a worker process.
+    Returns a tuple (src, status, message)
+    Skipped files are left alone in place, and copied unchanged into a mirror tree.
+    """
+    src_path = Path(src)
+    dest_path = Path(dest)
+    try:
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        #in place, holding the lock from the read on keeps a save from landing in between and being lost
+        with FileLock(dest_path):
+            my_recipe = Recipe(src_path)
+            if action == "metric":
+                skip = is_metric(my_recipe)
+                if not skip:
+                    my_recipe.cli_to_metric()
+            else:
+                skip = factor == 1
+                if not skip:
+                    my_recipe.cli_scale(factor)
+            if skip:
+                if dest_path != src_path:
+                    if Journal(src_path).exists():
+                        #the copy has to include the journaled edits
+                        my_recipe.rewrite(dest_path)
+                    else:
+                        atomic_copy(src_path, dest_path)
+                return src, SKIPPED, None
+            #the whole file is replaced, so its journal, already applied above, goes too
+            my_recipe.rewrite(dest_path)
+        return src, DONE, None
+    except Exception as e:
+        return src, FAILED, f"{type(e).__name__}: {e}"
+
+def process_chunk(chunk:list, action:str, factor:float=1):
+    """Runs process_file on a chunk of (src, dest) jobs. Returns the list of their results."""
+    return [process_file(src, dest, action, factor) for src, dest in chunk]
+
+def iter_chunks(jobs, size:int):
+    """Generator, groups jobs into lists of size, the last one shorter"""
+    chunk = []
+    for job in jobs:
+        chunk.append(job)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def run_chunks(task, chunks, jobs:int=None, *args):
+    """Generator, runs task(chunk, *args) for every chunk across a process pool
+    and yields the results as they finish, in no particular order.
+    Only PENDING_PER_JOB chunks per worker are in flight at once, so chunks are
+    consumed as the workers need them and memory doesn't grow with their number.
+    One job runs the tasks in this process, in order.
+    Used by bulk, export and import.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs == 1:
+        for chunk in chunks:
+            yield task(chunk, *args)
+        return
+    max_pending = jobs * PENDING_PER_JOB
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = set()
+        for chunk in chunks:
+            pending.add(pool.submit(task, chunk, *args))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def iter_jobs(root:Path, out_root:Path=None):
+    """Generator, yields (src, dest) path strings for every recipe under root.
+    An out_root under root isn't scanned, it is being written to."""
+    if root.is_file():
+        dest = root if out_root is None else out_root/root.name
+        yield str(root), str(dest)
+        return
+    for rel, entry in scan_recipes(root, skip=out_root):
+        dest = entry.path if out_root is None else str(out_root/rel)
+        yield entry.path, dest
+
+def bulk_convert(root:Path, action:str, factor:float=1, out_root:Path=None, jobs:int=None, out=print):
+    """Streams every recipe under root through metric conversion or scaling
+    across a process pool. Only a bounded number of files is in flight at once.
+    Failures are reported and do not stop the run.
+    Returns a dict of counts by status and the list of (path, message) failures.
+    """
+    counts = {DONE: 0, SKIPPED: 0, FAILED: 0}
+    failures = []
+    seen = 0
+    chunks = iter_chunks(iter_jobs(root, out_root), CHUNK)
+    for results in run_chunks(process_chunk, chunks, jobs, action, factor):
+        for src, status, message in results:
+            seen += 1
+            counts[status] += 1
+            out(f"  [{seen}] {status} - {src}")
+            if message is not None:
+                out(f"\t{message}")
+                failures.append((src, message))
+    return counts, failures
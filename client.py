@@ -0,0 +1,37 @@
+import os
+import sys
+import json
+import socket
+
+#Thin client of daemon.py, see there for the protocol.
+#Kept to a few standard library imports, since it starts once per command.
+
+def default_socket_path():
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(runtime_dir, f"rcp-{os.getuid()}.sock")
+
+def client_main(commands:list, socket_path:str=None, session:str=None):
+    """Entry point for `app.py --client`. Sends the commands, or each line of stdin
+    if there are none, to a daemon and prints what they print.
+    Returns the process exit status.
+    """
+    socket_path = default_socket_path() if socket_path is None else socket_path
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError as e:
+        print(f"No daemon at {socket_path} ({e.strerror}). Start one with app.py --daemon", file=sys.stderr)
+        return 2
+    with client, client.makefile("rwb") as stream:
+        def send(message:dict):
+            stream.write((json.dumps(message) + "\n").encode("utf-8"))
+            stream.flush()
+            return json.loads(stream.readline())
+        send({"session": session, "cwd": os.getcwd()})
+        lines = [" ".join(commands)] if commands else sys.stdin
+        for line in lines:
+            reply = send({"cmd": line})
+            sys.stdout.write(reply["output"])
+            if not reply["goon"]:
+                break
+    return 0
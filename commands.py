@@ -0,0 +1,169 @@
+import re
+
+#one token: a double or single quoted string, in which a backslash escapes the quote or a backslash,
+#or a bare word, ended by the one whitespace character after it
+TOKEN = re.compile(r'''\s*(?:"((?:[^"\\]|\\.)*)"|'((?:[^'\\]|\\.)*)'|([^\s"']\S*)\s)''', re.S)
+ESCAPE = re.compile(r'''\\([\\"'])''')
+SPACE = re.compile(r"\s*")
+
+def tokenize(line:str):
+    """Splits a command line into tokens.
+    Returns (list of tokens, rest), rest being what follows the last token's delimiter:
+    the last word of a line without a trailing newline, an unterminated quote, or the trailing whitespace.
+    Commands that take a sentence (`add step`, `echo`) join the rest in as it is.
+    """
+    if '"' not in line and "'" not in line:
+        #no quotes, str.split finds the same words
+        tokens = line.split()
+        if len(tokens) == 0:
+            return tokens, line
+        end = len(line.rstrip())
+        if end == len(line):
+            #the last word has no whitespace after it to end it
+            return tokens, tokens.pop()
+        return tokens, line[end+1:]
+    tokens = []
+    append = tokens.append
+    pos = 0
+    for match in iter(TOKEN.scanner(line).match, None):
+        dquoted, squoted, word = match.groups()
+        if word is not None:
+            append(word)
+        else:
+            quoted = squoted if dquoted is None else dquoted
+            append(ESCAPE.sub(r"\1", quoted) if "\\" in quoted else quoted)
+        pos = match.end()
+    start = SPACE.match(line, pos).end()
+    if start == len(line):
+        return tokens, line[pos:]
+    if line[start] in "\"'":
+        return tokens, line[start+1:]
+    return tokens, line[start:]
+
+def words_of(tokens:list, rest:str):
+    """The tokens, and the rest if it isn't blank"""
+    return tokens + [rest] if rest.strip() != "" else tokens
+
+#parameter kinds besides str, int and float
+#   REST: every remaining token and the rest of the line, joined by spaces
+#   ARGS: the list of remaining non-blank tokens
+REST = "rest"
+ARGS = "args"
+
+class Param:
+    """One declared argument of a command"""
+    __slots__ = ("name", "kind", "required", "default")
+
+    def __init__(self, name:str, kind=str, required:bool=True, default=None):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.default = default
+
+    def __str__(self):
+        return self.name if self.required else f"[{self.name}]"
+
+class UsageError(Exception):
+    """A command was given too few arguments"""
+
+class Command:
+    """A handler and the arguments it takes"""
+    __slots__ = ("verb", "noun", "handler", "params", "help")
+
+    def __init__(self, verb:str, noun:str, handler, params:tuple, help:str):
+        self.verb = verb
+        self.noun = noun
+        self.handler = handler
+        self.params = params
+        self.help = help
+
+    @property
+    def name(self):
+        """The command words, `add step`"""
+        return self.verb if self.noun is None else f"{self.verb} {self.noun}"
+
+    def usage(self):
+        words = [self.verb] if self.noun is None else [self.verb, self.noun]
+        words.extend(str(param) for param in self.params)
+        return " ".join(words)
+
+    def parse(self, tokens:list, rest:str, start:int):
+        """Converts what follows the command words into the handler's arguments.
+        Raises UsageError for missing arguments, ValueError for non-numeric numbers.
+        """
+        values = words_of(tokens, rest)[start:]
+        args = []
+        for i, param in enumerate(self.params):
+            kind = param.kind
+            if kind is REST:
+                if i >= len(values) and param.required:
+                    raise UsageError(self.usage())
+                #joined as typed, the blank rest of a script line included
+                first = start + i
+                args.append(" ".join(tokens[first:] + [rest]) if first <= len(tokens) else "")
+                break
+            if kind is ARGS:
+                args.append([val for val in values[i:] if val.strip() != ""])
+                break
+            if i >= len(values):
+                if param.required:
+                    raise UsageError(self.usage())
+                args.append(param.default)
+            else:
+                args.append(values[i] if kind is str else kind(values[i]))
+        return args
+
+class CommandRegistry:
+    """Table of commands, looked up by verb, or by verb and noun (`add step`)"""
+
+    def __init__(self):
+        #K:V = verb or (verb, noun):Command
+        self.commands = {}
+        #K:V = verb:help, in registration order
+        self.verbs = {}
+        #K:V = verb:list of its noun Commands
+        self.nouns = {}
+
+    def command(self, verb:str, noun:str=None, params:tuple=(), help:str="", aliases:tuple=()):
+        """Decorator registering a handler, called as handler(owner, *args)"""
+        def register(handler):
+            cmd = Command(verb, noun, handler, tuple(params), help)
+            if noun is None:
+                for name in (verb,) + tuple(aliases):
+                    self.commands[name] = cmd
+                    self.verbs[name] = help
+            else:
+                self.commands[(verb, noun)] = cmd
+                self.nouns.setdefault(verb, []).append(cmd)
+            return handler
+        return register
+
+    def describe(self, verb:str, help:str):
+        """Help text of a verb that is only used with nouns"""
+        self.verbs[verb] = help
+
+    def lookup(self, words:list):
+        """Returns (Command or None, index of its first argument)"""
+        if len(words) > 1:
+            cmd = self.commands.get((words[0], words[1]))
+            if cmd is not None:
+                return cmd, 2
+        if len(words) > 0:
+            return self.commands.get(words[0]), 1
+        return None, 0
+
+    def signature(self):
+        """Hash of every command and its parameters, changes when a command's arguments do"""
+        import hashlib
+        parts = []
+        for key, cmd in self.commands.items():
+            params = [(param.name, getattr(param.kind, "__name__", param.kind), param.required, param.default)
+                for param in cmd.params]
+            parts.append(repr((key, params)))
+        return hashlib.sha1("\n".join(sorted(parts)).encode("utf-8")).hexdigest()
+
+    def help_lines(self, verb:str=None):
+        """Returns (name, help) of one verb, or of every verb if verb isn't registered"""
+        if verb in self.verbs:
+            return [(verb, self.verbs[verb])]
+        return list(self.verbs.items())
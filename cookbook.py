@@ -0,0 +1,221 @@
+import os
+import json
+import mmap
+import threading
+from pathlib import Path
+
+from recipe import Recipe
+from stats import STATS
+from locking import FileLock
+from journal import Journal
+
+class Cookbook:
+    """Many recipes in one JSON Lines file, one recipe per line.
+
+    A sidecar index (`book.jsonl.idx`) maps each recipe's key to the byte offset
+    and length of its line, so a single recipe is read straight out of a
+    memory map without scanning the file.
+    Deleting overwrites the line in place with a tombstone of the same length,
+    and compact() rewrites the file without the dead lines.
+    Writes hold the book's FileLock, and first pick up what other processes wrote.
+    """
+    SUFFIX = ".jsonl"
+    INDEX_SUFFIX = ".idx"
+    #records carry their key, so the index can be rebuilt from the data file alone
+    KEY_KEY = "id"
+    TOMBSTONE_KEY = "deleted"
+
+    def __init__(self, path:Path):
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + self.INDEX_SUFFIX)
+        #K:V = key:[offset, length], length includes the newline
+        self.offsets = {}
+        self.dead_bytes = 0
+        self.my_map = None
+        #data_stat the offsets are up to date with
+        self.stat = None
+        self.load_index()
+
+    @classmethod
+    def is_cookbook(cls, path):
+        return str(path).endswith(cls.SUFFIX)
+
+    #index handling
+
+    def data_stat(self):
+        try:
+            stat = self.path.stat()
+            return [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            return [0, 0]
+
+    def load_index(self):
+        """Uses the sidecar index if it matches the data file, otherwise rebuilds it"""
+        try:
+            with open(self.index_path, "r") as infile:
+                my_dict = json.load(infile)
+            if my_dict["stat"] == self.data_stat():
+                self.offsets = my_dict["offsets"]
+                self.dead_bytes = my_dict["dead"]
+                self.stat = my_dict["stat"]
+                return
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        self.rebuild_index()
+
+    def rebuild_index(self):
+        """Scans the data file line by line"""
+        self.offsets = {}
+        self.dead_bytes = 0
+        if self.path.exists():
+            with open(self.path, "rb") as infile:
+                offset = 0
+                for line in infile:
+                    if not line.endswith(b"\n"):
+                        #torn append, the write never finished; the next append truncates it
+                        break
+                    record = json.loads(line) if line.strip() else {self.TOMBSTONE_KEY: True}
+                    if record.get(self.TOMBSTONE_KEY):
+                        self.dead_bytes += len(line)
+                    else:
+                        key = record[self.KEY_KEY]
+                        if key in self.offsets:
+                            #an older copy that was never tombstoned, the later line wins
+                            self.dead_bytes += self.offsets[key][1]
+                        self.offsets[key] = [offset, len(line)]
+                    offset += len(line)
+        self.save_index()
+
+    def save_index(self):
+        self.stat = self.data_stat()
+        #per process and thread, as readers that rebuild the index write it without the lock
+        tmp_path = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as outfile:
+            json.dump({"stat": self.stat, "dead": self.dead_bytes, "offsets": self.offsets}, outfile)
+        os.replace(tmp_path, self.index_path)
+
+    def refresh_index(self):
+        """Reloads the index if another process wrote to the book since it was loaded"""
+        if self.data_stat() != self.stat:
+            self.close()
+            self.load_index()
+
+    #reading
+
+    def keys(self):
+        return self.offsets.keys()
+
+    def __contains__(self, key):
+        return key in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get_map(self):
+        if self.my_map is None:
+            with open(self.path, "rb") as infile:
+                self.my_map = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.my_map
+
+    def close(self):
+        if self.my_map is not None:
+            self.my_map.close()
+            self.my_map = None
+
+    def get_dict(self, key:str):
+        """Returns the stored dict of one recipe, or None if there is no such key"""
+        if key not in self.offsets:
+            return None
+        offset, length = self.offsets[key]
+        STATS.count("bytes_read", length)
+        STATS.count("recipes_parsed")
+        with STATS.timer("parse"):
+            return json.loads(self.get_map()[offset:offset+length])
+
+    def get(self, key:str):
+        """Returns one recipe, or None if there is no such key"""
+        my_dict = self.get_dict(key)
+        if my_dict is None:
+            return None
+        my_recipe = Recipe()
+        my_recipe.load_dict(my_dict)
+        return my_recipe
+
+    def items(self):
+        """Generator, yields (key, Recipe) in file order"""
+        for key, _ in sorted(self.offsets.items(), key=lambda item: item[1][0]):
+            yield key, self.get(key)
+
+    #writing
+
+    def append(self, my_recipe:Recipe, key:str=None):
+        """Appends a recipe as a new line. An existing recipe with the same key is tombstoned.
+        The key defaults to the recipe's title. Returns the key.
+        """
+        key = my_recipe.title if key is None else key
+        record = my_recipe.get_dict()
+        record[self.KEY_KEY] = key
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with FileLock(self.path):
+            self.refresh_index()
+            self.close()
+            if key in self.offsets:
+                self.tombstone(key)
+            with open(self.path, "a+b") as outfile:
+                Journal.drop_torn_tail(outfile)
+                offset = outfile.tell()
+                outfile.write(line)
+                STATS.count("bytes_written", len(line))
+                outfile.flush()
+                os.fsync(outfile.fileno())
+            self.offsets[key] = [offset, len(line)]
+            self.save_index()
+        return key
+
+    def tombstone(self, key:str):
+        """Overwrites a recipe's line in place with a tombstone of the same length"""
+        offset, length = self.offsets.pop(key)
+        marker = json.dumps({self.TOMBSTONE_KEY: True})
+        #the padding is whitespace, so the line still parses as JSON
+        line = (marker + " "*(length - len(marker) - 1) + "\n").encode("utf-8")
+        self.close()
+        with open(self.path, "r+b") as outfile:
+            outfile.seek(offset)
+            outfile.write(line)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        self.dead_bytes += length
+
+    def remove(self, key:str):
+        """Tombstones a recipe. Returns False if there was no such key"""
+        with FileLock(self.path):
+            self.refresh_index()
+            if key not in self.offsets:
+                return False
+            self.tombstone(key)
+            self.save_index()
+        return True
+
+    def compact(self):
+        """Rewrites the data file without tombstones, through a temp file and rename.
+        Returns the number of bytes reclaimed.
+        """
+        with FileLock(self.path):
+            self.refresh_index()
+            reclaimed = self.dead_bytes
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            new_offsets = {}
+            with open(tmp_path, "wb") as outfile:
+                if self.path.exists():
+                    my_map = self.get_map() if self.path.stat().st_size > 0 else None
+                    for key, (offset, length) in sorted(self.offsets.items(), key=lambda item: item[1][0]):
+                        new_offsets[key] = [outfile.tell(), length]
+                        outfile.write(my_map[offset:offset+length])
+                outfile.flush()
+                os.fsync(outfile.fileno())
+            self.close()
+            os.replace(tmp_path, self.path)
+            self.offsets = new_offsets
+            self.dead_bytes = 0
+            self.save_index()
+        return reclaimed
@@ -0,0 +1,154 @@
+import io
+import os
+import sys
+import json
+import signal
+import asyncio
+import threading
+import traceback
+
+from client import default_socket_path
+
+#Protocol, one JSON object per line each way:
+#   client hello    {"session": name or null, "cwd": path}
+#   server          {"session": name}
+#   client          {"cmd": command line}
+#   server          {"output": printed text, "goon": false once the session exited}
+#Named sessions outlive their connection, so one-command clients can pick up
+#where the last one left off. Unnamed ones end with their connection.
+#The client is in client.py, which imports as little as possible.
+
+class ThreadOutput:
+    """Stands in for sys.stdout, sending what a thread prints to the buffer it captures into,
+    so commands running at once in worker threads don't mix their output"""
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text:str):
+        buffer = getattr(self.local, "buffer", None)
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        if getattr(self.local, "buffer", None) is None:
+            self.stream.flush()
+
+    def __getattr__(self, name:str):
+        return getattr(self.stream, name)
+
+    def capture(self, buffer:io.StringIO):
+        """Sends this thread's printing to buffer, until capture(None)"""
+        self.local.buffer = buffer
+
+class Daemon:
+    """Serves frontends over a Unix domain socket, keeping their recipes and indexes in memory.
+
+    Each session has its own Frontend, so its own working directory and open recipes.
+    Commands run in worker threads, so a slow one (a bulk conversion, a save waiting
+    on a lock) doesn't hold up other clients. A session runs its commands one at a time,
+    in the order they came in.
+    """
+    def __init__(self, socket_path:str):
+        self.socket_path = socket_path
+        #K:V = session name:Frontend
+        self.sessions = {}
+        #K:V = session name:asyncio.Lock, held while one of its commands runs
+        self.running = {}
+        #recipe indexes are per directory, not per client, so every frontend shares them
+        self.indexes = {}
+        self.text_indexes = {}
+        self.index_lock = threading.RLock()
+        self.anonymous = 0
+        self.output = None
+
+    def new_frontend(self, cwd:str):
+        from frontend import Frontend
+        my_frontend = Frontend(cwd)
+        my_frontend.interactive = False
+        my_frontend.init_terminal(False)
+        my_frontend.indexes = self.indexes
+        my_frontend.text_indexes = self.text_indexes
+        my_frontend.index_lock = self.index_lock
+        return my_frontend
+
+    def run_command(self, my_frontend, cmd:str):
+        """Runs one command line, returns (printed output, goon). Runs in a worker thread."""
+        buffer = io.StringIO()
+        goon = True
+        self.output.capture(buffer)
+        try:
+            goon = my_frontend.interpret_command(cmd)
+        except Exception:
+            #one bad command shouldn't take the daemon down
+            traceback.print_exc(file=buffer)
+        finally:
+            self.output.capture(None)
+        return buffer.getvalue(), goon
+
+    async def handle_client(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        name = None
+        keep = False
+        try:
+            hello = json.loads(await reader.readline())
+            name = hello.get("session")
+            keep = name is not None
+            if name is None:
+                self.anonymous += 1
+                name = f"#{self.anonymous}"
+            my_frontend = self.sessions.get(name)
+            if my_frontend is None:
+                my_frontend = self.new_frontend(hello.get("cwd") or os.getcwd())
+                self.sessions[name] = my_frontend
+                self.running[name] = asyncio.Lock()
+            running = self.running[name]
+            await self.send(writer, {"session": name})
+            loop = asyncio.get_running_loop()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                cmd = json.loads(line)["cmd"]
+                #clients sharing a named session take turns, first come first served
+                async with running:
+                    output, goon = await loop.run_in_executor(None, self.run_command, my_frontend, cmd)
+                await self.send(writer, {"output": output, "goon": goon})
+                if not goon:
+                    keep = False
+                    break
+        except (ValueError, KeyError, ConnectionError):
+            #a broken client, its named session stays for the next one
+            pass
+        finally:
+            if name is not None and not keep:
+                self.sessions.pop(name, None)
+                self.running.pop(name, None)
+            writer.close()
+
+    async def send(self, writer:asyncio.StreamWriter, message:dict):
+        writer.write((json.dumps(message) + "\n").encode("utf-8"))
+        await writer.drain()
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self.handle_client, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        #load the frontend before the first client needs it
+        self.new_frontend(os.getcwd())
+        print(f"Serving on {self.socket_path}")
+        self.output = sys.stdout = ThreadOutput(sys.stdout)
+        stop = asyncio.get_running_loop().create_future()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set_result, None)
+        async with server:
+            await stop
+
+def daemon_main(socket_path:str=None):
+    """Entry point for `app.py --daemon`, serves until interrupted"""
+    socket_path = default_socket_path() if socket_path is None else socket_path
+    try:
+        asyncio.run(Daemon(socket_path).serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -0,0 +1,371 @@
+import os
+import re
+import json
+import zlib
+import random
+import threading
+from array import array
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from recipe import Recipe
+from cookbook import Cookbook
+from index import scan_recipes
+from stats import STATS
+
+#numpy is optional, signatures are computed one permutation at a time without it
+try:
+    import numpy
+except ModuleNotFoundError:
+    numpy = None
+
+WORD = re.compile(r"\w+")
+
+#MinHash signature length, split into BANDS bands of ROWS values for LSH
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+#hashes are taken modulo this prime, so a*x + b fits in 64 bits
+PRIME = (1 << 31) - 1
+#words per step shingle
+SHINGLE = 3
+#fixed so that cached signatures stay comparable between runs
+SEED = 1
+
+rng = random.Random(SEED)
+PERM_A = [rng.randrange(1, PRIME) for _ in range(NUM_PERM)]
+PERM_B = [rng.randrange(0, PRIME) for _ in range(NUM_PERM)]
+del rng
+if numpy is not None:
+    PERM_A_COLUMN = numpy.array(PERM_A, dtype=numpy.uint64)[:, None]
+    PERM_B_COLUMN = numpy.array(PERM_B, dtype=numpy.uint64)[:, None]
+
+def features(my_dict:dict):
+    """Returns the set of hashed features of a stored recipe dict:
+    shingles of SHINGLE consecutive words within each step, and ingredient names"""
+    hashes = set()
+    for step in my_dict[Recipe.STEP_KEY]:
+        words = WORD.findall(str(step).lower())
+        for i in range(max(1, len(words) - SHINGLE + 1)):
+            shingle = "s:" + " ".join(words[i:i + SHINGLE])
+            hashes.add(zlib.crc32(shingle.encode("utf-8")))
+    for name in my_dict[Recipe.INGR_KEY]:
+        name = "i:" + " ".join(WORD.findall(str(name).lower()))
+        hashes.add(zlib.crc32(name.encode("utf-8")))
+    return hashes
+
+def minhash(hashes:set):
+    """Returns the MinHash signature of a set of features as an array of NUM_PERM uint32,
+    None for an empty set"""
+    if not hashes:
+        return None
+    if numpy is not None:
+        values = numpy.fromiter(hashes, dtype=numpy.uint64, count=len(hashes))
+        return array("I", ((PERM_A_COLUMN*values + PERM_B_COLUMN) % PRIME).min(axis=1).astype(numpy.uint32).tobytes())
+    return array("I", (min((a*value + b) % PRIME for value in hashes) for a, b in zip(PERM_A, PERM_B)))
+
+def normalize_url(url:str):
+    """Returns the part of a source URL that identifies the page, None if it isn't a URL:
+    no scheme, `www.` or fragment, lowercase host, no trailing slash"""
+    url = url.strip()
+    if "://" not in url:
+        return None
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[len("www."):]
+    if not host:
+        return None
+    normal = host + parts.path.rstrip("/")
+    if parts.query:
+        normal += "?" + parts.query
+    return normal
+
+class SignatureCache:
+    """Signatures of the recipes of one directory or cookbook, kept in a hidden file next to them.
+    Each entry is stamped with the mtime and size of its file (and journal), or the checksum
+    of its cookbook line, so only new or changed recipes are read and hashed again.
+    """
+    VERSION = 1
+    #in the directory, or after the cookbook's name: `.book.jsonl.rcpdedupe.json`
+    NAME = ".rcpdedupe.json"
+    #entry fields
+    STAMP = 0
+    TITLE = 1
+    SRCURL = 2
+    SIGNATURE = 3
+
+    def __init__(self, path:Path):
+        self.path = Path(path)
+        #K:V = key:[stamp, title, normalized srcurl or None, signature as hex or None]
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    def params(self):
+        return [NUM_PERM, PRIME, SHINGLE, SEED]
+
+    def load(self):
+        try:
+            with open(self.path, "r") as infile:
+                my_dict = json.load(infile)
+            if my_dict["version"] == self.VERSION and my_dict["params"] == self.params():
+                self.entries = my_dict["entries"]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries = {}
+
+    def save(self):
+        if not self.dirty:
+            return
+        #per process and thread, nothing locks the cache
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as outfile:
+            json.dump({"version": self.VERSION, "params": self.params(), "entries": self.entries}, outfile)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def lookup(self, key:str, stamp:list, read_dict):
+        """Returns the entry of a recipe, calling read_dict() to get its stored dict if it
+        isn't cached with the same stamp. Unreadable recipes get an entry without a signature."""
+        old = self.entries.get(key)
+        if old is not None and old[self.STAMP] == stamp:
+            STATS.count("cache_hits")
+            return old
+        STATS.count("cache_misses")
+        title, srcurl, signature = "", None, None
+        try:
+            my_dict = read_dict()
+            title = str(my_dict[Recipe.TITLE_KEY])
+            srcurl = normalize_url(str(my_dict[Recipe.META_KEY].get(Recipe.META_SRCURL, "")))
+            signature = minhash(features(my_dict))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+        entry = [stamp, title, srcurl, None if signature is None else signature.tobytes().hex()]
+        self.entries[key] = entry
+        self.dirty = True
+        return entry
+
+    def prune(self, seen:set):
+        """Drops the entries of recipes that are gone"""
+        for key in [key for key in self.entries if key not in seen]:
+            del self.entries[key]
+            self.dirty = True
+
+def read_file_dict(path:str, journal:bool):
+    """Returns the stored dict of a recipe file, through Recipe if it has a journal to apply"""
+    if journal:
+        return Recipe(Path(path)).get_dict()
+    with open(path, "r") as infile:
+        text = infile.read()
+    STATS.count("bytes_read", len(text))
+    return json.loads(text)
+
+def iter_directory(root:Path):
+    """Generator, yields (name, cache entry) of every recipe file under root"""
+    cache = SignatureCache(root/SignatureCache.NAME)
+    journals = {}
+    seen = set()
+    try:
+        for rel, dir_entry in list(scan_recipes(root, True, journals)):
+            try:
+                stat = dir_entry.stat()
+                stamp = [stat.st_mtime_ns, stat.st_size]
+                journal_entry = journals.get(rel)
+                if journal_entry is not None:
+                    journal_stat = journal_entry.stat()
+                    stamp.extend((journal_stat.st_mtime_ns, journal_stat.st_size))
+            except OSError:
+                continue
+            seen.add(rel)
+            yield rel, cache.lookup(rel, stamp,
+                lambda path=dir_entry.path, journal=journal_entry is not None: read_file_dict(path, journal))
+        cache.prune(seen)
+    finally:
+        try:
+            cache.save()
+        except OSError:
+            #read-only directories are just hashed again next time
+            pass
+
+def iter_cookbook(path:Path):
+    """Generator, yields (book.jsonl:key, cache entry) of every recipe of a cookbook"""
+    book = Cookbook(path)
+    cache = SignatureCache(path.with_name(f".{path.name}{SignatureCache.NAME}"))
+    try:
+        if book.offsets:
+            my_map = book.get_map()
+        for key, (offset, length) in sorted(book.offsets.items(), key=lambda item: item[1][0]):
+            line = my_map[offset:offset + length]
+            #the line's checksum, as an appended or compacted recipe can reuse an offset
+            stamp = [zlib.crc32(line), length]
+            yield f"{path.name}:{key}", cache.lookup(key, stamp, lambda line=line: json.loads(line))
+        cache.prune(set(book.offsets))
+    finally:
+        book.close()
+        try:
+            cache.save()
+        except OSError:
+            pass
+
+def iter_directory_file(path:Path):
+    """Generator, yields (name, cache entry) of one recipe file, cached with its directory's recipes"""
+    cache = SignatureCache(path.parent/SignatureCache.NAME)
+    stat = path.stat()
+    stamp = [stat.st_mtime_ns, stat.st_size]
+    journal = Path(str(path) + ".journal")
+    if journal.exists():
+        journal_stat = journal.stat()
+        stamp.extend((journal_stat.st_mtime_ns, journal_stat.st_size))
+    yield path.name, cache.lookup(path.name, stamp, lambda: read_file_dict(str(path), journal.exists()))
+    try:
+        cache.save()
+    except OSError:
+        pass
+
+def iter_entries(paths:list, cwd:Path):
+    """Generator, yields (name, cache entry) of every recipe of directories, cookbooks and recipe files.
+    Names are relative to cwd where they can be."""
+    for path in paths:
+        if Cookbook.is_cookbook(path):
+            prefix = name_prefix(path.parent, cwd)
+            entries = iter_cookbook(path)
+        elif path.is_dir():
+            prefix = name_prefix(path, cwd)
+            entries = iter_directory(path)
+        elif path.is_file():
+            prefix = name_prefix(path.parent, cwd)
+            entries = iter_directory_file(path)
+        else:
+            raise FileNotFoundError(f"no recipe, cookbook or directory {path}")
+        for name, entry in entries:
+            yield prefix + name, entry
+
+def name_prefix(base:Path, cwd:Path):
+    """What goes before the names of the recipes of base: its path relative to cwd if it is under it"""
+    base = Path(os.path.abspath(base))
+    try:
+        rel = base.relative_to(os.path.abspath(cwd)).as_posix()
+    except ValueError:
+        rel = str(base)
+    return "" if rel == "." else rel + "/"
+
+class Groups:
+    """Union-find over recipe numbers"""
+    def __init__(self, count:int):
+        self.parent = list(range(count))
+
+    def find(self, i:int):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i:int, j:int):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            self.parent[max(i, j)] = min(i, j)
+
+def similarity(signatures, i:int, j:int):
+    """Estimated Jaccard similarity of two recipes: the share of equal signature values"""
+    if numpy is not None:
+        return numpy.count_nonzero(signatures[i] == signatures[j])/NUM_PERM
+    return sum(x == y for x, y in zip(signatures[i], signatures[j]))/NUM_PERM
+
+def iter_buckets(signatures):
+    """Generator, yields the signature rows of each LSH bucket that has more than one, band by band.
+    With numpy, the band values of every row are hashed to one uint64 and sorted, so only the rows
+    that share a bucket are looked at one by one. Hash collisions only add candidates."""
+    if numpy is None:
+        for band in range(BANDS):
+            #K:V = band values:rows having them
+            buckets = {}
+            for row, signature in enumerate(signatures):
+                buckets.setdefault(signature[band*ROWS:(band + 1)*ROWS].tobytes(), []).append(row)
+            for bucket in buckets.values():
+                if len(bucket) > 1:
+                    yield bucket
+        return
+    if len(signatures) < 2:
+        return
+    multipliers = numpy.array([PERM_A[i] | 1 for i in range(ROWS)], dtype=numpy.uint64)
+    for band in range(BANDS):
+        keys = (signatures[:, band*ROWS:(band + 1)*ROWS].astype(numpy.uint64)*multipliers).sum(axis=1)
+        order = numpy.argsort(keys, kind="stable")
+        starts = numpy.flatnonzero(numpy.diff(keys[order])) + 1
+        bounds = numpy.concatenate(([0], starts, [len(order)]))
+        for i in numpy.flatnonzero(numpy.diff(bounds) > 1).tolist():
+            yield order[bounds[i]:bounds[i + 1]].tolist()
+
+def find_duplicates(paths:list, cwd:Path, threshold:float=0.7):
+    """Groups the near-duplicate recipes of directories, cookbooks and recipe files.
+
+    Recipes with the same source URL are duplicates. Otherwise, recipes whose MinHash
+    signatures land in the same bucket of any LSH band are candidates, and candidates
+    whose estimated similarity reaches threshold are duplicates. Each bucket is only
+    checked member to first member and member to previous member, so the work grows
+    with the number of recipes, not with the number of pairs.
+
+    Returns (list of groups, recipe count). Each group is a list of (name, title, reason),
+    where reason is None for the group's first recipe, "srcurl" for a recipe with its source URL
+    and otherwise the estimated similarity to it.
+    """
+    names = []
+    titles = []
+    signatures = []
+    numbers = []
+    #K:V = normalized srcurl:first recipe number
+    urls = {}
+    #K:V = recipe number:(number it was matched with, "srcurl" or similarity)
+    reasons = {}
+    for name, entry in iter_entries(paths, cwd):
+        number = len(names)
+        names.append(name)
+        titles.append(entry[SignatureCache.TITLE])
+        if entry[SignatureCache.SIGNATURE] is not None:
+            signature = array("I")
+            signature.frombytes(bytes.fromhex(entry[SignatureCache.SIGNATURE]))
+            signatures.append(signature)
+            numbers.append(number)
+        srcurl = entry[SignatureCache.SRCURL]
+        if srcurl is not None:
+            first = urls.setdefault(srcurl, number)
+            if first != number:
+                reasons[number] = (first, "srcurl")
+    groups = Groups(len(names))
+    for number, (first, _) in reasons.items():
+        groups.union(first, number)
+    if numpy is not None:
+        signatures = numpy.frombuffer(b"".join(sig.tobytes() for sig in signatures),
+            dtype=numpy.uint32).reshape(len(signatures), NUM_PERM)
+    for bucket in iter_buckets(signatures):
+        for k in range(1, len(bucket)):
+            for other in {bucket[0], bucket[k - 1]}:
+                i, j = numbers[other], numbers[bucket[k]]
+                if groups.find(i) == groups.find(j):
+                    continue
+                score = similarity(signatures, other, bucket[k])
+                if score >= threshold:
+                    groups.union(i, j)
+                    reasons.setdefault(j, (i, score))
+    rows = {number: row for row, number in enumerate(numbers)}
+    members = {}
+    for number in range(len(names)):
+        members.setdefault(groups.find(number), []).append(number)
+    result = []
+    for group in members.values():
+        if len(group) < 2:
+            continue
+        first = group[0]
+        listed = [(names[first], titles[first], None)]
+        for number in group[1:]:
+            if number in rows and first in rows:
+                reason = similarity(signatures, rows[first], rows[number])
+            else:
+                reason = "srcurl"
+            if reasons.get(number, (None, None))[1] == "srcurl":
+                reason = "srcurl"
+            listed.append((names[number], titles[number], reason))
+        result.append(listed)
+    result.sort(key=lambda group: (-len(group), group[0][0]))
+    return result, len(names)
@@ -0,0 +1,107 @@
+import os
+import re
+from pathlib import Path
+
+from recipe import Recipe
+from cookbook import Cookbook
+from index import scan_recipes
+from bulk import DONE, FAILED, iter_chunks, run_chunks
+
+#formats, by the suffix of the files they are written to
+MARKDOWN = ".md"
+HTML = ".html"
+
+#recipes per task, workers are handed chunks so the cost of a task is shared by many small recipes
+CHUNK = 32
+
+def write_recipe(my_recipe:Recipe, dest:Path):
+    """Streams a recipe's Markdown, or HTML for `.html` files, through a temp file and rename"""
+    lines = my_recipe.iter_html() if dest.suffix == HTML else my_recipe.iter_markdown()
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "w") as outfile:
+            for line in lines:
+                outfile.write(line)
+                outfile.write("\n")
+        os.replace(tmp_path, dest)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def load_recipe(src:str, key:str=None, books:dict=None):
+    """Loads a recipe file, or a recipe of a cookbook. books keeps the cookbooks
+    opened, K:V = cookbook path:Cookbook, for the caller to close."""
+    if key is None:
+        return Recipe(Path(src))
+    book = books.get(src)
+    if book is None:
+        book = books[src] = Cookbook(src)
+    my_recipe = book.get(key)
+    if my_recipe is None:
+        raise KeyError(key)
+    return my_recipe
+
+def export_chunk(chunk:list, suffixes:tuple):
+    """Renders a chunk of (src, key, dest without suffix) jobs. Runs in a worker process.
+    Returns a list of (name, status, message)
+    """
+    results = []
+    #open for this chunk only, a book kept longer would miss what is added to it in between
+    books = {}
+    try:
+        for src, key, dest in chunk:
+            name = src if key is None else f"{src}:{key}"
+            try:
+                my_recipe = load_recipe(src, key, books)
+                for suffix in suffixes:
+                    write_recipe(my_recipe, Path(dest + suffix))
+                results.append((name, DONE, None))
+            except Exception as e:
+                results.append((name, FAILED, f"{type(e).__name__}: {e}"))
+    finally:
+        for book in books.values():
+            book.close()
+    return results
+
+def file_name(key:str, taken:set):
+    """A file name for a cookbook key, unique among taken"""
+    name = re.sub(r"[^\w\-. ]+", "_", key).strip(" .") or "recipe"
+    unique = name
+    number = 1
+    while unique.lower() in taken:
+        number += 1
+        unique = f"{name}-{number}"
+    taken.add(unique.lower())
+    return unique
+
+def iter_jobs(source:Path, out_root:Path):
+    """Generator, yields (src, key, dest without suffix) for every recipe of a directory,
+    a recipe file or a cookbook. Cookbook recipes are named after their keys."""
+    if Cookbook.is_cookbook(source):
+        book = Cookbook(source)
+        taken = set()
+        for key, _ in sorted(book.offsets.items(), key=lambda item: item[1][0]):
+            yield str(source), key, str(out_root/file_name(key, taken))
+        return
+    if source.is_file():
+        yield str(source), None, str(out_root/source.stem)
+        return
+    for rel, entry in scan_recipes(source):
+        yield entry.path, None, str(out_root/rel[:-len(".json")])
+
+def export_recipes(source:Path, out_root:Path, suffixes:tuple=(MARKDOWN,), jobs:int=None):
+    """Renders every recipe of source into out_root, in chunks across a process pool.
+    Only a bounded number of chunks is in flight, and recipes are read by the workers,
+    so memory doesn't grow with the size of the source. One job renders in this process.
+    Returns a dict of counts by status and the list of (name, message) failures.
+    """
+    counts = {DONE: 0, FAILED: 0}
+    failures = []
+    chunks = iter_chunks(iter_jobs(source, out_root), CHUNK)
+    for results in run_chunks(export_chunk, chunks, jobs, suffixes):
+        for name, status, message in results:
+            counts[status] += 1
+            if message is not None:
+                failures.append((name, message))
+    return counts, failures
@@ -1,12 +1,54 @@
 #!/usr/bin/env python3
 #standard library imports
-from typing import Generator
 import os
+import time
+from contextlib import nullcontext
 from pathlib import Path
 
 #module imports
+#index, cookbook and blessed are imported where they are first needed, to keep startup short
 from recipe import Recipe
-from recipe import IngredientAmount
+from units import UNITS
+from sessions import Session, RecipeCache
+from stats import STATS
+from commands import CommandRegistry, Param, UsageError, REST, ARGS, tokenize, words_of
+
+#commands of file explorer mode, and of recipe mode while a recipe is open
+EXPLORER = CommandRegistry()
+RECIPE = CommandRegistry()
+
+class TerminalColors(dict):
+    """COLORS of a blessed terminal. blessed is only imported the first time a color is looked up,
+    so commands that print nothing colored never pay for it."""
+    #K:V = color key:blessed attribute
+    TERM_ATTRS = {
+        "WARN":"red",
+        "NORM":"normal",
+        "PROMPT":"yellow",
+        "OS_PATH":"green",
+        "RCP_PATH":"blue",
+        "ACCENT":"blue"
+    }
+
+    def __init__(self, frontend):
+        super().__init__()
+        self.frontend = frontend
+
+    def __missing__(self, key:str):
+        if key not in self.TERM_ATTRS or len(self) > 0:
+            raise KeyError(key)
+        try:
+            from blessed import Terminal
+            term = Terminal()
+            self.frontend.term = term
+            for color, attr in self.TERM_ATTRS.items():
+                self[color] = getattr(term, attr)
+        except ModuleNotFoundError:
+            print("blessed not found")
+            self.frontend.BLEST = False
+            for color in self.TERM_ATTRS:
+                self[color] = ""
+        return self[key]
 
 class Frontend:
 
@@ -22,32 +64,42 @@ class Frontend:
         "ACCENT":""
     }
     def init_terminal(self, bless:bool):
+        """Uses blessed's colors if bless. blessed is loaded when the first color is printed,
+        and BLEST turns False then if it isn't installed."""
         if bless:
-            try:
-                from blessed import Terminal
-                self.term = Terminal()
-                term = self.term
-                self.COLORS["WARN"] = term.red
-                self.COLORS["NORM"] = term.normal
-                self.COLORS["PROMPT"] = term.yellow
-                self.COLORS["OS_PATH"] = term.green
-                self.COLORS["RCP_PATH"] = term.blue
-                self.COLORS["ACCENT"] = term.blue
-                return True
-            except ModuleNotFoundError:
-                print("blessed not found")
-                self.BLEST=False
-                return False
+            self.COLORS = TerminalColors(self)
+            return True
+        return False
 
     CONFIG_REL_PATH="rcpconfig.txt"
 
     my_recipe:Recipe=None
     rcp_path:Path=None
+    #key of the open recipe inside a cookbook file, None for plain recipe files
+    rcp_key:str=None
+    #name of the session my_recipe belongs to
+    session_name:str=None
     RCPFLAG = False
 
+    #parsed recipes kept for named sessions, the least recently used ones are written back and dropped
+    CACHE_SIZE = 8
+
+    #whether input() can be used to ask the user something
+    interactive:bool = True
+
+    def __init__(self, cwd:Path=None):
+        #each frontend keeps its own working directory instead of using os.chdir,
+        #so that several frontends can share a process
+        self.cwd = Path(os.getcwd()) if cwd is None else Path(cwd).resolve()
+        #every path a recipe was saved to, in order
+        self.saved_paths = []
+        #K:V = name:Session of every open recipe, whether or not it is still cached
+        self.sessions = {}
+        self.recipes = RecipeCache(self.CACHE_SIZE, self.evict_recipe)
+
     def cwd_path(self):
         """Returns a Path object of the current working directory."""
-        return Path(os.getcwd())
+        return self.cwd
 
     def init_settings(self):
         """Searches for a settings file at `./rcpconfig.txt`
@@ -58,48 +110,19 @@ class Frontend:
             print( f"Found a settings file at {str(config_path)}!" )
 
     def tokenizer(self, line:str):
-        """Generator, returns None upon ending"""
-        WHITESPACE=0
-        TOKEN=1
-        DQUOTE=2
-        SQUOTE=3
-        state = WHITESPACE
-        reg0 = 0
-        for i in range(len(line)):
-            char = line[i]
-            if state == WHITESPACE:
-                if char == "\"":
-                    state = DQUOTE
-                    reg0 = i+1
-                elif char == "'":
-                    state = SQUOTE
-                    reg0 = i+1
-                elif not char.isspace():
-                    state = TOKEN
-                    reg0 = i
-            elif state == TOKEN:
-                if char.isspace():
-                    state = WHITESPACE
-                    yield line[reg0:i]
-                    reg0=i+1
-            elif state == SQUOTE:
-                if char == "'":
-                    state = WHITESPACE
-                    yield line[reg0:i]
-                    reg0 = i+1
-            elif state == DQUOTE:
-                if char == '"':
-                    state = WHITESPACE
-                    yield line[reg0:i]
-                    reg0 = i+1
-        yield line[reg0:]
+        """Generator, yields the tokens, then the rest of the line, then None"""
+        tokens, rest = tokenize(line)
+        yield from tokens
+        yield rest
         yield None
 
     def script_mode(self, script:Path):
-        """Handles scripts being input into the program"""
-        with script.open("r") as infile:
-            for line in infile:
-                self.interpret_command(line)
+        """Handles scripts being input into the program.
+        The script is compiled into a plan (cached while the script doesn't change) and replayed.
+        Raises plan.PlanError, before running anything, if some line is wrong.
+        """
+        from plan import Plan
+        return Plan.load(script).run(self)
 
     def console_mode(self):
         """Handles interactive mode loop"""
@@ -107,7 +130,7 @@ class Frontend:
             if self.RCPFLAG:
                 return f"Current Recipe:{self.COLORS['RCP_PATH']}{self.rcp_path.name} {self.COLORS['PROMPT']}# {self.COLORS['NORM']}"
             else:
-                return f"{self.COLORS['RCP_PATH']}{os.getcwd()} {self.COLORS['PROMPT']}$ {self.COLORS['NORM']} "
+                return f"{self.COLORS['RCP_PATH']}{self.cwd} {self.COLORS['PROMPT']}$ {self.COLORS['NORM']} "
         #whether or not the loop should go on
         goon = True
         imp = input(prompt(self))
@@ -117,328 +140,892 @@ class Frontend:
                 if goon:
                     imp = input(prompt(self))
 
-    COMMAND_DICT={
-        "help":"prints all the available commands",
-        "cd":"change current directory",
-        "ls":"list the contents of the current directory",
-        "pwd":"prints the current directory",
-        "echo":"miscellaneous output function",
-        "open":"change current directory",
-        "exit":"exits the program"
-    }
-        
     def interpret_command(self, cmd:str):
-        """Parses and interprets file-explorer mode commands, can enter recipe mode when open command is called"""
+        """Parses and runs one command line, from recipe mode's commands while a recipe is open.
+        Returns False when the program should exit.
+        """
         COLORS = self.COLORS
         if cmd.strip() == "":
             return True
+        tokens, rest = tokenize(cmd)
+        words = words_of(tokens, rest)
+        registry = RECIPE if self.RCPFLAG else EXPLORER
+        command, start = registry.lookup(words)
+        if command is None:
+            self.unknown_command(registry, words)
+            return True
+        try:
+            args = command.parse(tokens, rest, start)
+        except UsageError as e:
+            print(f"{COLORS['WARN']} Missing arguments. usage: {e}{COLORS['NORM']}")
+            return True
+        except ValueError:
+            print(f"{COLORS['WARN']} Expected numeric argument but string was given.")
+            return True
+        start = time.perf_counter()
+        try:
+            return command.handler(self, *args) is not False
+        finally:
+            STATS.observe(command.name, time.perf_counter() - start)
+
+    def unknown_command(self, registry:CommandRegistry, words:list):
+        """Lists a verb's nouns if the verb exists, otherwise points to help"""
+        COLORS = self.COLORS
+        verb = words[0] if words else ""
+        if verb in registry.nouns:
+            print(f"{COLORS['WARN']} invalid {verb} argument.")
+            print(f"Possible arguments for {verb} command: ")
+            for noun_cmd in registry.nouns[verb]:
+                print(f"{COLORS['ACCENT']}{noun_cmd.noun}\t{COLORS['NORM']}{noun_cmd.help}")
+        elif registry is RECIPE:
+            print(f"{COLORS['WARN']}Command {verb} not recognized. enter \
+                '{COLORS['NORM']}help{COLORS['WARN']}' to see available commands")
+        else:
+            print(f"{COLORS['WARN']}Command not recognized. enter \
+                '{COLORS['NORM']}help{COLORS['WARN']}' to see available commands")
+
+    def print_help(self, registry:CommandRegistry, verb:str=None):
+        for cmd_name, helptxt in registry.help_lines(verb):
+            print(f"\t{cmd_name}\t{helptxt}")
+
+    #file explorer commands
+
+    @EXPLORER.command("help", params=(Param("command", required=False),),
+        help="prints all the available commands")
+    def help_command(self, verb:str=None):
+        self.print_help(EXPLORER, verb)
+
+    @EXPLORER.command("cd", params=(Param("path"),), help="change current directory")
+    def cd_command(self, arg:str):
+        cd_path = self.cwd_path()/arg
+        if not cd_path.is_dir():
+            print(f"{self.COLORS['WARN']} invalid path")
+        else:
+            self.cwd = cd_path.resolve()
+
+    @EXPLORER.command("ls", params=(Param("args", ARGS),),
+        help="list the contents of a directory (ls [path] [-R] [-l] [-j workers]), -l shows recipe titles and sizes")
+    def ls_command_line(self, args:list):
+        self.ls_command(args)
+
+    @EXPLORER.command("pwd", help="prints the current directory")
+    def pwd_command(self):
+        print(self.cwd)
+
+    @EXPLORER.command("echo", params=(Param("text", REST, required=False),), help="miscellaneous output function")
+    def echo_command(self, text:str):
+        print(text)
+
+    @EXPLORER.command("open", params=(Param("path"), Param("args", ARGS)),
+        help="opens a recipe, or a recipe in a cookbook, as a named session (open path [key] [as name])")
+    @RECIPE.command("open", params=(Param("path"), Param("args", ARGS)),
+        help="opens another recipe as a named session (open path [key] [as name])")
+    def open_command(self, rcp_path_str:str, args:list):
+        name = None
+        if len(args) >= 2 and args[-2] == "as":
+            name = args[-1]
+            args = args[:-2]
+        key = args[0] if args else None
+        from cookbook import Cookbook
+        if Cookbook.is_cookbook(rcp_path_str) and key is None:
+            print(f"{self.COLORS['WARN']} Which recipe? usage: open book.jsonl key [as name]")
+            return
+        self.open_recipe(rcp_path_str, name, key)
+
+    @EXPLORER.command("use", params=(Param("name", required=False),),
+        help="switches to an open recipe by its session name, or lists the sessions")
+    @RECIPE.command("use", params=(Param("name", required=False),),
+        help="switches to another open recipe by its session name, or lists the sessions")
+    def use_command(self, name:str=None):
+        if name is None:
+            self.list_sessions()
+        elif name not in self.sessions:
+            print(f"{self.COLORS['WARN']} No open recipe named {name}.{self.COLORS['NORM']}")
+        else:
+            self.use_session(name)
+
+    @EXPLORER.command("convert", params=(Param("src"), Param("dest")),
+        help="convert a recipe between JSON and binary (.rcpb) files (convert src dest)")
+    def convert_command(self, src:str, dest:str):
+        if not (self.cwd_path()/src).exists():
+            print(f"{self.COLORS['WARN']} invalid path")
+            return
+        import rcpbin
+        rcpbin.convert_file(self.cwd_path()/src, self.cwd_path()/dest)
+        print(f"Converted {src} to {dest}")
+
+    @EXPLORER.command("cookbook", params=(Param("args", ARGS),),
+        help="manage a .jsonl cookbook (cookbook list|add|remove|compact book.jsonl [files or keys])")
+    def cookbook_command_line(self, args:list):
+        self.cookbook_command(args)
+
+    @EXPLORER.command("find", params=(Param("term"), Param("field", required=False)), aliases=("search",),
+        help="search recipes under the current directory from the index (find term [title|ingredient|metadata|key])")
+    def find_command(self, term:str, field:str=None):
+        self.find_recipes(term, field)
+
+    @EXPLORER.command("grep", params=(Param("args", ARGS),),
+        help="full-text search of titles, ingredients and steps, best matches first (grep [--refresh|--rebuild] [-n limit] words \"a phrase\"...)")
+    def grep_command_line(self, args:list):
+        self.grep_command(args)
+
+    @EXPLORER.command("dedupe", params=(Param("args", ARGS),),
+        help="find near-duplicate recipes in directories and cookbooks (dedupe [paths...] [-t threshold] [-o out.json])")
+    def dedupe_command_line(self, args:list):
+        self.dedupe_command(args)
+
+    @EXPLORER.command("bulk", params=(Param("args", ARGS),),
+        help="convert or scale every recipe under a path (bulk metric|scale [factor] [path] [-o outdir] [-j workers])")
+    def bulk_command_line(self, args:list):
+        self.bulk_command(args)
+
+    @EXPLORER.command("export", params=(Param("args", ARGS),),
+        help="render every recipe of a directory or cookbook to Markdown files (export [path] [-o outdir] [-j workers] [--html])")
+    def export_command_line(self, args:list):
+        self.export_command(args)
+
+    @EXPLORER.command("import", params=(Param("args", ARGS),),
+        help="make recipe files from the schema.org recipes of saved web pages (import [path] [-o outdir] [-j workers])")
+    def import_command_line(self, args:list):
+        self.import_command(args)
+
+    @EXPLORER.command("aggregate", params=(Param("args", ARGS),),
+        help="total the ingredients of many recipes, in ml and gram (aggregate path[@factor]... [-f menu.txt] [-o out.json])")
+    def aggregate_command_line(self, args:list):
+        self.aggregate_command(args)
+
+    @EXPLORER.command("stats", params=(Param("format", required=False),),
+        help="prints timings and counters of this session (stats [json|prometheus|reset])")
+    @RECIPE.command("stats", params=(Param("format", required=False),),
+        help="prints timings and counters of this session (stats [json|prometheus|reset])")
+    def stats_command(self, form:str=None):
+        if form is None:
+            for line in STATS.report_lines():
+                print(line)
+        elif form == "json":
+            import json
+            print(json.dumps(STATS.get_dict(), indent=4))
+        elif form in ("prometheus", "prom"):
+            print(STATS.to_prometheus(), end="")
+        elif form == "reset":
+            STATS.reset()
+            print("Stats reset.")
+        else:
+            print(f"{self.COLORS['WARN']} Unknown stats format {form}, expected json, prometheus or reset.{self.COLORS['NORM']}")
+
+    @EXPLORER.command("exit", help="exits the program")
+    def exit_command(self):
+        print("Bye!")
+        return False
+
+    #K:V = directory Path:RecipeIndex, so repeated searches don't reload the index file
+    indexes:dict = None
+    #held while using indexes and text_indexes, a shared lock where frontends share them across threads
+    index_lock = nullcontext()
+
+    def get_index(self, root:Path, refresh:bool=True):
+        """Returns the index of a directory, refreshed unless refresh is False, creating it if needed"""
+        from index import RecipeIndex
+        if self.indexes is None:
+            self.indexes = {}
+        index = self.indexes.get(root)
+        if index is None:
+            index = RecipeIndex(root)
+            self.indexes[root] = index
+        if refresh:
+            index.refresh()
+        try:
+            index.save()
+        except OSError:
+            #read-only directories can still be searched, the index just isn't kept
+            pass
+        return index
+
+    #K:V = directory Path:TextIndex
+    text_indexes:dict = None
+
+    def get_text_index(self, root:Path):
+        """Returns the full-text index of a directory, loading it again if another process changed it"""
+        from textindex import TextIndex
+        if self.text_indexes is None:
+            self.text_indexes = {}
+        index = self.text_indexes.get(root)
+        if index is None or index.is_stale():
+            if index is not None:
+                index.close()
+            index = TextIndex(root)
+            self.text_indexes[root] = index
+        return index
+
+    def update_text_index(self, path:Path):
+        """Re-indexes a saved recipe file in the full-text index of the nearest directory above it that has one"""
+        if path.suffix != ".json":
+            return
+        from textindex import TextIndex
+        path = Path(os.path.abspath(path))
+        with self.index_lock:
+            for root in path.parents:
+                if TextIndex.exists_at(root):
+                    try:
+                        self.get_text_index(root).update(path)
+                    except OSError as e:
+                        print(f"{self.COLORS['WARN']} full-text index not updated: {e}{self.COLORS['NORM']}")
+                    return
+
+    def find_recipes(self, term:str, field:str=None):
+        """Prints the recipes under the current directory matching the search term"""
+        with self.index_lock:
+            index = self.get_index(self.cwd_path())
+            results = index.search(term, field)
+            for rel, title in results:
+                print(f"  {self.COLORS['ACCENT']}{rel}{self.COLORS['NORM']} - {title}")
+            print(f"{len(results)} recipe(s) found.")
+
+    def grep_command(self, args:list):
+        """Parses and runs `grep [--refresh|--rebuild] [-n limit] words "a phrase"...`.
+        The index of the current directory is built the first time, after that
+        saves keep it up to date, and --refresh picks up files changed by other programs."""
+        COLORS = self.COLORS
+        usage = f"{COLORS['WARN']} usage: grep [--refresh|--rebuild] [-n limit] words \"a phrase\"..."
+        refresh = rebuild = False
+        limit = 20
+        words = []
+        phrases = []
+        while args:
+            arg = args.pop(0)
+            if arg == "--refresh":
+                refresh = True
+            elif arg == "--rebuild":
+                rebuild = True
+            elif arg == "-n" and args:
+                try:
+                    limit = int(args.pop(0))
+                except ValueError:
+                    print(usage)
+                    return
+            elif any(char.isspace() for char in arg):
+                phrases.append(arg)
+            else:
+                words.append(arg)
+        root = self.cwd_path()
+        with self.index_lock:
+            index = self.get_text_index(root)
+            from textindex import TextIndex
+            try:
+                if rebuild:
+                    added, _ = index.rebuild()
+                    print(f"Indexed {added} recipe(s).")
+                elif refresh or not TextIndex.exists_at(root):
+                    added, dropped = index.refresh()
+                    if added or dropped:
+                        print(f"Indexed {added} recipe(s), dropped {dropped}.")
+            except OSError as e:
+                #read-only directories can't keep an index
+                print(f"{COLORS['WARN']} can't write the index: {e}{COLORS['NORM']}")
+                return
+            if not words and not phrases:
+                if not (refresh or rebuild):
+                    print(usage)
+                return
+            results = index.search(words, phrases, limit)
+            for rel, title, score in results:
+                print(f"  {COLORS['ACCENT']}{rel}{COLORS['NORM']} - {title} ({round(score, 2)})")
+            print(f"{len(results)} recipe(s) found.")
+
+    def ls_command(self, args:list):
+        """Parses and runs `ls [path] [-R] [-l] [-j workers]`"""
+        COLORS = self.COLORS
+        recursive = long = False
+        jobs = 1
+        positional = []
+        while args:
+            arg = args.pop(0)
+            if arg == "-j" and args:
+                try:
+                    jobs = int(args.pop(0))
+                except ValueError:
+                    print(f"{COLORS['WARN']} usage: ls [path] [-R] [-l] [-j workers]")
+                    return
+            elif arg.startswith("-") and len(arg) > 1 and set(arg[1:]) <= set("Rl"):
+                recursive = recursive or "R" in arg
+                long = long or "l" in arg
+            else:
+                positional.append(arg)
+        root = self.cwd_path()/positional[0] if positional else self.cwd_path()
+        if not root.is_dir():
+            print(f"{COLORS['WARN']} invalid path")
+            return
+        from listing import walk
+        from journal import Journal
+        with self.index_lock if long else nullcontext():
+            #recipe titles and counts come from the directory's index, only changed files are read
+            index = self.get_index(root, refresh=False) if long else None
+            for path, entries in walk(root, recursive, jobs):
+                rel_dir = os.path.relpath(path, root)
+                if recursive:
+                    print(f"{COLORS['OS_PATH']}{rel_dir}:{COLORS['NORM']}")
+                if not long:
+                    for entry in entries:
+                        child_type = "D" if entry.is_dir() else "F"
+                        print(f"  {child_type} - {entry.name}")
+                    continue
+                names = {entry.name: entry for entry in entries}
+                for entry in entries:
+                    self.print_long_entry(index, rel_dir, entry, names.get(entry.name + Journal.SUFFIX))
+            if index is not None and index.dirty:
+                try:
+                    index.save()
+                except OSError:
+                    pass
+
+    def print_long_entry(self, index, rel_dir:str, entry, journal_entry=None):
+        """One line of `ls -l`: title, ingredient and step counts of recipes, size of other files"""
+        COLORS = self.COLORS
+        if entry.is_dir():
+            print(f"  D - {COLORS['OS_PATH']}{entry.name}/{COLORS['NORM']}")
+            return
+        line = None
+        try:
+            if entry.name.endswith(".json") and not entry.name.startswith("."):
+                rel = entry.name if rel_dir == "." else f"{Path(rel_dir).as_posix()}/{entry.name}"
+                recipe_entry = index.lookup(rel, entry, journal_entry)
+                if index.ERROR not in recipe_entry:
+                    ingredients = len(recipe_entry[index.INGREDIENTS])
+                    line = (f"  R - {COLORS['ACCENT']}{entry.name}{COLORS['NORM']}\t{recipe_entry[index.TITLE]}"
+                        f"\t{ingredients} ingredient(s), {recipe_entry[index.STEPS]} step(s)")
+            if line is None:
+                line = f"  F - {entry.name}\t{entry.stat().st_size} bytes"
+        except OSError:
+            #removed since it was listed
+            line = f"  ? - {entry.name}"
+        print(line)
+
+    def bulk_command(self, args:list):
+        """Parses and runs `bulk metric|scale [factor] [path] [-o outdir] [-j workers]`"""
+        COLORS = self.COLORS
+        usage = f"{COLORS['WARN']} usage: bulk metric|scale [factor] [path] [-o outdir] [-j workers]"
+        if len(args) == 0 or args[0] not in ("metric", "scale"):
+            print(usage)
+            return
+        action = args.pop(0)
+        options = {"-o": None, "-j": None}
+        positional = []
+        while args:
+            arg = args.pop(0)
+            if arg in options and args:
+                options[arg] = args.pop(0)
+            else:
+                positional.append(arg)
+        try:
+            factor = float(positional.pop(0)) if action == "scale" else 1
+            jobs = None if options["-j"] is None else int(options["-j"])
+        except (IndexError, ValueError):
+            print(usage)
+            return
+        root = self.cwd_path()/positional[0] if positional else self.cwd_path()
+        out_root = None if options["-o"] is None else self.cwd_path()/options["-o"]
+        if not root.exists():
+            print(f"{COLORS['WARN']} invalid path")
+            return
+        import bulk
+        counts, failures = bulk.bulk_convert(root, action, factor, out_root, jobs)
+        print(f"{counts[bulk.DONE]} converted, {counts[bulk.SKIPPED]} skipped, {counts[bulk.FAILED]} failed.")
+        for src, message in failures:
+            print(f"{COLORS['WARN']}  {src}: {message}{COLORS['NORM']}")
 
-        #allows scripts to access recipe mode commands
-        if self.RCPFLAG:
+    def export_command(self, args:list):
+        """Parses and runs `export [path] [-o outdir] [-j workers] [--html]`"""
+        COLORS = self.COLORS
+        usage = f"{COLORS['WARN']} usage: export [path] [-o outdir] [-j workers] [--html]"
+        options = {"-o": "export", "-j": None}
+        html = False
+        positional = []
+        while args:
+            arg = args.pop(0)
+            if arg in options and args:
+                options[arg] = args.pop(0)
+            elif arg == "--html":
+                html = True
+            else:
+                positional.append(arg)
+        try:
+            jobs = None if options["-j"] is None else int(options["-j"])
+        except ValueError:
+            print(usage)
+            return
+        root = self.cwd_path()/positional[0] if positional else self.cwd_path()
+        if not root.exists():
+            print(f"{COLORS['WARN']} invalid path")
+            return
+        import export
+        suffixes = (export.MARKDOWN, export.HTML) if html else (export.MARKDOWN,)
+        out_root = self.cwd_path()/options["-o"]
+        counts, failures = export.export_recipes(root, out_root, suffixes, jobs)
+        print(f"{counts[export.DONE]} exported to {str(out_root)}, {counts[export.FAILED]} failed.")
+        for name, message in failures:
+            print(f"{COLORS['WARN']} {name}: {message}{COLORS['NORM']}")
+
+    def import_command(self, args:list):
+        """Parses and runs `import [path] [-o outdir] [-j workers]`. Failures are printed as they
+        come in, then listed again with the totals, so they don't scroll away on big imports."""
+        COLORS = self.COLORS
+        usage = f"{COLORS['WARN']} usage: import [path] [-o outdir] [-j workers]"
+        options = {"-o": "imported", "-j": None}
+        positional = []
+        while args:
+            arg = args.pop(0)
+            if arg in options and args:
+                options[arg] = args.pop(0)
+            else:
+                positional.append(arg)
+        try:
+            jobs = None if options["-j"] is None else int(options["-j"])
+        except ValueError:
+            print(usage)
+            return
+        root = self.cwd_path()/positional[0] if positional else self.cwd_path()
+        if not root.exists():
+            print(f"{COLORS['WARN']} invalid path")
+            return
+        import jsonld
+        out_root = self.cwd_path()/options["-o"]
+        counts = {jsonld.DONE: 0, jsonld.SKIPPED: 0, jsonld.FAILED: 0}
+        failures = []
+        for src, status, message in jsonld.import_pages(root, out_root, jobs):
+            counts[status] += 1
+            src = os.path.relpath(src, self.cwd_path())
+            if status == jsonld.FAILED:
+                failures.append((src, message))
+                print(f"{COLORS['WARN']} {src}: {message}{COLORS['NORM']}", flush=True)
+            elif status == jsonld.DONE:
+                print(f"  {src}", flush=True)
+        print(f"{counts[jsonld.DONE]} imported to {str(out_root)}, {counts[jsonld.SKIPPED]} without a recipe, \
+{counts[jsonld.FAILED]} failed.")
+        for src, message in failures:
+            print(f"{COLORS['WARN']} {src}: {message}{COLORS['NORM']}")
+
+    def aggregate_command(self, args:list):
+        """Parses and runs `aggregate path[@factor]... [-f menu.txt] [-o out.json]`.
+        Paths can be recipe files, globs, cookbooks or `book.jsonl:key`."""
+        COLORS = self.COLORS
+        usage = f"{COLORS['WARN']} usage: aggregate path[@factor]... [-f menu.txt] [-o out.json]"
+        options = {"-f": None, "-o": None}
+        specs = []
+        while args:
+            arg = args.pop(0)
+            if arg in options and args:
+                options[arg] = args.pop(0)
+            else:
+                specs.append(arg)
+        import aggregate
+        if options["-f"] is not None:
+            try:
+                specs.extend(aggregate.read_specs(self.cwd_path()/options["-f"]))
+            except OSError:
+                print(f"{COLORS['WARN']} can't read {options['-f']}{COLORS['NORM']}")
+                return
+        sources = []
+        for spec in specs:
             try:
-                return self.manip_recipe(cmd)
-            # except TypeError as e:
-            #     if e.__cause__ is None:
-            #         print(f"{COLORS['WARN']} Expected argument but none was supplied.")
-            #     print(str(e.__traceback__), file=sys.stderr)
+                sources.append(aggregate.Source.parse(spec, self.cwd_path()))
             except ValueError:
-                print(f"{COLORS['WARN']} Expected numeric argument but string was given.")
-            
-        
-        tokens = self.tokenizer(cmd)
-        root_cmd = next(tokens)
-        # print(f"command was: {repr(root_cmd)}")
-        if(root_cmd == "cd"):
-            arg = next(tokens)
-            if arg is not None:
-                cd_path = Path(arg)
-                if not cd_path.exists():
-                    print(f"{COLORS['WARN']} invalid path")
-                os.chdir(cd_path)
+                print(f"{COLORS['WARN']} expected a numeric factor after @ in {spec}{COLORS['NORM']}")
+                return
+        if not sources:
+            print(usage)
+            return
+        totals, count, errors = aggregate.aggregate(sources)
+        for spec, message in errors:
+            print(f"{COLORS['WARN']} {spec}: {message}{COLORS['NORM']}")
+        if options["-o"] is not None:
+            import json
+            with open(self.cwd_path()/options["-o"], "w") as outfile:
+                json.dump(totals, outfile, indent=4)
+        else:
+            for name in sorted(totals, key=str.lower):
+                amounts = ", ".join(f"{round(amount, 2)} {unit}".rstrip() for unit, amount in totals[name].items())
+                print(f"  - {amounts} {name}")
+        print(f"{len(totals)} ingredient(s) from {count} recipe(s).")
+
+    def dedupe_command(self, args:list):
+        """Parses and runs `dedupe [paths...] [-t threshold] [-o out.json]`, the current directory by default"""
+        COLORS = self.COLORS
+        usage = f"{COLORS['WARN']} usage: dedupe [paths...] [-t threshold] [-o out.json]"
+        options = {"-t": "0.7", "-o": None}
+        paths = []
+        while args:
+            arg = args.pop(0)
+            if arg in options and args:
+                options[arg] = args.pop(0)
             else:
-                print(f"{COLORS['WARN']} Arguments expected. No arguments entered.")
-        elif(root_cmd == "ls"):
-            #TODO: dumb ls, only does current dir
-            # print(os.getcwd())
-            for child in self.cwd_path().iterdir():
-                child_type = "D" if child.is_dir() else "F"
-                print(f"  {child_type} - {child.name}")
-        elif(root_cmd == "pwd"):
-            print(os.getcwd())
-        elif(root_cmd == "echo"):
-            print(" ".join(list(tokens)[:-1]))
-        elif(root_cmd == "help"):
-            arg = next(tokens)
-            if arg in self.COMMAND_DICT:
-                print(f"\t{arg}\t{self.COMMAND_DICT[arg]}")
+                paths.append(self.cwd_path()/arg)
+        try:
+            threshold = float(options["-t"])
+        except ValueError:
+            print(usage)
+            return
+        import dedupe
+        try:
+            groups, count = dedupe.find_duplicates(paths or [self.cwd_path()], self.cwd_path(), threshold)
+        except FileNotFoundError as e:
+            print(f"{COLORS['WARN']} {e}{COLORS['NORM']}")
+            return
+        if options["-o"] is not None:
+            import json
+            with open(self.cwd_path()/options["-o"], "w") as outfile:
+                json.dump([[{"name": name, "title": title, "match": reason} for name, title, reason in group]
+                    for group in groups], outfile, indent=4)
+        else:
+            for number, group in enumerate(groups, 1):
+                print(f"Group {number}:")
+                for name, title, reason in group:
+                    match = "" if reason is None else " (same srcurl)" if reason == "srcurl" else f" ({round(reason, 2)})"
+                    print(f"  {COLORS['ACCENT']}{name}{COLORS['NORM']} - {title}{match}")
+        print(f"{len(groups)} group(s) of near-duplicates among {count} recipe(s).")
+
+    def cookbook_command(self, args:list):
+        """Parses and runs `cookbook list|add|remove|compact book.jsonl [files or keys]`"""
+        COLORS = self.COLORS
+        if len(args) < 2 or args[0] not in ("list", "add", "remove", "compact"):
+            print(f"{COLORS['WARN']} usage: cookbook list|add|remove|compact book.jsonl [files or keys]")
+            return
+        from cookbook import Cookbook
+        action = args[0]
+        book = Cookbook(self.cwd_path()/args[1])
+        try:
+            if action == "list":
+                for key in book.keys():
+                    print(f"  {key}")
+                print(f"{len(book)} recipe(s), {book.dead_bytes} bytes of tombstones.")
+            elif action == "add":
+                for rcp_file in args[2:]:
+                    rcp_path = self.cwd_path()/rcp_file
+                    if not rcp_path.exists():
+                        print(f"{COLORS['WARN']} {rcp_file} not found.{COLORS['NORM']}")
+                        continue
+                    key = book.append(Recipe(rcp_path))
+                    print(f"{COLORS['ACCENT']}Added:{COLORS['NORM']} {key}")
+            elif action == "remove":
+                for key in args[2:]:
+                    if not book.remove(key):
+                        print(f"{COLORS['WARN']} No recipe {key} in the cookbook.{COLORS['NORM']}")
             else:
-                for cmd_name, helptxt in self.COMMAND_DICT.items():
-                    print(f"\t{cmd_name}\t{helptxt}")
-        elif(root_cmd == "open"):
-            self.open_recipe(next(tokens))
-            # print(self.RCPFLAG)
-        elif(root_cmd == "exit"):
-            print("Bye!")
-            return False
-        else: 
-            print(f"{COLORS['WARN']}Command not recognized. enter \
-                '{COLORS['NORM']}help{COLORS['WARN']}' to see available commands")
-        return True
+                reclaimed = book.compact()
+                print(f"Compacted, {reclaimed} bytes reclaimed.")
+        finally:
+            book.close()
 
-    def open_recipe(self, rcp_path_str:str, name:str=None):
-        """ opens a recipe and sets the appropriate flags in storage. 
+    def open_recipe(self, rcp_path_str:str, name:str=None, key:str=None):
+        """ opens a recipe as a named session and makes it the current recipe.
         Returns false if file failed to open for some reason.
+        key selects a recipe inside a cookbook file.
+        name defaults to the path (and key), reopening a session reuses its cached recipe.
         """
-        #name arg is currently unused, would allow for storing multiple recipes, 
-        #which would require a different syntax
-        if rcp_path_str is not None:
-            self.rcp_path = self.cwd_path()/rcp_path_str
-            print(f"Opening {str(self.rcp_path)}")
-            self.RCPFLAG = True
-            self.my_recipe = Recipe(self.rcp_path)
+        if rcp_path_str is None:
+            return False
+        rcp_path = self.cwd_path()/rcp_path_str
+        if name is None:
+            name = rcp_path_str if key is None else f"{rcp_path_str}:{key}"
+        print(f"Opening {str(rcp_path)}" + ("" if key is None else f" : {key}"))
+        session = self.sessions.get(name)
+        if session is not None and (session.path != rcp_path or session.key != key):
+            #the name is reused for another recipe, let go of the old one like an eviction
+            cached = self.recipes.pop(name)
+            if cached is not None and not self.evict_recipe(cached):
+                self.recipes.put(cached)
+                print(f"{self.COLORS['WARN']} {name} is still open with unsaved changes.{self.COLORS['NORM']}")
+                return False
+            session = None
+        if session is None:
+            session = Session(name, rcp_path, key)
+            self.sessions[name] = session
+        self.use_session(name)
+        return True
+
+    def use_session(self, name:str):
+        """Makes a session's recipe the current one, parsing it again if it was evicted
+        or if its file changed on disk since it was loaded."""
+        session = self.sessions[name]
+        if self.recipes.get(name) is None or session.recipe is None:
+            session.load()
+            self.recipes.put(session)
+        elif session.is_stale():
+            if session.is_dirty():
+                print(f"{self.COLORS['WARN']}{session.path.name} changed on disk, \
+but {name} has unsaved changes. Keeping them.{self.COLORS['NORM']}")
+            else:
+                print(f"{session.path.name} changed on disk, reloading.")
+                session.load()
+        self.session_name = name
+        self.my_recipe = session.recipe
+        self.rcp_path = session.path
+        self.rcp_key = session.key
+        self.RCPFLAG = True
+
+    def list_sessions(self):
+        COLORS = self.COLORS
+        if not self.sessions:
+            print("No open recipes.")
+        for name, session in self.sessions.items():
+            current = "*" if name == self.session_name else " "
+            state = "not loaded" if session.recipe is None else ("unsaved" if session.is_dirty() else "loaded")
+            print(f" {current} {COLORS['ACCENT']}{name}{COLORS['NORM']}\t{session.path.name}\t{state}")
+
+    def evict_recipe(self, session:Session):
+        """Lets go of a session's parsed recipe, writing it back first if it has unsaved changes.
+        Interactive frontends ask instead.
+        Returns False, keeping the recipe, if the changes couldn't be saved."""
+        my_recipe = session.recipe
+        if my_recipe is None:
             return True
-        return False
+        if my_recipe.modified:
+            write_back = True
+            if self.interactive:
+                yes = input(f"{self.COLORS['WARN']}{session.name} has unsaved changes and is being closed \
+to make room. Save it? (must type '{self.COLORS['NORM']}yes{self.COLORS['WARN']}')")
+                write_back = yes == "yes"
+            if write_back:
+                print(f"Saving {session.name} to {str(session.path)}")
+                if not self.save_session(session):
+                    print(f"{self.COLORS['WARN']} Keeping {session.name} open.{self.COLORS['NORM']}")
+                    return False
+        elif my_recipe.journal_ops > 0 and not my_recipe.pending:
+            my_recipe.compact()
+        session.recipe = None
+        return True
+
+    def save_recipe(self, path:Path, key:str=None):
+        """Writes the open recipe to a recipe file, or appends it to a cookbook under key.
+        Returns False if another process's changes or lock got in the way."""
+        from cookbook import Cookbook
+        from locking import SaveConflict, LockTimeout
+        try:
+            if Cookbook.is_cookbook(path):
+                book = Cookbook(path)
+                try:
+                    book.append(self.my_recipe, key)
+                finally:
+                    book.close()
+            else:
+                result = self.my_recipe.save(path)
+                if result == Recipe.SAVE_SKIPPED:
+                    print("No changes to save.")
+                    return True
+                self.update_text_index(path)
+        except (SaveConflict, LockTimeout) as e:
+            self.print_save_error(e)
+            return False
+        self.saved_paths.append(path)
+        session = self.sessions.get(self.session_name)
+        if session is not None and session.path == path and session.key == key:
+            #our own write doesn't make the cached recipe stale
+            session.mark_saved()
+        return True
+
+    def save_session(self, session:Session):
+        """Saves a session's recipe back to where it came from, whether or not it is the current one.
+        Returns False if another process's changes or lock got in the way."""
+        my_recipe = session.recipe
+        from locking import SaveConflict, LockTimeout
+        try:
+            if session.key is not None:
+                from cookbook import Cookbook
+                book = Cookbook(session.path)
+                try:
+                    book.append(my_recipe, session.key)
+                finally:
+                    book.close()
+            elif my_recipe.save() != Recipe.SAVE_SKIPPED:
+                self.update_text_index(session.path)
+        except (SaveConflict, LockTimeout) as e:
+            self.print_save_error(e)
+            return False
+        my_recipe.modified = False
+        self.saved_paths.append(session.path)
+        session.mark_saved()
+        return True
+
+    def print_save_error(self, e:Exception):
+        """Explains a save that another process got in the way of"""
+        from locking import SaveConflict
+        if isinstance(e, SaveConflict):
+            print(f"{self.COLORS['WARN']} Not saved, {e}. Save to another file, or reopen the recipe to start over from it.{self.COLORS['NORM']}")
+        else:
+            print(f"{self.COLORS['WARN']} Not saved, {e}.{self.COLORS['NORM']}")
 
     def close_recipe(self, name = None):
-        """Closes recipe. name parameter is unused"""
-        if self.my_recipe is not None and self.my_recipe.modified:
+        """Closes a session, the current one if name is None, returning to file explorer mode
+        if it was the current one."""
+        name = self.session_name if name is None else name
+        session = self.sessions.get(name)
+        my_recipe = None if session is None else session.recipe
+        if my_recipe is not None and my_recipe.modified:
+            if not self.interactive:
+                print(f"{self.COLORS['WARN']}Your recipe has unsaved changes. Not closing.")
+                return
             yes = input(f"{self.COLORS['WARN']}Your recipe has unsaved changes. \
                     Close anyways? (must type '{self.COLORS['NORM']}yes{self.COLORS['WARN']}')")
             if yes != "yes":
                 return
-        self.my_recipe = None
-        self.RCPFLAG=False
-        self.rcp_path=None
+        if my_recipe is not None and my_recipe.journal_ops > 0 and not my_recipe.pending:
+            #fold the journal back into the recipe file while nothing is unsaved
+            my_recipe.compact()
+        self.sessions.pop(name, None)
+        self.recipes.pop(name)
+        if name == self.session_name:
+            self.my_recipe = None
+            self.RCPFLAG=False
+            self.rcp_path=None
+            self.rcp_key=None
+            self.session_name = None
 
-    RCP_COMMANDS={
-        "help":"prints all available commands",
-        "display":"prints the whole recipe as a Markdown",
+    #recipe mode commands
+    #let's copy kubectl-style commands
+    #format is: action target *arguments...
 
-        "get":"get some information about the recipe (metadata [key], step [i])",
-        "add":"add information to the recipe \t(step, recipe)",
-        "set":"changes recipe information. (title, author, serves, srcurl)",
-        "remove":"removes a step",
+    @RECIPE.command("help", params=(Param("command", required=False),), help="prints all available commands")
+    def recipe_help_command(self, verb:str=None):
+        self.print_help(RECIPE, verb)
 
-        "metric":"converts a recipe's ingredients to metric",
-        "scale":"scales ingredients by a factor",
+    @RECIPE.command("display", help="prints the whole recipe as a Markdown")
+    def display_command(self):
+        #TODO: may need to change cursor on terminal
+        print(str(self.my_recipe))
 
-        "save":"saves a recipe to given path, or original path if none.\t 1 optional path argument",
-        "close":"closes the recipe mode, returning to file explorer"
-    }
+    @RECIPE.command("export", params=(Param("path"),),
+        help="writes the recipe as Markdown, or HTML for .html paths\t 1 path argument")
+    def export_recipe_command(self, target:str):
+        from export import write_recipe
+        path = self.cwd_path()/target
+        write_recipe(self.my_recipe, path)
+        print(f"Exported to {str(path)}")
+
+    RECIPE.describe("get", "get some information about the recipe (metadata [key], step [i])")
 
-    def manip_recipe(self, cmd:str):
-        """handles recipe manipulation, parses commands"""
+    @RECIPE.command("get", "title", help="get title of the recipe.")
+    def get_title_command(self):
+        print(f"{self.my_recipe.title}")
 
+    @RECIPE.command("get", "metadata", params=(Param("key", required=False),),
+        help="get metadata by key. If no key supplied, prints all keys available.\t 1 argument")
+    def get_metadata_command(self, key:str=None):
+        my_recipe = self.my_recipe
+        if key is None:
+            print("  ".join(my_recipe.cli_get_metadata_keys()))
+            print(f"{self.COLORS['ACCENT']} To access any of the keys, type \
+                '{self.COLORS['NORM']}get metadata [key]'.")
+        else:
+            print(f"{key} = {my_recipe.cli_get_metadata(key)}")
+
+    @RECIPE.command("get", "step", params=(Param("i", int, required=False),),
+        help="get a step by number, or all of them.\t 0 or 1 arguments")
+    def get_step_command(self, num:int=None):
+        steps = self.my_recipe.steps
+        if num is not None and num <= len(steps) and num > 0:
+            print(f"Step {num}. {steps[num-1]}")
+            return
+        for number, step in enumerate(steps):
+            print(f"Step {number+1}. {step}")
+
+    @RECIPE.command("get", "units", help="get supported convertible units")
+    def get_units_command(self):
         COLORS = self.COLORS
-        #let's copy kubectl-style commands
-        #format is: action target *arguments...
+        for label, dim in (("Mass Units:", UNITS.MASS), ("Volume Units:", UNITS.VOLUME)):
+            print(label)
+            for unit, aliases in UNITS.units_of(dim):
+                print(f"\t{unit}\t{COLORS['ACCENT']}{', '.join(aliases)}{COLORS['NORM']}")
+
+    RECIPE.describe("add", "add information to the recipe \t(step, ingredient, metadata)")
+
+    @RECIPE.command("add", "metadata", params=(Param("key"), Param("value")),
+        help="add or set metadata by key and value.\t 2 arguments")
+    def add_metadata_command(self, key:str, val:str):
+        self.my_recipe.cli_custom_metadata(key, val)
+
+    @RECIPE.command("add", "step", params=(Param("sentence", REST),),
+        help="add a step to the recipe.\t 1 or more arguments (treated as a sentence)")
+    def add_step_command(self, my_step:str):
+        COLORS = self.COLORS
+        i = len(self.my_recipe.steps) + 1
+        print(f"{COLORS['ACCENT']}Added: {COLORS['NORM']} Step {i}. {my_step}")
+        self.my_recipe.cli_add_step(my_step)
+
+    @RECIPE.command("add", "ingredient", params=(Param("what"), Param("amount", float), Param("unit", required=False, default="")),
+        help="add an ingredient. (see 'get units')\t three arguments (what, amount, unit)")
+    def add_ingredient_command(self, ingr:str, amount:float, unit:str):
+        self.my_recipe.cli_add_ingredient(ingr, amount, unit)
+
+    RECIPE.describe("set", "changes recipe information. (title, author, serves, srcurl)")
+
+    @RECIPE.command("set", "title", params=(Param("title"),), help="set title of the recipe.\t 1 argument")
+    def set_title_command(self, name:str):
+        self.my_recipe.cli_set_title(name)
+
+    @RECIPE.command("set", "author", params=(Param("author"),), help="set the author of the recipe.\t 1 argument")
+    def set_author_command(self, name:str):
+        self.my_recipe.cli_set_author(name)
+
+    @RECIPE.command("set", "serves", params=(Param("number", int),),
+        help="number of people served by the recipe.\t 1 numeric argument")
+    def set_serves_command(self, num:int):
+        self.my_recipe.cli_set_serves(num)
+
+    @RECIPE.command("set", "srcurl", params=(Param("url"),), help="the source url of the recipe.\t 1 argument")
+    def set_srcurl_command(self, url:str):
+        self.my_recipe.cli_set_srcurl(url)
+
+    @RECIPE.command("set", "metadata", params=(Param("key"), Param("value")),
+        help="custom metadata.\t 2 arguments, key then value")
+    def set_metadata_command(self, key:str, val:str):
+        self.my_recipe.cli_custom_metadata(key, val)
+
+    RECIPE.describe("remove", "removes a step, an ingredient or metadata")
+
+    @RECIPE.command("remove", "step", params=(Param("i", required=False),),
+        help="remove the last step, or the specified step number.\t 0 or 1 arguments")
+    def remove_step_command(self, num:str=None):
         my_recipe = self.my_recipe
-        RCP_COMMANDS = self.RCP_COMMANDS
-        tokens = self.tokenizer(cmd)
-        root = next(tokens)
-
-        if root == "help":
-            arg = next(tokens)
-            if arg in RCP_COMMANDS:
-                print(f"\t{arg}\t{RCP_COMMANDS[arg]}")
-            else:
-                for cmd_name, helptxt in RCP_COMMANDS.items():
-                    print(f"\t{cmd_name}\t{helptxt}")
-
-
-        elif root == "display":
-            #TODO: may need to change cursor on terminal
-            # if self.BLEST:
-            #     with self.term.fullscreen():
-            #         print(str(my_recipe))
-            #         input("press enter to quit")
-            # else:
-            print(str(self.my_recipe))
-
-
-        elif root == "get":
-            what = next(tokens)
-            if what == "metadata":
-                key = next(tokens)
-                keys = my_recipe.cli_get_metadata_keys()
-                if key is not None and key in keys:
-                    print("  ".join(keys))
-                    print(f"{self.COLORS['ACCENT']} To access any of the keys, type \
-                        '{self.COLORS['NORM']}get metadata [key]'.")
-                else:
-                    print(f"{key} = {my_recipe.cli_get_metadata(key)}")
-            elif what == "title":
-                print(f"{my_recipe.title}")
-            elif what == "step":
-                numnun = next(tokens)
-                steps = my_recipe.steps
-                printall = True
-                if numnun is not None:
-                    num = int(numnun)
-                    if num < len(steps) and num > 0:
-                        print(f"Step {num}. {steps[num-1]}")
-                        printall = False
-                if printall:
-                    for number, step in enumerate(steps):
-                        print(f"Step {number+1}. {step}")
-            
-            elif what == "units":
-                munit = IngredientAmount.MASS_CONV
-                vunit = IngredientAmount.VOLUME_CONV
-                print("Mass Units:")
-                for mu in munit:
-                    print(f"\t{mu}")
-                print("Volume Units:")
-                for vu in vunit:
-                    print(f"\t{vu}")
-            
-            else: 
-                print(f"{COLORS['WARN']} invalid get argument.")
-                print(f"Possible arguments for get command: ")
-                RECIPE_GET_DICT={
-                    "title":"get title of the recipe.",
-                    "metadata":"get metadata by key. If no key supplied, prints all keys available.\t 1 argument",
-                    "units":"get supported convertible units"
-                }
-                for get_cmd, help_txt in RECIPE_GET_DICT.items():
-                    print(f"{COLORS['ACCENT']}{get_cmd}\t{COLORS['NORM']}{help_txt}")
-
-
-        elif root == "add":
-            what = next(tokens)
-            if what == "step":
-                the_step = list(tokens)
-                # print(the_step)
-                my_step = " ".join(the_step[:-1])
-                i = len(my_recipe.steps) + 1
-                print(f"{COLORS['ACCENT']}Added: {COLORS['NORM']} Step {i}. {my_step}")
-                my_recipe.cli_add_step(my_step)
-
-            elif what == "ingredient":
-                ingr = next(tokens)
-                amount = float(next(tokens))
-                unit = next(tokens)
-                my_recipe.cli_add_ingredient(ingr, amount, unit)
-
-            elif what == "metadata":
-                key = next(tokens)
-                not_added = True
-                if key is not None:
-                    val = next(tokens)
-                    if val is not None:
-                        my_recipe.cli_custom_metadata(key, val)
-                        not_added = False
-                if not_added:
-                    print(f"{COLORS}No key added. Missing arguments")
+        if num is None:
+            my_recipe.cli_remove_step()
+            return
+        try:
+            my_recipe.cli_remove_step(int(num) - 1)
+        except (IndexError, ValueError):
+            print(f"{self.COLORS['WARN']} Invalid index. \
+                There are {len(my_recipe.steps)} steps in the recipe.")
 
-            else:
-                print(f"{COLORS['WARN']} invalid add argument.")
-                print(f"Possible arguments for add command: ")
-                RECIPE_ADD_DICT={
-                    "metadata":"add or set metadata by key and value.\t 2 arguments",
-                    "step":"add a step to the recipe.\t 1 or more arguments (treated as a sentence)",
-                    "ingredient":f"add an ingredient. (see '{COLORS['ACCENT']}get units{COLORS['NORM']}')\
-                        \t three arguments (what, amount, unit)"
-                }
-                for add_cmd, help_txt in RECIPE_ADD_DICT.items():
-                    print(f"{COLORS['ACCENT']}{add_cmd}\t{COLORS['NORM']}{help_txt}")
-
-        elif root == "set":
-            what = next(tokens)
-            if what == "title":
-                name = next(tokens)
-                my_recipe.cli_set_title(name)
-            elif what == "author":
-                name = next(tokens)
-                my_recipe.cli_set_author(name)
-            elif what == "serves":
-                num = int(next(tokens))
-                my_recipe.cli_set_serves(num)
-            elif what == "srcurl":
-                url = next(tokens)
-                my_recipe.cli_set_srcurl(url)
-            elif what == "metadata":
-                key = next(tokens)
-                not_added = True
-                if key is not None:
-                    val = next(tokens)
-                    if val is not None:
-                        my_recipe.cli_custom_metadata(key, val)
-                        not_added = False
-                if not_added:
-                    print(f"{COLORS}No key added. Missing arguments")
-            else:
-                print(f"{COLORS['WARN']} invalid set argument.")
-                print(f"Possible arguments for set: ")
-                RECIPE_SET_DICT={
-                    "title":"set title of the recipe.\t 1 argument",
-                    "author":"set the author of the recipe.\t 1 argument",
-                    "serves":"number of people served by the recipe.\t 1 numeric argument",
-                    "srcurl":"the source url of the recipe.\t 1 argument",
-                    "metadata":"custom metadata.\t 2 arguments, key then value"
-                }
-                for set_cmd, help_txt in RECIPE_SET_DICT.items():
-                    print(f"{COLORS['ACCENT']}{set_cmd}\t{COLORS['NORM']}{help_txt}")
-
-
-        elif root == "remove":
-            what = next(tokens)
-            if what == "metadata":
-                key = next(tokens)
-                my_recipe.cli_remove_metadata(key)
-
-            elif what == "step":
-                try:
-                    num = int(next(tokens)) - 1
-                    my_recipe.cli_remove_step(num)
-                except (IndexError, ValueError):
-                    print(f"{self.COLORS['WARN']} Invalid index. \
-                        There are {len(my_recipe.steps)} steps in the recipe.")
-                except TypeError:
-                    my_recipe.cli_remove_step()
-            
-            elif what == "ingredient":
-                ingr = next(tokens)
-                status = my_recipe.cli_remove_ingredient(ingr)
-                if status == False:
-                    print("No matching ingredient found!")
-            else: 
-                print(f"{self.COLORS['WARN']} invalid remove argument.")
-                print(f"Possible arguments for remove command: ")
-                RECIPE_RMV_DICT={
-                    "step":"remove the last step, or the specified step number.\t 0 or 1 arguments",
-                    "ingredient":"remove an ingredient by the name of the ingredient.\t 1 argument",
-                    "metadata":"remove a key value pair by the key.\t 1 arguments"
-                }
-                for rmv_cmd, help_txt in RECIPE_RMV_DICT.items():
-                    print(f"{COLORS['ACCENT']}{rmv_cmd}\t{COLORS['NORM']}{help_txt}")
-
-
-        elif root == "save":
-            target = next(tokens)
-            print(repr(target))
-            if target is not None and target.strip() != "":
-                print("saving to specified file", target)
-                my_recipe.write_json(target)
-            else:
-                print("saving to default file", str(self.rcp_path))
-                my_recipe.write_json(self.rcp_path)
-            my_recipe.modified=False
+    @RECIPE.command("remove", "ingredient", params=(Param("what"),),
+        help="remove an ingredient by the name of the ingredient.\t 1 argument")
+    def remove_ingredient_command(self, ingr:str):
+        if not self.my_recipe.cli_remove_ingredient(ingr):
+            print("No matching ingredient found!")
 
-        elif root == "close":
-            self.close_recipe()
+    @RECIPE.command("remove", "metadata", params=(Param("key"),), help="remove a key value pair by the key.\t 1 arguments")
+    def remove_metadata_command(self, key:str):
+        self.my_recipe.cli_remove_metadata(key)
 
+    @RECIPE.command("metric", params=(Param("ingredient", required=False),), help="converts a recipe's ingredients to metric")
+    def metric_command(self, ingr:str=None):
+        self.my_recipe.cli_to_metric(ingr)
+
+    @RECIPE.command("scale", params=(Param("factor", float),), help="scales ingredients by a factor")
+    def scale_command(self, factor:float):
+        self.my_recipe.cli_scale(factor)
+
+    @RECIPE.command("save", params=(Param("path", required=False),),
+        help="saves a recipe to given path, or original path if none.\t 1 optional path argument")
+    def save_command(self, target:str=None):
+        if target is not None:
+            print("saving to specified file", target)
+            saved = self.save_recipe(self.cwd_path()/target)
         else:
-            if root == "metric":
-                ingr = next(tokens)
-                my_recipe.cli_to_metric(ingr)
+            print("saving to default file", str(self.rcp_path))
+            saved = self.save_recipe(self.rcp_path, self.rcp_key)
+        if saved:
+            self.my_recipe.modified=False
 
-            elif root == "scale":
-                factor = float(next(tokens))
-                my_recipe.cli_scale(factor)
+    @RECIPE.command("close", help="closes the recipe mode, returning to file explorer")
+    def close_command(self):
+        self.close_recipe()
 
-            else:
-                print(f"{self.COLORS['WARN']}Command {root} not recognized. enter \
-                    '{self.COLORS['NORM']}help{self.COLORS['WARN']}' to see available commands")
-        return True
     #end class
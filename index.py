@@ -0,0 +1,185 @@
+import os
+import json
+from pathlib import Path
+
+from recipe import Recipe
+from journal import Journal
+from stats import STATS
+
+def scan_recipes(root:Path, recursive:bool=True, journals:dict=None, skip:Path=None):
+    """Generator, yields (relative posix path, os.DirEntry) of every `.json` file under root.
+    Hidden files and directories (index files, temp files) are skipped, and so is the directory skip,
+    like an output tree being written under root.
+    If journals is a dict, the journals found are put in it, K:V = recipe's relative path:os.DirEntry
+    """
+    root = Path(root)
+    skip = None if skip is None else os.path.realpath(skip)
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and (skip is None or os.path.realpath(entry.path) != skip):
+                            stack.append(Path(entry.path))
+                    elif entry.name.endswith(".json"):
+                        rel = Path(entry.path).relative_to(root).as_posix()
+                        yield rel, entry
+                    elif journals is not None and entry.name.endswith(".json" + Journal.SUFFIX):
+                        rel = Path(entry.path[:-len(Journal.SUFFIX)]).relative_to(root).as_posix()
+                        journals[rel] = entry
+        except OSError:
+            continue
+
+class RecipeIndex:
+    """On-disk index of the recipes under a directory.
+
+    Keeps the title, ingredient names, step count and metadata of every `.json` recipe,
+    along with the file's mtime and size (and its journal's, if it has one).
+    Refreshing only re-parses files whose mtime or size changed since the last refresh.
+    """
+    INDEX_NAME = ".rcpindex.json"
+    VERSION = 2
+
+    #entry keys
+    MTIME = "mtime"
+    SIZE = "size"
+    JOURNAL = "journal"
+    TITLE = "title"
+    INGREDIENTS = "ingredients"
+    STEPS = "steps"
+    METADATA = "metadata"
+    ERROR = "error"
+
+    def __init__(self, root:Path):
+        self.root = Path(root)
+        self.index_path = self.root/self.INDEX_NAME
+        #K:V = relative path (posix style):entry dict
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """Reads the index file if there is one. A stale or broken index is just rebuilt."""
+        try:
+            with open(self.index_path, "r") as infile:
+                my_dict = json.load(infile)
+            if my_dict.get("version") == self.VERSION:
+                self.entries = my_dict["entries"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            self.entries = {}
+
+    def save(self):
+        """Writes the index next to the recipes, only if something changed."""
+        if not self.dirty:
+            return
+        tmp_path = self.index_path.with_name(self.INDEX_NAME + ".tmp")
+        with open(tmp_path, "w") as outfile:
+            json.dump({"version": self.VERSION, "entries": self.entries}, outfile)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    def scan(self, recursive:bool=True, journals:dict=None):
+        """Generator, yields (relative path, os.DirEntry) of every recipe file"""
+        return scan_recipes(self.root, recursive, journals)
+
+    def parse_entry(self, path:Path, stat, journal_sig=None):
+        """Reads one recipe file into an index entry. Unreadable files are
+        remembered as errors so they are not re-parsed until they change.
+        Journaled recipes are loaded through Recipe so the journal is applied."""
+        entry = {self.MTIME: stat.st_mtime_ns, self.SIZE: stat.st_size}
+        if journal_sig is not None:
+            entry[self.JOURNAL] = journal_sig
+        try:
+            if journal_sig is None:
+                with open(path, "r") as infile:
+                    my_dict = json.load(infile)
+                STATS.count("bytes_read", stat.st_size)
+            else:
+                my_dict = Recipe(path).get_dict()
+            entry[self.TITLE] = str(my_dict[Recipe.TITLE_KEY])
+            entry[self.INGREDIENTS] = list(my_dict[Recipe.INGR_KEY].keys())
+            entry[self.STEPS] = len(my_dict[Recipe.STEP_KEY])
+            entry[self.METADATA] = {str(key): str(val) for key, val in my_dict[Recipe.META_KEY].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            entry[self.ERROR] = True
+        return entry
+
+    def refresh(self, recursive:bool=True):
+        """Brings the index up to date with the directory.
+        Returns a tuple (files parsed, files dropped)
+        """
+        parsed = 0
+        seen = set()
+        journals = {}
+        #journals can be listed after their recipe, so look at the recipes once the scan is done
+        found = list(self.scan(recursive, journals))
+        for rel, dir_entry in found:
+            seen.add(rel)
+            old = self.entries.get(rel)
+            try:
+                if self.lookup(rel, dir_entry, journals.get(rel)) is not old:
+                    parsed += 1
+            except OSError:
+                continue
+        removed = [rel for rel in self.entries if rel not in seen]
+        for rel in removed:
+            del self.entries[rel]
+        if parsed or removed:
+            self.dirty = True
+        return parsed, len(removed)
+
+    def lookup(self, rel:str, dir_entry, journal_entry=None):
+        """Returns the entry of one recipe file, parsing the file only if it changed since it was indexed.
+        dir_entry and journal_entry are the os.DirEntry of the file and of its journal, if it has one.
+        Raises OSError if the file can't be stat'ed.
+        """
+        stat = dir_entry.stat()
+        journal_sig = None
+        if journal_entry is not None:
+            journal_stat = journal_entry.stat()
+            journal_sig = [journal_stat.st_mtime_ns, journal_stat.st_size]
+        old = self.entries.get(rel)
+        if (old is not None and old[self.MTIME] == stat.st_mtime_ns and old[self.SIZE] == stat.st_size
+                and old.get(self.JOURNAL) == journal_sig):
+            STATS.count("index_hits")
+            return old
+        entry = self.entries[rel] = self.parse_entry(Path(dir_entry.path), stat, journal_sig)
+        STATS.count("index_parsed")
+        self.dirty = True
+        return entry
+
+    FIELDS = ("title", "ingredient", "metadata")
+
+    def search(self, term:str, field:str=None):
+        """Case-insensitive substring search over the index.
+        field is one of FIELDS, a metadata key (author, serves, srcurl, ...), or None for everything.
+        Returns a sorted list of (relative path, title)
+        """
+        term = term.lower()
+        results = []
+        for rel, entry in self.entries.items():
+            if entry.get(self.ERROR):
+                continue
+            if self.entry_matches(entry, term, field):
+                results.append((rel, entry[self.TITLE]))
+        results.sort()
+        return results
+
+    def entry_matches(self, entry:dict, term:str, field:str=None):
+        metadata = entry[self.METADATA]
+        if field is None or field == "title":
+            if term in entry[self.TITLE].lower():
+                return True
+        if field is None or field == "ingredient":
+            if any(term in ingr.lower() for ingr in entry[self.INGREDIENTS]):
+                return True
+        if field is None or field == "metadata":
+            if any(term in val.lower() for val in metadata.values()):
+                return True
+        elif field in metadata:
+            return term in metadata[field].lower()
+        return False
@@ -0,0 +1,68 @@
+import os
+import json
+from pathlib import Path
+
+from stats import STATS
+
+class Journal:
+    """Append-only log of recipe operations, kept next to the recipe file as `name.journal`.
+
+    Each line holds the operations of one save, as a JSON list of [method name, *arguments].
+    Appends are fsync'd, and a line torn by a crash is ignored when the journal
+    is read back, so a save is either fully in the journal or not at all.
+    """
+    SUFFIX = ".journal"
+
+    def __init__(self, recipe_path:Path):
+        self.path = Path(str(recipe_path) + self.SUFFIX)
+
+    def exists(self):
+        return self.path.exists()
+
+    def read_ops(self):
+        """Returns the list of recorded operations"""
+        ops = []
+        if not self.path.exists():
+            return ops
+        with open(self.path, "r") as infile:
+            STATS.count("bytes_read", os.fstat(infile.fileno()).st_size)
+            for line in infile:
+                if not line.endswith("\n"):
+                    #torn write, the save it belonged to never finished
+                    break
+                try:
+                    ops.extend(json.loads(line))
+                except ValueError:
+                    break
+        return ops
+
+    def append(self, ops:list):
+        """Appends the operations of one save and waits for them to reach the disk"""
+        data = (json.dumps(ops) + "\n").encode("utf-8")
+        with open(self.path, "a+b") as outfile:
+            self.drop_torn_tail(outfile)
+            outfile.write(data)
+            STATS.count("bytes_written", len(data))
+            outfile.flush()
+            os.fsync(outfile.fileno())
+
+    @staticmethod
+    def drop_torn_tail(outfile):
+        """Truncates a partial last line left by a crash, so new lines don't get glued onto it.
+        Also used by cookbooks, which are appended to the same way."""
+        size = outfile.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        outfile.seek(size - 1)
+        if outfile.read(1) == b"\n":
+            return
+        outfile.seek(0)
+        content = outfile.read()
+        outfile.truncate(content.rfind(b"\n") + 1)
+        outfile.seek(0, os.SEEK_END)
+
+    def remove(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,256 @@
+import os
+import re
+import json
+import html
+from pathlib import Path
+
+from recipe import Recipe, IngredientAmount
+from units import UNITS
+from listing import walk
+from bulk import DONE, SKIPPED, FAILED, atomic_write, iter_chunks, run_chunks
+
+#suffixes of saved pages, compared lowercase
+PAGE_SUFFIXES = (".html", ".htm")
+
+#pages per task, like export's chunks
+CHUNK = 16
+
+SCRIPT = re.compile(r"<script\b[^>]*\btype\s*=\s*[\"']?application/ld\+json[^>]*>(.*?)</script\s*>",
+    re.IGNORECASE | re.DOTALL)
+#where the page came from, if the JSON-LD doesn't say
+CANONICAL = re.compile(r"<link\b[^>]*\brel\s*=\s*[\"']?canonical[\"']?[^>]*>", re.IGNORECASE)
+OG_URL = re.compile(r"<meta\b[^>]*\bproperty\s*=\s*[\"']?og:url[\"']?[^>]*>", re.IGNORECASE)
+ATTR_URL = re.compile(r"\b(?:href|content)\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+TAG = re.compile(r"<[^>]+>")
+SPACE = re.compile(r"\s+")
+#left before punctuation where a tag was, like `Mix <b>well</b>.`
+SPACE_BEFORE_PUNCTUATION = re.compile(r"\s+([.,;:!?)])")
+
+#K:V = vulgar fraction:value
+FRACTIONS = {"½": 1/2, "⅓": 1/3, "⅔": 2/3, "¼": 1/4, "¾": 3/4, "⅕": 1/5, "⅖": 2/5, "⅗": 3/5, "⅘": 4/5,
+    "⅙": 1/6, "⅚": 5/6, "⅛": 1/8, "⅜": 3/8, "⅝": 5/8, "⅞": 7/8}
+VULGAR = "[" + "".join(FRACTIONS) + "]"
+#a whole number, a decimal, a fraction, a mixed number, or a vulgar fraction with or without a whole number
+NUMBER = rf"(?:\d+\s+\d+\s*/\s*\d+|\d+\s*/\s*\d+|\d+\s*{VULGAR}|\d*\.\d+|\d+|{VULGAR})"
+#a leading amount, the lower end of a range like `3-4` or `2 to 3`
+AMOUNT = re.compile(rf"^\s*({NUMBER})(?:\s*(?:-|–|to)\s*{NUMBER})?\s*")
+PARENTHESES = re.compile(r"^\(([^)]*)\)\s*")
+#units that aren't converted but are still kept apart from the name, singular
+COUNT_UNITS = frozenset(("clove", "can", "jar", "package", "packet", "pinch", "dash", "slice", "piece",
+    "stick", "sprig", "bunch", "head", "handful", "sheet", "bottle", "box", "bag", "cube", "drop"))
+
+def parse_number(text:str):
+    """Returns the value of a NUMBER match"""
+    if text[-1] in FRACTIONS:
+        return float(text[:-1].strip() or 0) + FRACTIONS[text[-1]]
+    if "/" not in text:
+        return float(text)
+    parts = re.sub(r"\s*/\s*", "/", text).split()
+    numerator, denominator = parts[-1].split("/")
+    whole = int(parts[0]) if len(parts) == 2 else 0
+    return whole + (int(numerator)/int(denominator) if int(denominator) else 0)
+
+def parse_unit(words:list):
+    """Returns (unit, number of words it took) for the start of words, ("", 0) if there is none.
+    Convertible units come back in their canonical spelling, two-word ones like `fl oz` included."""
+    for count in (2, 1):
+        if len(words) < count:
+            continue
+        spelling = " ".join(words[:count]).rstrip(",")
+        canonical = UNITS.canonical(spelling) or UNITS.canonical(spelling.rstrip("."))
+        if canonical is not None:
+            return canonical, count
+    word = words[0].lower().rstrip(".,") if words else ""
+    for singular in (word, word[:-1], word[:-2]):
+        if singular in COUNT_UNITS:
+            return singular, 1
+    return "", 0
+
+def parse_ingredient(line:str):
+    """Parses an ingredient line like `1 1/2 cups flour, sifted` into (name, IngredientAmount).
+    Lines without an amount, like `salt to taste`, get an amount of 0 and no unit."""
+    line = clean_text(line)
+    match = AMOUNT.match(line)
+    if match is None:
+        return line, IngredientAmount(0, "")
+    amount = parse_number(match.group(1))
+    rest = line[match.end():]
+    #`2 (14 oz) cans tomatoes`: the size goes with the name
+    note = None
+    parentheses = PARENTHESES.match(rest)
+    if parentheses is not None:
+        note = parentheses.group(1)
+        rest = rest[parentheses.end():]
+    words = rest.split()
+    unit, count = parse_unit(words)
+    name = " ".join(words[count:])
+    if name.lower().startswith("of "):
+        name = name[len("of "):]
+    if note is not None:
+        name = f"{name} ({note})"
+    return name or line, IngredientAmount(amount, unit)
+
+def clean_text(text):
+    """Unescapes HTML entities and drops tags, which pages leave in JSON-LD strings"""
+    text = html.unescape(TAG.sub(" ", html.unescape(str(text))))
+    return SPACE_BEFORE_PUNCTUATION.sub(r"\1", SPACE.sub(" ", text)).strip()
+
+def is_recipe(node:dict):
+    node_type = node.get("@type")
+    if isinstance(node_type, list):
+        return "Recipe" in node_type
+    return node_type == "Recipe"
+
+def find_recipes(node):
+    """Generator, yields the schema.org Recipe objects of a JSON-LD document, including ones
+    in lists and `@graph`s"""
+    if isinstance(node, list):
+        for item in node:
+            yield from find_recipes(item)
+    elif isinstance(node, dict):
+        if is_recipe(node):
+            yield node
+        elif "@graph" in node:
+            yield from find_recipes(node["@graph"])
+
+def page_url(page:str):
+    """Returns the canonical or og:url of a page, None if it has neither"""
+    for pattern in (CANONICAL, OG_URL):
+        tag = pattern.search(page)
+        if tag is not None:
+            url = ATTR_URL.search(tag.group(0))
+            if url is not None:
+                return html.unescape(url.group(1))
+    return None
+
+def iter_steps(instructions):
+    """Generator, yields the step texts of recipeInstructions: a string, a list of strings,
+    HowToSteps, or HowToSections of them"""
+    if isinstance(instructions, str):
+        for line in re.split(r"\n+|<br\s*/?>|</p>|</li>", instructions):
+            line = clean_text(line)
+            if line:
+                yield line
+    elif isinstance(instructions, list):
+        for item in instructions:
+            yield from iter_steps(item)
+    elif isinstance(instructions, dict):
+        if "itemListElement" in instructions:
+            yield from iter_steps(instructions["itemListElement"])
+        else:
+            text = instructions.get("text") or instructions.get("name")
+            if text:
+                yield from iter_steps(text)
+
+def person_name(author):
+    """The name of an author given as a string, a Person, or a list of them"""
+    if isinstance(author, list):
+        names = [person_name(item) for item in author]
+        return ", ".join(name for name in names if name)
+    if isinstance(author, dict):
+        return clean_text(author.get("name", ""))
+    return clean_text(author) if author else ""
+
+def servings(recipe_yield):
+    """The first number of recipeYield, like `4 servings` or ["4", "4 servings"], 0 if there is none"""
+    if isinstance(recipe_yield, list):
+        recipe_yield = recipe_yield[0] if recipe_yield else ""
+    if isinstance(recipe_yield, (int, float)):
+        return int(recipe_yield)
+    match = re.search(r"\d+", str(recipe_yield or ""))
+    return int(match.group(0)) if match else 0
+
+def add_ingredient(ingredients:dict, name:str, amt:IngredientAmount):
+    """Adds one parsed ingredient. A name that comes again with the same unit adds up,
+    with another unit it gets a number, as the ingredients are keyed by name."""
+    old = ingredients.get(name)
+    if old is None:
+        ingredients[name] = amt
+    elif old.unit == amt.unit:
+        old.amount += amt.amount
+    else:
+        number = 2
+        while f"{name} ({number})" in ingredients:
+            number += 1
+        ingredients[f"{name} ({number})"] = amt
+
+def make_recipe(node:dict, url:str=None):
+    """Returns a Recipe from a schema.org Recipe object. url is the srcurl if the object has none."""
+    my_recipe = Recipe()
+    my_recipe.title = clean_text(node.get("name") or node.get("headline") or "Untitled Recipe")
+    ingredients = {}
+    lines = node.get("recipeIngredient") or node.get("ingredients") or []
+    for line in [lines] if isinstance(lines, str) else lines:
+        name, amt = parse_ingredient(line)
+        add_ingredient(ingredients, name, amt)
+    my_recipe.ingredients = ingredients
+    my_recipe.steps = tuple(iter_steps(node.get("recipeInstructions") or []))
+    my_recipe.metadata[Recipe.META_AUTHOR] = person_name(node.get("author")) or "Unknown"
+    my_recipe.metadata[Recipe.META_SERVES] = servings(node.get("recipeYield"))
+    source = node.get("url") or node.get("mainEntityOfPage") or url
+    if isinstance(source, dict):
+        source = source.get("@id")
+    if source:
+        my_recipe.metadata[Recipe.META_SRCURL] = str(source)
+    return my_recipe
+
+def read_page(path:str):
+    """Returns the Recipes of a saved page, in page order"""
+    with open(path, "r", encoding="utf-8", errors="replace") as infile:
+        page = infile.read()
+    nodes = []
+    errors = []
+    for script in SCRIPT.finditer(page):
+        try:
+            document = json.loads(script.group(1).strip(), strict=False)
+        except ValueError as e:
+            #one broken script, others on the page may still have the recipe
+            errors.append(e)
+            continue
+        nodes.extend(find_recipes(document))
+    if not nodes and errors:
+        raise errors[0]
+    url = page_url(page) if nodes else None
+    return [make_recipe(node, url) for node in nodes]
+
+def import_chunk(chunk:list):
+    """Imports a chunk of (page path, dest without suffix) jobs. Runs in a worker process.
+    Returns a list of (page path, status, message). A page with several recipes
+    writes dest.json, dest-2.json and so on."""
+    results = []
+    for src, dest in chunk:
+        try:
+            recipes = read_page(src)
+            if not recipes:
+                results.append((src, SKIPPED, "no schema.org Recipe"))
+                continue
+            for number, my_recipe in enumerate(recipes, 1):
+                suffix = ".json" if number == 1 else f"-{number}.json"
+                atomic_write(my_recipe, Path(dest + suffix))
+            results.append((src, DONE, None))
+        except Exception as e:
+            results.append((src, FAILED, f"{type(e).__name__}: {e}"))
+    return results
+
+def iter_jobs(source:Path, out_root:Path):
+    """Generator, yields (page path, dest without suffix) for a saved page or every page under a directory.
+    The dest keeps the page's suffix, `a.html` makes `a.html.json`, so `a.html` and `a.htm` don't
+    overwrite each other, nor does a second recipe of `a.html` (`a.html-2.json`) a page `a-2.html`."""
+    if source.is_file():
+        yield str(source), str(out_root/source.name)
+        return
+    for dir_path, entries in walk(source, recursive=True):
+        for entry in entries:
+            if os.path.splitext(entry.name)[1].lower() in PAGE_SUFFIXES and entry.is_file():
+                rel = os.path.relpath(entry.path, source)
+                yield entry.path, str(out_root/rel)
+
+def import_pages(source:Path, out_root:Path, jobs:int=None):
+    """Generator, imports every saved page of source into recipe files under out_root,
+    mirroring the directory tree. Yields (page path, status, message) as pages finish,
+    in chunks across a process pool with a bounded number of chunks in flight,
+    so results stream in while the pages are still being read. One job imports in this process.
+    """
+    chunks = iter_chunks(iter_jobs(source, out_root), CHUNK)
+    for results in run_chunks(import_chunk, chunks, jobs):
+        yield from results
@@ -0,0 +1,112 @@
+import re
+import json
+from json.decoder import scanstring
+
+#one token of a JSON value when skipping over it: a string, or a bracket
+SKIP_TOKEN = re.compile(r'"|[\[\]{}]')
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+#scalars end at the next comma, closing bracket or whitespace
+SCALAR_END = re.compile(r"[,}\]\s]")
+
+class IncompleteJSON(ValueError):
+    """The text ended in the middle of the top-level object"""
+
+def skip_ws(text:str, pos:int):
+    return WHITESPACE.match(text, pos).end()
+
+def skip_value(text:str, pos:int):
+    """Returns the index just past the JSON value starting at pos, without decoding it"""
+    if pos >= len(text):
+        raise IncompleteJSON("unexpected end of text")
+    char = text[pos]
+    if char == '"':
+        try:
+            return scanstring(text, pos+1)[1]
+        except json.JSONDecodeError as e:
+            raise IncompleteJSON(str(e))
+    if char in "[{":
+        depth = 0
+        while True:
+            match = SKIP_TOKEN.search(text, pos)
+            if match is None:
+                raise IncompleteJSON("unexpected end of text")
+            token = match.group()
+            if token == '"':
+                try:
+                    pos = scanstring(text, match.end())[1]
+                except json.JSONDecodeError as e:
+                    raise IncompleteJSON(str(e))
+                continue
+            pos = match.end()
+            if token in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return pos
+    match = SCALAR_END.search(text, pos)
+    if match is None:
+        raise IncompleteJSON("unexpected end of text")
+    return match.start()
+
+def iter_sections(text:str):
+    """Generator over the top-level object of a JSON document.
+    Yields (key, start, end) of each value without decoding the values,
+    and only scans as far into the text as the caller consumes.
+    """
+    pos = skip_ws(text, 0)
+    if pos >= len(text):
+        raise IncompleteJSON("empty document")
+    if text[pos] != "{":
+        raise ValueError("top level JSON value is not an object")
+    pos = skip_ws(text, pos+1)
+    if pos < len(text) and text[pos] == "}":
+        return
+    while True:
+        if pos >= len(text):
+            raise IncompleteJSON("unexpected end of text")
+        if text[pos] != '"':
+            raise ValueError(f"expected a key at {pos}")
+        try:
+            key, pos = scanstring(text, pos+1)
+        except json.JSONDecodeError as e:
+            raise IncompleteJSON(str(e))
+        pos = skip_ws(text, pos)
+        if pos >= len(text) or text[pos] != ":":
+            raise IncompleteJSON(f"expected ':' at {pos}")
+        start = skip_ws(text, pos+1)
+        end = skip_value(text, start)
+        yield key, start, end
+        pos = skip_ws(text, end)
+        if pos >= len(text):
+            raise IncompleteJSON("unexpected end of text")
+        if text[pos] == "}":
+            return
+        if text[pos] != ",":
+            raise ValueError(f"expected ',' at {pos}")
+        pos = skip_ws(text, pos+1)
+
+class LazySections:
+    """Spans of the top-level values of a JSON object, found on demand"""
+    def __init__(self, text:str):
+        self.text = text
+        self.spans = {}
+        self.scanner = iter_sections(text)
+
+    def find(self, key:str):
+        """Returns (start, end) of a key's value, or None if the object has no such key"""
+        while key not in self.spans and self.scanner is not None:
+            try:
+                found, start, end = next(self.scanner)
+            except StopIteration:
+                self.scanner = None
+                break
+            self.spans[found] = (start, end)
+        return self.spans.get(key)
+
+    def decode(self, key:str):
+        """Decodes one value. Raises KeyError if the object has no such key"""
+        span = self.find(key)
+        if span is None:
+            raise KeyError(key)
+        return json.loads(self.text[span[0]:span[1]])
@@ -0,0 +1,33 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+def list_dir(path:str):
+    """Returns the os.DirEntry of a directory sorted by name, an empty list if it can't be read.
+    scandir gets each entry's type along with its name, so telling directories from files needs no stat."""
+    try:
+        with os.scandir(path) as it:
+            return sorted(it, key=lambda entry: entry.name)
+    except OSError:
+        return []
+
+def walk(root, recursive:bool=False, jobs:int=1):
+    """Generator, yields (directory path, sorted list of os.DirEntry), root first, then level by level.
+    Hidden directories are listed but not walked into.
+    With jobs > 1 the directories of a level are listed by a thread pool, which pays off
+    where every listing waits on the network (NFS, SMB mounts).
+    """
+    level = [str(root)]
+    pool = ThreadPoolExecutor(max_workers=jobs) if recursive and jobs > 1 else None
+    try:
+        while level:
+            listings = map(list_dir, level) if pool is None else pool.map(list_dir, level)
+            next_level = []
+            for path, entries in zip(level, listings):
+                yield path, entries
+                if recursive:
+                    next_level.extend(entry.path for entry in entries
+                        if not entry.name.startswith(".") and entry.is_dir(follow_symlinks=False))
+            level = next_level
+    finally:
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,156 @@
+import os
+import time
+import zlib
+import threading
+from pathlib import Path
+
+#fcntl is POSIX only, elsewhere locks fall back to creating a lock file exclusively
+try:
+    import fcntl
+except ModuleNotFoundError:
+    fcntl = None
+
+class LockTimeout(OSError):
+    """Another process held a lock for longer than the timeout"""
+
+class SaveConflict(Exception):
+    """A recipe file changed on disk since it was read, in a way that can't be merged with the unsaved changes"""
+    def __init__(self, path, fields:list):
+        super().__init__(f"{Path(path).name} changed on disk: " + ", ".join(fields))
+        self.path = path
+        #the fields both sides changed, like "title" or "ingredients flour"
+        self.fields = fields
+
+class HeldLocks:
+    """The `.rcplock` byte ranges this process holds.
+
+    fcntl locks belong to the process, so they don't keep two threads apart, and closing
+    any descriptor of a file drops every lock the process has on it. So threads go through
+    this table, which refuses a range already held here, and share one descriptor per
+    lock file, closed only once nothing is held on it.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        #a forked child holds none of its parent's fcntl locks
+        self.mutex = threading.Lock()
+        #K:V = lock file path:[fd, ranges held]
+        self.files = {}
+        #(lock file path, offset) of the ranges held
+        self.held = set()
+
+    def try_lock(self, lock_path:str, offset:int):
+        """Returns the lock file's descriptor, or None if the range is held, here or by another process"""
+        key = (lock_path, offset)
+        with self.mutex:
+            if key in self.held:
+                return None
+            entry = self.files.get(lock_path)
+            if entry is None:
+                entry = [os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644), 0]
+            try:
+                fcntl.lockf(entry[0], fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+            except OSError:
+                if entry[1] == 0:
+                    os.close(entry[0])
+                    self.files.pop(lock_path, None)
+                return None
+            entry[1] += 1
+            self.files[lock_path] = entry
+            self.held.add(key)
+            return entry[0]
+
+    def unlock(self, lock_path:str, offset:int):
+        with self.mutex:
+            entry = self.files[lock_path]
+            fcntl.lockf(entry[0], fcntl.LOCK_UN, 1, offset)
+            self.held.discard((lock_path, offset))
+            entry[1] -= 1
+            if entry[1] == 0:
+                os.close(entry[0])
+                del self.files[lock_path]
+
+HELD = HeldLocks()
+if fcntl is not None:
+    os.register_at_fork(after_in_child=HELD.reset)
+
+class FileLock:
+    """Advisory exclusive lock on one file, between processes, as a context manager.
+
+    With fcntl, the locks of a directory are byte-range locks in its `.rcplock` file,
+    one byte per file name (by checksum), so a directory gets a single lock file however
+    many recipes are locked, and the kernel drops the locks of a process that dies.
+    Without it, the lock is a `.name.lock` file created exclusively and removed on release;
+    one older than STALE seconds was left by a crashed process and is taken over.
+    Either way it also keeps threads of one process apart.
+    The lock isn't reentrant: taking it again while holding it waits out the timeout.
+    """
+    DIR_LOCK = ".rcplock"
+    SUFFIX = ".lock"
+    TIMEOUT = 10.0
+    POLL = 0.005
+    STALE = 60.0
+
+    def __init__(self, path, timeout:float=None):
+        path = Path(os.path.abspath(path))
+        self.timeout = self.TIMEOUT if timeout is None else timeout
+        if fcntl is not None:
+            self.lock_path = str(path.parent/self.DIR_LOCK)
+            self.offset = zlib.crc32(path.name.encode("utf-8")) & 0x7fffffff
+        else:
+            self.lock_path = path.with_name(f".{path.name}{self.SUFFIX}")
+        self.fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def acquire(self):
+        """Waits for the lock, raises LockTimeout after timeout seconds"""
+        deadline = time.monotonic() + self.timeout
+        while not self.try_acquire():
+            if time.monotonic() > deadline:
+                raise LockTimeout(f"{self.lock_path} is locked by another process or thread")
+            time.sleep(self.POLL)
+
+    def try_acquire(self):
+        if fcntl is not None:
+            self.fd = HELD.try_lock(self.lock_path, self.offset)
+            return self.fd is not None
+        try:
+            self.fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.stat(self.lock_path).st_mtime > self.STALE:
+                    os.unlink(self.lock_path)
+            except OSError:
+                pass
+            return False
+
+    def release(self):
+        if self.fd is None:
+            return
+        if fcntl is not None:
+            HELD.unlock(self.lock_path, self.offset)
+        else:
+            os.unlink(self.lock_path)
+            os.close(self.fd)
+        self.fd = None
+
+def file_version(path):
+    """Returns what changes whenever a recipe file is written: the inode, mtime and size
+    of the file and of its journal, None for what doesn't exist"""
+    from journal import Journal
+    version = []
+    for file_path in (Path(path), Journal(path).path):
+        try:
+            stat = file_path.stat()
+            version.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
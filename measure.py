@@ -0,0 +1,49 @@
+import gc
+import tracemalloc
+from pathlib import Path
+
+from recipe import Recipe
+from index import scan_recipes
+
+def measure_memory(root:Path, count:int=1000):
+    """Loads `count` recipes from the files under root (cycling through them if
+    there are fewer files) and measures the memory they hold with tracemalloc.
+    Returns a dict of the measurements.
+    """
+    root = Path(root)
+    paths = [root] if root.is_file() else [Path(entry.path) for _, entry in scan_recipes(root)]
+    if len(paths) == 0:
+        raise FileNotFoundError(f"no recipes under {root}")
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    recipes = []
+    ingredients = 0
+    for i in range(count):
+        my_recipe = Recipe(paths[i % len(paths)])
+        ingredients += len(my_recipe.ingredients)
+        recipes.append(my_recipe)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    return {
+        "recipes": len(recipes),
+        "files": len(paths),
+        "ingredients": ingredients,
+        "bytes": held,
+        "bytes_per_recipe": held/len(recipes),
+        "bytes_per_ingredient": held/ingredients if ingredients else 0.0
+    }
+
+def print_memory_report(root:Path, count:int=1000):
+    report = measure_memory(root, count)
+    print(f"Loaded {report['recipes']} recipes from {report['files']} file(s), {report['ingredients']} ingredients.")
+    print(f"\t{report['bytes']} bytes held")
+    print(f"\t{report['bytes_per_recipe']:.1f} bytes per recipe")
+    print(f"\t{report['bytes_per_ingredient']:.1f} bytes per ingredient (recipe overhead included)")
+    if report["ingredients"]:
+        million = report["bytes_per_ingredient"]*1_000_000/2**20
+        print(f"\t~{million:.0f} MiB for 1M ingredients")
+    return report
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import threading
+import hashlib
+from pathlib import Path
+
+from commands import UsageError, tokenize, words_of
+from frontend import EXPLORER, RECIPE
+from stats import STATS
+
+class PlanError(ValueError):
+    """A script has commands that can't run. Holds every error, not just the first"""
+    def __init__(self, errors:list):
+        self.errors = errors
+        super().__init__("\n".join(errors))
+
+class Step:
+    """One command of a plan, with its arguments already parsed"""
+    __slots__ = ("lineno", "line", "recipe_mode", "command", "args")
+
+    def __init__(self, lineno:int, line:str, recipe_mode:bool, command, args:list):
+        self.lineno = lineno
+        self.line = line
+        self.recipe_mode = recipe_mode
+        self.command = command
+        self.args = args
+
+    def get_list(self):
+        return [self.lineno, self.line, self.recipe_mode, self.command.verb, self.command.noun, self.args]
+
+    @classmethod
+    def from_list(cls, my_list:list):
+        lineno, line, recipe_mode, verb, noun, args = my_list
+        registry = RECIPE if recipe_mode else EXPLORER
+        command = registry.commands[verb if noun is None else (verb, noun)]
+        return cls(lineno, line, recipe_mode, command, args)
+
+class Plan:
+    """A script compiled into the commands it runs.
+
+    Compiling tokenizes and parses every line once, following the switch between
+    file explorer and recipe mode at `open`, `use` and `close`, and reports all unknown
+    commands, missing arguments and bad numbers before anything runs.
+    Running calls the handlers directly, without parsing.
+    Plans are cached next to the script, in `.rcpplans/`, by the hash of the
+    script's content and of the command table.
+    """
+    CACHE_DIR = ".rcpplans"
+    VERSION = 1
+    #K:V = cache key:Plan, for scripts run repeatedly by one process
+    loaded = {}
+
+    def __init__(self, steps:list):
+        self.steps = steps
+
+    @classmethod
+    def cache_key(cls, text:str):
+        digest = hashlib.sha1()
+        digest.update(f"{cls.VERSION}\n{EXPLORER.signature()}\n{RECIPE.signature()}\n".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    @classmethod
+    def compile(cls, lines, name:str="<script>"):
+        """Returns the Plan of an iterable of script lines. Raises PlanError if any line is wrong."""
+        steps = []
+        errors = []
+        recipe_mode = False
+        for lineno, line in enumerate(lines, 1):
+            if line.strip() == "":
+                continue
+            tokens, rest = tokenize(line)
+            words = words_of(tokens, rest)
+            registry = RECIPE if recipe_mode else EXPLORER
+            command, start = registry.lookup(words)
+            if command is None:
+                mode = "recipe" if recipe_mode else "file explorer"
+                errors.append(f"{name}:{lineno}: unknown {mode} command '{' '.join(words[:2])}'")
+                continue
+            try:
+                args = command.parse(tokens, rest, start)
+            except UsageError as e:
+                errors.append(f"{name}:{lineno}: missing arguments, usage: {e}")
+                continue
+            except ValueError as e:
+                errors.append(f"{name}:{lineno}: expected a number, {e}")
+                continue
+            step = Step(lineno, line, recipe_mode, command, args)
+            previous = steps[-1] if steps else None
+            if (command.verb == "save" and previous is not None and previous.command is command
+                    and previous.args == args):
+                #nothing changed since the same save
+                continue
+            steps.append(step)
+            if command.verb in ("open", "use") and args[0] is not None:
+                recipe_mode = True
+            elif command.verb == "close":
+                recipe_mode = False
+            elif command.verb == "exit":
+                break
+        if errors:
+            raise PlanError(errors)
+        return cls(steps)
+
+    @classmethod
+    def load(cls, script:Path):
+        """Returns the Plan of a script file, from the cache when the script hasn't changed.
+        Raises PlanError if the script has errors.
+        """
+        script = Path(script)
+        with open(script, "r") as infile:
+            lines = list(infile)
+        key = cls.cache_key("".join(lines))
+        plan = cls.loaded.get(key)
+        if plan is not None:
+            return plan
+        cache_path = script.parent/cls.CACHE_DIR/(key + ".json")
+        try:
+            with open(cache_path, "r") as infile:
+                plan = cls([Step.from_list(step) for step in json.load(infile)])
+        except (OSError, ValueError, KeyError, TypeError):
+            plan = cls.compile(lines, script.name)
+            plan.save(cache_path)
+        cls.loaded[key] = plan
+        return plan
+
+    def save(self, cache_path:Path):
+        """Writes the plan through a temp file and rename. Read-only directories just don't cache."""
+        #per process and thread, daemon sessions can compile the same script at once
+        tmp_path = cache_path.with_name(f".{os.getpid()}.{threading.get_ident()}.tmp.{cache_path.name}")
+        try:
+            cache_path.parent.mkdir(exist_ok=True)
+            with open(tmp_path, "w") as outfile:
+                json.dump([step.get_list() for step in self.steps], outfile)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+
+    def run(self, frontend):
+        """Runs the plan's commands on a frontend. Returns False if the plan ran `exit`."""
+        for step in self.steps:
+            if step.recipe_mode == frontend.RCPFLAG:
+                start = time.perf_counter()
+                #handlers may consume their argument lists, and the plan is kept to run again
+                args = [list(arg) if isinstance(arg, list) else arg for arg in step.args]
+                result = step.command.handler(frontend, *args)
+                STATS.observe(step.command.name, time.perf_counter() - start)
+            else:
+                #the mode didn't switch as compiled (a refused close), dispatch the line like a typed command
+                result = frontend.interpret_command(step.line)
+            if result is False:
+                return False
+        return True
@@ -0,0 +1,233 @@
+import sys
+import json
+import struct
+from array import array
+from pathlib import Path
+
+from recipe import Recipe
+from recipe import IngredientAmount
+from stats import STATS
+
+#Binary recipe format, little endian:
+#   header      magic "RCPB", u16 version, u16 flags,
+#               u32 string count, u32 string blob length (in bytes),
+#               u32 ingredient count, u32 step count, u32 metadata count, u32 title string
+#   strings     with FLAG_NUL_SEPARATED, the utf-8 blob of all strings joined by NUL.
+#               otherwise u32 length of each string (in characters), then the blob unseparated
+#   ingredients u32 name strings, u32 unit strings, u8 amount types, then f64 amounts
+#   steps       u32 string of each
+#   metadata    u32 key string, u8 value type and 8 value bytes of each
+#Strings are deduplicated through the string table, so each unit and metadata key is stored once.
+
+MAGIC = b"RCPB"
+VERSION = 1
+SUFFIX = ".rcpb"
+
+HEADER = struct.Struct("<4sHHIIIIII")
+
+#header flags
+#no string contains a NUL, so the string table is split in one go instead of sliced by lengths
+FLAG_NUL_SEPARATED = 1
+
+#amount types
+AMT_FLOAT = 0
+AMT_INT = 1
+
+#metadata value types
+META_STR = 0
+META_INT = 1
+META_FLOAT = 2
+META_BOOL = 3
+META_NULL = 4
+#anything else (lists, dicts) is stored as a JSON string
+META_JSON = 5
+
+INT_VALUE = struct.Struct("<q")
+FLOAT_VALUE = struct.Struct("<d")
+
+#Structs of the sections after the string table, by (ingredient, step, metadata) counts
+LAYOUTS = {}
+LAYOUT_CACHE = 256
+
+def layout(n_ingr:int, n_steps:int, n_meta:int):
+    """Returns the Struct packing the ingredients, steps and metadata in one call"""
+    key = (n_ingr, n_steps, n_meta)
+    packer = LAYOUTS.get(key)
+    if packer is None:
+        if len(LAYOUTS) >= LAYOUT_CACHE:
+            LAYOUTS.clear()
+        packer = LAYOUTS[key] = struct.Struct(f"<{n_ingr}I{n_ingr}I{n_ingr}B{n_ingr}d{n_steps}I" + "IB8s"*n_meta)
+    return packer
+
+def is_binary(path):
+    return str(path).endswith(SUFFIX)
+
+class StringTable:
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def add(self, string:str):
+        string_id = self.ids.get(string)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(string)
+            self.ids[string] = string_id
+        return string_id
+
+def pack_meta_value(strings:StringTable, val):
+    if isinstance(val, bool):
+        return META_BOOL, INT_VALUE.pack(int(val))
+    if isinstance(val, int) and -2**63 <= val < 2**63:
+        return META_INT, INT_VALUE.pack(val)
+    if isinstance(val, float):
+        return META_FLOAT, FLOAT_VALUE.pack(val)
+    if isinstance(val, str):
+        return META_STR, INT_VALUE.pack(strings.add(val))
+    if val is None:
+        return META_NULL, bytes(8)
+    return META_JSON, INT_VALUE.pack(strings.add(json.dumps(val)))
+
+def unpack_meta_value(strings:list, val_type:int, raw:bytes):
+    if val_type == META_FLOAT:
+        return FLOAT_VALUE.unpack(raw)[0]
+    if val_type == META_NULL:
+        return None
+    val = INT_VALUE.unpack(raw)[0]
+    if val_type == META_INT:
+        return val
+    if val_type == META_BOOL:
+        return bool(val)
+    if val_type == META_STR:
+        return strings[val]
+    return json.loads(strings[val])
+
+def dumps(my_recipe:Recipe):
+    """Returns the binary form of a recipe"""
+    strings = StringTable()
+    add = strings.add
+    title_id = add(my_recipe.title)
+
+    name_ids = []
+    unit_ids = []
+    amounts = []
+    for ingr, amt in my_recipe.ingredients.items():
+        name_ids.append(add(ingr))
+        unit_ids.append(add(amt.unit))
+        amounts.append(amt.amount)
+    amt_types = [AMT_INT if isinstance(amount, int) else AMT_FLOAT for amount in amounts]
+
+    step_ids = list(map(add, my_recipe.steps))
+
+    meta_values = []
+    for key, val in my_recipe.metadata.items():
+        meta_values.append(add(key))
+        meta_values.extend(pack_meta_value(strings, val))
+
+    joined = "\0".join(strings.strings)
+    if joined.count("\0") == len(strings.strings) - 1:
+        flags = FLAG_NUL_SEPARATED
+        lengths = array("I")
+        blob = joined.encode("utf-8")
+    else:
+        flags = 0
+        lengths = array("I", [len(string) for string in strings.strings])
+        blob = "".join(strings.strings).encode("utf-8")
+    n_meta = len(meta_values)//3
+    header = HEADER.pack(MAGIC, VERSION, flags, len(strings.strings), len(blob),
+        len(amounts), len(step_ids), n_meta, title_id)
+    if sys.byteorder != "little":
+        lengths.byteswap()
+    #the sections are packed in one call rather than through an array each
+    sections = layout(len(amounts), len(step_ids), n_meta).pack(
+        *name_ids, *unit_ids, *amt_types, *amounts, *step_ids, *meta_values)
+    return b"".join((header, lengths.tobytes(), blob, sections))
+
+def read_array(typecode:str, data:bytes, offset:int, count:int):
+    """Returns (array, offset after it)"""
+    arr = array(typecode)
+    end = offset + arr.itemsize*count
+    arr.frombytes(data[offset:end])
+    if sys.byteorder != "little" and arr.itemsize > 1:
+        arr.byteswap()
+    return arr, end
+
+def loads(data:bytes, my_recipe:Recipe=None):
+    """Fills a recipe (a new one if None) from its binary form and returns it.
+    Raises ValueError if the data isn't a supported recipe file.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("truncated recipe file")
+    magic, version, flags, n_strings, blob_len, n_ingr, n_steps, n_meta, title_id = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a binary recipe file")
+    if version > VERSION:
+        raise ValueError(f"binary recipe version {version} is newer than supported ({VERSION})")
+    offset = HEADER.size
+
+    #decode the blob once, then split or slice it
+    if flags & FLAG_NUL_SEPARATED:
+        strings = data[offset:offset+blob_len].decode("utf-8").split("\0")
+    else:
+        lengths, offset = read_array("I", data, offset, n_strings)
+        blob = data[offset:offset+blob_len].decode("utf-8")
+        strings = []
+        pos = 0
+        for length in lengths:
+            strings.append(blob[pos:pos+length])
+            pos += length
+    offset += blob_len
+    intern = sys.intern
+
+    packer = layout(n_ingr, n_steps, n_meta)
+    if len(data) < offset + packer.size:
+        raise ValueError("truncated recipe file")
+    values = packer.unpack_from(data, offset)
+    steps_at = 4*n_ingr
+    meta_at = steps_at + n_steps
+
+    #the slots are filled directly, as the setters would each run for one value
+    new = IngredientAmount.__new__
+    ingredients = {}
+    for name_id, unit_id, amt_type, amount in zip(values[:n_ingr], values[n_ingr:2*n_ingr],
+            values[2*n_ingr:3*n_ingr], values[3*n_ingr:steps_at]):
+        amt = new(IngredientAmount)
+        amt.amount = int(amount) if amt_type == AMT_INT else amount
+        amt.unit = intern(strings[unit_id])
+        ingredients[intern(strings[name_id])] = amt
+
+    metadata = {}
+    for i in range(meta_at, len(values), 3):
+        metadata[intern(strings[values[i]])] = unpack_meta_value(strings, values[i+1], values[i+2])
+
+    my_recipe = Recipe() if my_recipe is None else my_recipe
+    my_recipe._title = strings[title_id]
+    my_recipe._ingredients = ingredients
+    my_recipe._steps = tuple(map(strings.__getitem__, values[steps_at:meta_at]))
+    my_recipe._metadata = metadata
+    my_recipe.sections = None
+    my_recipe.clear_view()
+    return my_recipe
+
+def write_binary(my_recipe:Recipe, filepath):
+    data = dumps(my_recipe)
+    with open(filepath, "wb") as outfile:
+        outfile.write(data)
+    STATS.count("bytes_written", len(data))
+
+def read_binary(my_recipe:Recipe, filepath):
+    with STATS.timer("read"):
+        with open(filepath, "rb") as infile:
+            data = infile.read()
+    STATS.count("bytes_read", len(data))
+    STATS.count("recipes_parsed")
+    with STATS.timer("parse"):
+        return loads(data, my_recipe)
+
+def convert_file(src, dest):
+    """Converts a recipe between the JSON and binary forms, by file extension"""
+    #loaded as a recipe file, so src's journal is applied
+    my_recipe = Recipe(Path(src))
+    #saved elsewhere, dest is locked and replaced atomically, and a journal left there is dropped
+    my_recipe.save(dest)
+    return my_recipe
@@ -1,19 +1,44 @@
-import json
+import os
+import sys
+
+import units
+from units import UNITS
+from stats import STATS
+
+#marks a section of a lazily read recipe that hasn't been decoded yet
+NOT_LOADED = object()
 
 class Recipe:
     """Data structure to represent the recipe, and contains manipulation recipes
+    Slotted, and loaded steps are kept as a tuple, to keep whole cookbooks small in memory.
+
+    A lazily read recipe only decodes title, ingredients, steps and metadata
+    the first time each of them is accessed.
+
+    The cli_* mutators record themselves as operations, and saving to the recipe's
+    own file appends them to a journal (see save) instead of rewriting the file.
+    Saves take a lock on the file, and if another process changed it since it was read,
+    the operations are merged into its version unless both changed the same thing.
+
+    Scaling and unit conversion don't touch the stored amounts. They make up a view
+    (a scale factor and a list of conversion targets) that `ingredients` applies
+    when it is read, so repeated scaling doesn't accumulate float error and
+    previews cost nothing until they are displayed or saved.
     """
+    __slots__ = ("_title", "_ingredients", "_steps", "_metadata", "sections", "my_filepath", "modified",
+        "pending", "saved_hash", "journal_ops", "view_scale", "view_targets", "pins", "_view", "_rendered",
+        "etag", "base_text", "base_ops")
+
     TITLE_KEY="title"
     INGR_KEY="ingredients"
     STEP_KEY="steps"
     META_KEY="metadata"
     
     title:str
-    #K:V = str:IngredientAmount
+    #K:V = str:IngredientAmount, with the view applied
     ingredients:dict
-    steps:list
-
-    my_filepath = None
+    #tuple of str, rebuilt by the step functions
+    steps:tuple
 
     #TODO: stores other information, such as #served, author and whatever else.
     metadata:dict
@@ -22,12 +47,27 @@ class Recipe:
     META_SRCURL="srcurl"
     META_REF="refs"
 
-    modified:bool = False
-
-    def __init__(self, filepath=None):
+    def __init__(self, filepath=None, lazy:bool=False):
+        #LazySections of the file text while some section is NOT_LOADED
+        self.sections = None
+        self.my_filepath = None
+        self.modified = False
+        #operations since the last save to my_filepath, as [method name, *arguments]
+        self.pending = []
+        #content_hash at the last load or save, None if unknown
+        self.saved_hash = None
+        #operations in my_filepath's journal
+        self.journal_ops = 0
+        #file_version of my_filepath when it was read or last saved, None if never
+        self.etag = None
+        #the file text and journal operations as of etag, to merge against. The text is only
+        #kept from the first unsaved change on, None until then or if unknown
+        self.base_text = None
+        self.base_ops = []
+        self.clear_view()
         self.title = "Untitled Recipe"
         self.ingredients={}
-        self.steps=[]
+        self.steps=()
         self.metadata={
             self.META_AUTHOR : "Unknown",
             self.META_SERVES : 0
@@ -35,77 +75,564 @@ class Recipe:
 
         if filepath is not None:
             self.my_filepath = filepath
+            from locking import file_version
+            self.etag = file_version(filepath)
             if filepath.exists():
-                self.read_json(filepath)
+                self.read_file(filepath, lazy)
+                self.replay_journal(filepath)
+
+    #sections are properties so that lazily read recipes can decode them on first access
+    @property
+    def title(self):
+        if self._title is NOT_LOADED:
+            self.load_section(self.TITLE_KEY)
+        return self._title
+    @title.setter
+    def title(self, title:str):
+        self._title = title
+        self._rendered = None
+
+    @property
+    def ingredients(self):
+        if self._view is None:
+            self._view = self.apply_view(self.stored_ingredients)
+        return self._view
+    @ingredients.setter
+    def ingredients(self, ingredients:dict):
+        """Replaces the stored amounts, and drops the view"""
+        self._ingredients = ingredients
+        self.clear_view()
+
+    @property
+    def stored_ingredients(self):
+        """The amounts as stored, without the view"""
+        if self._ingredients is NOT_LOADED:
+            self.load_section(self.INGR_KEY)
+        return self._ingredients
+
+    @property
+    def steps(self):
+        if self._steps is NOT_LOADED:
+            self.load_section(self.STEP_KEY)
+        return self._steps
+    @steps.setter
+    def steps(self, steps:tuple):
+        self._steps = steps
+        self._rendered = None
+
+    @property
+    def metadata(self):
+        if self._metadata is NOT_LOADED:
+            self.load_section(self.META_KEY)
+        return self._metadata
+    @metadata.setter
+    def metadata(self, metadata:dict):
+        self._metadata = metadata
+        self._rendered = None
+
+    def is_loaded(self):
+        """True once every section is decoded"""
+        return NOT_LOADED not in (self._title, self._ingredients, self._steps, self._metadata)
+
+    def load_section(self, key:str):
+        """Decodes one section of a lazily read recipe.
+        Raises KeyError if the file doesn't have that section.
+        """
+        with STATS.timer("parse"):
+            self.set_section(key, self.sections.decode(key))
+        if self.is_loaded():
+            #drop the file text
+            self.sections = None
+
+    def set_section(self, key:str, val):
+        if key == self.TITLE_KEY:
+            self._title = val
+        elif key == self.INGR_KEY:
+            self._ingredients = {sys.intern(ingr):IngredientAmount(*amt) for ingr, amt in val.items()}
+            self._view = None
+            self._rendered = None
+        elif key == self.STEP_KEY:
+            self._steps = tuple(val)
+        elif key == self.META_KEY:
+            self._metadata = {sys.intern(meta_key):meta_val for meta_key, meta_val in val.items()}
                 
     def __str__(self):
+        """The recipe as Markdown, cached until the recipe or its view changes"""
+        if self._rendered is None:
+            with STATS.timer("render"):
+                self._rendered = "\n".join(self.iter_markdown())
+        return self._rendered
+
+    def iter_markdown(self):
+        """Generator, yields the lines of the recipe as Markdown"""
         #let's use Markdown
-        string_builder = []
-        string_builder.append(f"# {self.title}")
+        yield f"# {self.title}"
         
         for key, val in self.metadata.items():
-            string_builder.append(f" - {key}: {val}")
+            yield f" - {key}: {val}"
 
-        string_builder.append(f"\n## Ingredients")
+        yield f"\n## Ingredients"
         for ingr, amt in self.ingredients.items():
-            string_builder.append(f"  - {amt.amount} {amt.unit} {ingr}")
+            yield f"  - {amt.amount} {amt.unit} {ingr}"
         
-        string_builder.append(f"\n## Instructions")
+        yield f"\n## Instructions"
         for step_num,  step in enumerate(self.steps):
-            string_builder.append(f"  {step_num+1}. {step}")
-        return "\n".join(string_builder)
+            yield f"  {step_num+1}. {step}"
+
+    def iter_html(self):
+        """Generator, yields the lines of the recipe as an HTML document"""
+        from html import escape
+        yield "<!DOCTYPE html>"
+        yield f"<html><head><meta charset=\"utf-8\"><title>{escape(str(self.title))}</title></head><body>"
+        yield f"<h1>{escape(str(self.title))}</h1>"
+        yield "<ul>"
+        for key, val in self.metadata.items():
+            yield f"<li>{escape(str(key))}: {escape(str(val))}</li>"
+        yield "</ul>"
+        yield "<h2>Ingredients</h2>"
+        yield "<ul>"
+        for ingr, amt in self.ingredients.items():
+            yield f"<li>{escape(str(amt.amount))} {escape(str(amt.unit))} {escape(ingr)}</li>"
+        yield "</ul>"
+        yield "<h2>Instructions</h2>"
+        yield "<ol>"
+        for step in self.steps:
+            yield f"<li>{escape(str(step))}</li>"
+        yield "</ol>"
+        yield "</body></html>"
+
+    def get_dict(self):
+        """Returns the recipe as a dict of plain JSON types"""
+        self_dict = {}
+        self_dict[self.TITLE_KEY] = self.title
+        self_dict[self.INGR_KEY] = {ingr:amt.get_tuple() for ingr, amt in self.ingredients.items()}
+        self_dict[self.STEP_KEY] = self.steps
+        self_dict[self.META_KEY] = self.metadata
+        return self_dict
+
+    def load_dict(self, my_dict:dict):
+        """
+            Fills the recipe from a dict like get_dict returns.
+            Could fail if format is wrong. Handle exceptions elsewhere?
+        """
+        for key in (self.TITLE_KEY, self.STEP_KEY, self.INGR_KEY, self.META_KEY):
+            self.set_section(key, my_dict[key])
+        self.sections = None
+        self.clear_view()
 
     def write_json(self, filepath):
+        import json
         with open(filepath,"w",) as outfile:
-            self_dict = {}
-            self_dict[self.TITLE_KEY] = self.title
-            self_dict[self.INGR_KEY] = {ingr:amt.get_tuple() for ingr, amt in self.ingredients.items()}
-            self_dict[self.STEP_KEY] = self.steps
-            self_dict[self.META_KEY] = self.metadata
-            json.dump(self_dict, outfile,indent=4)
+            json.dump(self.get_dict(), outfile,indent=4)
+            STATS.count("bytes_written", outfile.tell())
         
-    def read_json(self, filepath):
+    def read_json(self, filepath, lazy:bool=False):
         """
             Could fail if format is wrong. Handle exceptions elsewhere?
+            When lazy, the sections are only found and decoded as they are accessed,
+            so format errors can show up later.
+        """
+        import json
+        from jsonscan import LazySections
+        with STATS.timer("read"):
+            with open(filepath,"r",) as infile:
+                text = infile.read()
+                STATS.count("bytes_read", os.fstat(infile.fileno()).st_size)
+        STATS.count("recipes_parsed")
+        if lazy:
+            self.sections = LazySections(text)
+            self._title = self._ingredients = self._steps = self._metadata = NOT_LOADED
+            self._rendered = None
+        else:
+            with STATS.timer("parse"):
+                self.load_dict(json.loads(text))
+
+    def write_file(self, filepath):
+        """Writes JSON, or the binary format for `.rcpb` files"""
+        import rcpbin
+        if rcpbin.is_binary(filepath):
+            rcpbin.write_binary(self, filepath)
+        else:
+            self.write_json(filepath)
+
+    def read_file(self, filepath, lazy:bool=False):
+        """Reads JSON, or the binary format for `.rcpb` files. Binary files are never lazy."""
+        import rcpbin
+        if rcpbin.is_binary(filepath):
+            rcpbin.read_binary(self, filepath)
+        else:
+            self.read_json(filepath, lazy)
+
+    def write_atomic(self, filepath):
+        """Writes to a temp file next to filepath, then renames it over filepath,
+        so an interrupted write never leaves a truncated recipe behind."""
+        directory, name = os.path.split(str(filepath))
+        #the temp name keeps the extension, so write_file picks the same format
+        tmp_path = os.path.join(directory, f".{os.getpid()}.tmp.{name}")
+        try:
+            self.write_file(tmp_path)
+            with open(tmp_path, "rb") as written:
+                os.fsync(written.fileno())
+            os.replace(tmp_path, filepath)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    #journaling
+
+    #methods that may appear in a journal
+    JOURNAL_OPS = frozenset((
+        "cli_set_title", "cli_set_author", "cli_set_serves", "cli_set_srcurl",
+        "cli_custom_metadata", "cli_remove_metadata",
+        "cli_add_ingredient", "cli_remove_ingredient", "cli_scale", "cli_to_metric",
+        "convert_ingredients", "cli_add_step", "cli_remove_step"
+    ))
+    #journal length at which a save rewrites the base file instead
+    COMPACT_OPS = 64
+
+    #what save did
+    SAVE_SKIPPED = "skipped"
+    SAVE_JOURNAL = "journal"
+    SAVE_FULL = "full"
+
+    def record(self, *op):
+        """Marks the recipe modified and remembers the operation for the journal"""
+        if not self.pending and self.base_text is None:
+            self.keep_base()
+        self.pending.append(list(op))
+        self.modified=True
+        self._view = None
+        self._rendered = None
+
+    def replay_journal(self, filepath):
+        """Applies the operations journaled since filepath was last compacted"""
+        from journal import Journal
+        ops = Journal(filepath).read_ops()
+        #the replayed operations are part of the base, not changes to it
+        self.base_text = NOT_LOADED
+        for op in ops:
+            if op[0] not in self.JOURNAL_OPS:
+                raise ValueError(f"unknown journal operation {op[0]}")
+            getattr(self, op[0])(*op[1:])
+        self.journal_ops = len(ops)
+        self.base_text = None
+        self.base_ops = ops
+        self.pending = []
+        self.modified = False
+
+    def content_hash(self):
+        """Hash of everything that gets saved"""
+        import json
+        import hashlib
+        text = json.dumps(self.get_dict(), separators=(",", ":"))
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def save(self, filepath=None):
+        """Saves the recipe, to its own file if filepath is None.
+        Saving to the own file appends the pending operations to its journal, fsync'd,
+        and every COMPACT_OPS operations compacts the journal into the file.
+        Saving elsewhere, or when the file doesn't exist yet, writes the whole file
+        and drops a journal left next to it.
+        Both full writes go through a temp file and rename.
+        Returns SAVE_SKIPPED if the content is unchanged, SAVE_JOURNAL or SAVE_FULL.
         """
-        with open(filepath,"r",) as infile:
-            my_dict=json.load(infile)
-            self.title = my_dict[self.TITLE_KEY]
-            self.steps = my_dict[self.STEP_KEY]
-            ingr_dict = my_dict[self.INGR_KEY]
-            self.ingredients = {ingr:IngredientAmount(*amt) for ingr, amt in ingr_dict.items()}
-            self.metadata = my_dict[self.META_KEY]
-
-    def scale_ingredients(self, factor:int):
+        with STATS.timer("save"):
+            return self.save_to(filepath)
+
+    def save_to(self, filepath=None):
+        """save, untimed"""
+        from locking import FileLock
+        own = filepath is None or (self.my_filepath is not None and
+            os.path.abspath(filepath) == os.path.abspath(self.my_filepath))
+        if not own:
+            from journal import Journal
+            with FileLock(filepath):
+                self.write_atomic(filepath)
+                #a journal left there belongs to the file just replaced
+                Journal(filepath).remove()
+            self.modified = False
+            return self.SAVE_FULL
+
+        filepath = self.my_filepath
+        if not self.modified and not self.pending and os.path.exists(filepath):
+            return self.SAVE_SKIPPED
+        with FileLock(filepath):
+            return self.save_locked(filepath)
+
+    def save_locked(self, filepath):
+        """Saves to the own file while holding its lock"""
+        from journal import Journal
+        from locking import file_version
+        if self.etag is not None and file_version(filepath) != self.etag:
+            self.merge_from(filepath)
+        new_hash = self.content_hash()
+        if new_hash == self.saved_hash and os.path.exists(filepath):
+            self.pending = []
+            self.modified = False
+            return self.SAVE_SKIPPED
+
+        if os.path.exists(filepath) and self.journal_ops + len(self.pending) < self.COMPACT_OPS:
+            Journal(filepath).append(self.pending)
+            self.journal_ops += len(self.pending)
+            self.base_ops = self.base_ops + self.pending
+            result = self.SAVE_JOURNAL
+        else:
+            self.rewrite(filepath)
+            result = self.SAVE_FULL
+        self.etag = file_version(filepath)
+        self.base_text = None
+        self.pending = []
+        self.saved_hash = new_hash
+        self.modified = False
+        return result
+
+    def compact(self, filepath=None):
+        """Rewrites the recipe's file from memory and drops its journal.
+        Only meant for when there are no unsaved changes, or they should be saved too.
+        Does nothing if another process changed the file since it was read, as what is
+        in memory is out of date then. Returns whether it compacted.
         """
-        Modify the ingredient amounts by a scale factor
+        from locking import FileLock, file_version
+        filepath = self.my_filepath if filepath is None else filepath
+        with FileLock(filepath):
+            if self.etag is not None and file_version(filepath) != self.etag:
+                return False
+            self.rewrite(filepath)
+            self.etag = file_version(filepath)
+        return True
+
+    def rewrite(self, filepath):
+        """compact, with the lock held"""
+        from journal import Journal
+        self.write_atomic(filepath)
+        Journal(filepath).remove()
+        self.journal_ops = 0
+        self.base_text = None
+        self.base_ops = []
+
+    #merging with changes saved by other processes
+
+    #metadata keys set by the cli_set_* operations
+    META_OPS = {"cli_set_author": META_AUTHOR, "cli_set_serves": META_SERVES, "cli_set_srcurl": META_SRCURL}
+
+    def op_field(self, op:list):
+        """Returns what a journal operation changes, as a path into the recipe like ("metadata", "author").
+        Scaling and converting every ingredient changes ("ingredients",) as a whole."""
+        name, args = op[0], op[1:]
+        if name == "cli_set_title":
+            return (self.TITLE_KEY,)
+        if name in self.META_OPS:
+            return (self.META_KEY, self.META_OPS[name])
+        if name in ("cli_custom_metadata", "cli_remove_metadata"):
+            return (self.META_KEY, args[0])
+        if name in ("cli_add_ingredient", "cli_remove_ingredient"):
+            return (self.INGR_KEY, args[0])
+        if name == "cli_to_metric" and args and args[0] is not None:
+            return (self.INGR_KEY, args[0])
+        if name in ("cli_scale", "cli_to_metric", "convert_ingredients"):
+            return (self.INGR_KEY,)
+        return (self.STEP_KEY,)
+
+    def keep_base(self):
+        """Reads the base file back as of etag, before the first unsaved change, so that
+        loads which are never changed don't hold on to it"""
+        import json
+        from locking import file_version
+        if self.my_filepath is None or self.etag is None or self.etag[0] is None:
+            return
+        #other processes may have appended to the journal since, but not replaced the file
+        if file_version(self.my_filepath)[0] != self.etag[0]:
+            return
+        base = Recipe()
+        base.read_file(self.my_filepath)
+        self.base_text = json.dumps(base.get_dict())
+
+    def base_recipe(self):
+        """Returns the recipe as it was on disk at etag, None if that isn't known"""
+        import json
+        if self.base_text is None or self.base_text is NOT_LOADED:
+            return None
+        base = Recipe()
+        base.load_dict(json.loads(self.base_text))
+        for op in self.base_ops:
+            getattr(base, op[0])(*op[1:])
+        return base
+
+    def changed_fields(self, other):
+        """Returns the fields, as paths like op_field gives, where other differs from this recipe"""
+        fields = []
+        if self.title != other.title:
+            fields.append((self.TITLE_KEY,))
+        if tuple(self.steps) != tuple(other.steps):
+            fields.append((self.STEP_KEY,))
+        for field, mine, theirs in (
+                (self.META_KEY, self.metadata, other.metadata),
+                (self.INGR_KEY, self.get_dict()[self.INGR_KEY], other.get_dict()[self.INGR_KEY])):
+            for key in mine.keys() | theirs.keys():
+                if mine.get(key) != theirs.get(key):
+                    fields.append((field, key))
+        return fields
+
+    def merge_from(self, filepath):
+        """Takes in what another process saved to filepath since etag, then puts the unsaved
+        operations back on top, so saving appends them to that process's journal.
+        Raises SaveConflict if both changed the same field, or if it can't tell."""
+        from locking import SaveConflict, file_version
+        base = self.base_recipe()
+        if base is None or (self.modified and not self.pending):
+            raise SaveConflict(filepath, ["unknown changes"])
+        theirs = Recipe(filepath)
+        changed = base.changed_fields(theirs)
+        ours = [self.op_field(op) for op in self.pending]
+        overlap = sorted({" ".join(map(str, field)) for field in ours
+            for other in changed if field[:len(other)] == other[:len(field)]})
+        if overlap:
+            raise SaveConflict(filepath, overlap)
+        pending = self.pending
+        for op in pending:
+            getattr(theirs, op[0])(*op[1:])
+        self.load_dict(theirs.get_dict())
+        self.journal_ops = theirs.journal_ops
+        self.base_text = None
+        self.base_ops = theirs.base_ops
+        self.etag = theirs.etag
+        self.saved_hash = None
+        self.pending = pending
+        self.modified = True
+
+    #the view over the stored amounts
+
+    #conversion target of cli_to_metric, other targets are (unit, density)
+    METRIC_TARGET = (None, 1)
+
+    def clear_view(self):
+        self.view_scale = 1
+        #conversion targets, applied in order before scaling
+        self.view_targets = ()
+        #ingredients stored while a view was active, their amounts already went through part of it
+        #K:V = name:(view_scale, len(view_targets)) at the time
+        self.pins = {}
+        #cached ingredients with the view applied, None when stale
+        self._view = None
+        #cached Markdown of __str__, None when stale
+        self._rendered = None
+
+    def has_view(self):
+        return self.view_scale != 1 or len(self.view_targets) > 0 or len(self.pins) > 0
+
+    def apply_view(self, stored:dict):
+        """Returns the ingredients with the view applied, stored itself if there is no view"""
+        if not self.has_view():
+            return stored
+        view = {}
+        for ingr, amt in stored.items():
+            view[ingr] = self.view_amount(ingr, amt)
+        return view
+
+    def view_amount(self, ingr:str, amt):
+        """Returns one stored IngredientAmount with the view applied.
+        Converting first and scaling last gives the same amounts as the old in-place
+        operations did, whatever order the scale and conversion commands came in.
+        """
+        scale = self.view_scale
+        start = 0
+        pin = self.pins.get(ingr)
+        if pin is not None:
+            scale = scale / pin[0]
+            start = pin[1]
+        amount, unit = amt.amount, amt.unit
+        for dest_unit, density in self.view_targets[start:]:
+            if dest_unit is None:
+                converted = UNITS.to_metric(amount, unit)
+            else:
+                converted = UNITS.convert(amount, unit, dest_unit, density)
+                if converted is not None:
+                    converted = (converted, UNITS.canonical(dest_unit))
+            if converted is not None:
+                amount, unit = converted
+        if scale != 1:
+            amount = float(amount)*scale
+        return IngredientAmount(amount, unit)
+
+    def pin(self, ingr:str):
+        """Remembers that an ingredient was stored under the current view"""
+        if self.view_scale != 1 or len(self.view_targets) > 0:
+            self.pins[ingr] = (self.view_scale, len(self.view_targets))
+        else:
+            self.pins.pop(ingr, None)
+
+    def add_target(self, target:tuple):
+        targets = self.view_targets
+        if len(targets) > 0 and targets[-1] == target:
+            #the same conversion twice in a row is the conversion once,
+            #except for ingredients stored since, which still have to go through it
+            for ingr, (scale, start) in self.pins.items():
+                if start == len(targets):
+                    self.pins[ingr] = (scale, start - 1)
+        else:
+            self.view_targets = targets + (target,)
+        self._view = None
+        self._rendered = None
+
+    def preview(self, factor:float=1, metric:bool=False):
+        """Returns a recipe showing this one scaled and/or converted to metric, without copying the amounts.
+        The preview shares the stored sections, so it is meant for display and saving, not editing.
+        """
+        my_preview = Recipe()
+        my_preview._title = self._title
+        my_preview._ingredients = self._ingredients
+        my_preview._steps = self._steps
+        my_preview._metadata = self._metadata
+        my_preview.sections = self.sections
+        my_preview.view_scale = self.view_scale*factor
+        my_preview.view_targets = self.view_targets
+        my_preview.pins = self.pins
+        if metric:
+            my_preview.add_target(self.METRIC_TARGET)
+        return my_preview
+
+    def scale_ingredients(self, factor:float):
+        """
+        Scales the ingredient amounts by a factor, through the view.
         Can be called by other methods.
         """
-        for ingred in self.ingredients.values():
-            ingred.scale(factor)
+        self.view_scale = self.view_scale*factor
+        self._view = None
+        self._rendered = None
+
+    def convert_ingredients(self, dest_unit:str, density:float=1):
+        """
+        Converts every convertible ingredient to dest_unit, through the view.
+        Returns False if dest_unit is not a convertible unit.
+        """
+        if UNITS.lookup(dest_unit) is None:
+            return False
+        self.add_target((dest_unit, density))
+        self.record("convert_ingredients", dest_unit, density)
+        return True
     
     #functions for interfacing with the cli.
     
     #metadata functions
     def cli_set_title(self, name:str):
         self.title = name
-        self.modified=True
+        self.record("cli_set_title", name)
     def cli_set_author(self, name:str):
         self.metadata[self.META_AUTHOR] = name
-        self.modified=True
+        self.record("cli_set_author", name)
     def cli_set_serves(self, num:int):
         self.metadata[self.META_SERVES] = num
-        self.modified=True
+        self.record("cli_set_serves", num)
     def cli_set_srcurl(self, url:str):
         self.metadata[self.META_SRCURL] = url
-        self.modified=True
+        self.record("cli_set_srcurl", url)
     def cli_custom_metadata(self, key:str, val:str):
-        self.metadata[key] = val
-        self.modified=True
+        self.metadata[sys.intern(key)] = val
+        self.record("cli_custom_metadata", key, val)
     def cli_remove_metadata(self, key:str):
         if key in self.metadata:
             del self.metadata[key]
-            self.modified=True
+            self.record("cli_remove_metadata", key)
             return True
         else:
             return False
@@ -119,38 +646,50 @@ class Recipe:
 
     #ingredient functions
     def cli_add_ingredient(self, ingr:str, amount:float, unit:str):
-        self.ingredients[ingr]=IngredientAmount(amount, unit)
-        self.modified=True
+        ingr = sys.intern(ingr)
+        self.stored_ingredients[ingr]=IngredientAmount(amount, unit)
+        self.pin(ingr)
+        self.record("cli_add_ingredient", ingr, amount, unit)
     def cli_remove_ingredient(self, ingr:str):
-        if ingr in self.ingredients:
-            del self.ingredients[ingr]
-            self.modified=True
+        if ingr in self.stored_ingredients:
+            del self.stored_ingredients[ingr]
+            self.pins.pop(ingr, None)
+            self.record("cli_remove_ingredient", ingr)
             return True
         else:
             return False
     def cli_scale(self, factor:int):
         self.scale_ingredients(factor)
+        self.record("cli_scale", factor)
     def cli_to_metric(self, ingr = None):
-        if ingr in self.ingredients:
-            self.ingredients[ingr].convert_metric()
+        stored = self.stored_ingredients
+        if ingr in stored:
+            #one ingredient is cheap to convert for real, it gets stored as it is now shown
+            amt = self.view_amount(ingr, stored[ingr])
+            amt.convert_metric()
+            stored[ingr] = amt
+            self.pin(ingr)
         else:
-            for ingr in self.ingredients.items():
-                ingr[1].convert_metric()
-        self.modified=True
+            self.add_target(self.METRIC_TARGET)
+        self.record("cli_to_metric", ingr)
     
     #steps functions
     def cli_add_step(self, new_step:str, ind = -1):
+        steps = list(self.steps)
         if(ind == -1):
-            self.steps.append(new_step)
+            steps.append(new_step)
         else:
-            self.steps.insert(ind)
-        self.modified=True
+            steps.insert(ind, new_step)
+        self.steps = tuple(steps)
+        self.record("cli_add_step", new_step, ind)
     def cli_remove_step(self, ind=None):
+        steps = list(self.steps)
         if ind is not None:
-            self.steps.pop(ind)
+            steps.pop(ind)
         else:
-            self.steps.pop()
-        self.modified=True
+            steps.pop()
+        self.steps = tuple(steps)
+        self.record("cli_remove_step", ind)
     
 
 class IngredientAmount:
@@ -158,13 +697,16 @@ class IngredientAmount:
     Carries the amount and unit, handles conversions.
     
     Could maybe be a tuple, but has methods for conversions.
+    Slotted, with the unit string interned, since there is one per ingredient.
     """
+    __slots__ = ("amount", "unit")
+
     amount:float
     unit:str
 
     def __init__(self, amount:float, unit:str):
         self.amount = amount
-        self.unit = unit
+        self.unit = sys.intern(unit) if type(unit) is str else unit
     
     def __str__(self):
         return f"{self.amount:.2} { self.unit if self.is_convertible_unit() else '' }"
@@ -180,51 +722,41 @@ class IngredientAmount:
     def scale(self, factor):
         self.amount *= factor
 
-    #keys are lowercase, and some are abbreviated
-    VOLUME_CONV:dict = {
-        "ml": 1,
-        "liter":1000,
-        "cup":236.5875,
-        "tbsp":14.7868,
-        "tsp":4.92892,
-        "fl.oz": 29.5735
-    }
-
-    MASS_CONV:dict = {
-        "gram":1 , 
-        "g":1 , 
-        "kg":1000,
-        "lbs": 453.592,
-        "oz":28.3495
-    }
+    #the conversion tables themselves live in the units module
+    VOLUME_CONV:dict = units.VOLUME_CONV
+    MASS_CONV:dict = units.MASS_CONV
 
     def is_convertible_unit(self, unit:str = None):
         unit = self.unit if unit is None else unit
-        return self.is_volume_unit(unit) or self.is_mass_unit(unit)
+        return UNITS.lookup(unit) is not None
 
     def is_volume_unit(self, unit:str = None):
         unit = self.unit if unit is None else unit
-        return unit in self.VOLUME_CONV
+        return UNITS.dimension(unit) == UNITS.VOLUME
 
     def is_mass_unit(self, unit:str = None):
         unit = self.unit if unit is None else unit
-        return unit in self.MASS_CONV
+        return UNITS.dimension(unit) == UNITS.MASS
 
     def convert_volume(self, dest_unit:str, src_unit:str, amt:float):
         """
         Converts volume units, returns a float
-        Does not check whether units exist, which would throw a KeyError
+        Does not check whether units are volumes, unknown units throw a KeyError
         """
-        factor = self.VOLUME_CONV[src_unit]/self.VOLUME_CONV[dest_unit]
-        return amt*factor
+        return amt*UNITS.factor(self.unit_id(src_unit), self.unit_id(dest_unit))
 
     def convert_mass(self, dest_unit:str, src_unit:str, amt:float):
         """
         Converts mass units, returns a float
-        Does not check whether units exist, which would throw a KeyError
+        Does not check whether units are masses, unknown units throw a KeyError
         """
-        factor = self.MASS_CONV[src_unit]/self.MASS_CONV[dest_unit]
-        return amt*factor
+        return amt*UNITS.factor(self.unit_id(src_unit), self.unit_id(dest_unit))
+
+    def unit_id(self, unit:str):
+        unit_id = UNITS.lookup(unit)
+        if unit_id is None:
+            raise KeyError(unit)
+        return unit_id
 
     def convert_density(self,amt:float, density:float=1, to_volume=True):
         """
@@ -238,47 +770,19 @@ class IngredientAmount:
 
     def convert_amount(self, dest_unit:str, src_unit:str=None, amt:float=None, density=1):
         """
-        returns a float
+        returns a float, or None if either unit is not convertible
+        volume and mass convert through density, in g/ml
         """
         src_unit = self.unit if src_unit is None else src_unit
         amt = self.amount if amt is None else amt
-
-        src_is_vol = self.is_volume_unit(src_unit)
-        src_is_mass = self.is_mass_unit(src_unit)
-
-        if not src_is_mass and not src_is_vol:
-            #unit is not convertible
-            return None
-
-        dest_is_vol = self.is_volume_unit(dest_unit)
-
-        if src_is_vol != dest_is_vol:
-            #needs density stuff
-            if src_is_vol:
-                src_ml = self.convert_volume("ml", src_unit, amt)
-                dest_g = self.convert_density(src_ml, density, dest_is_vol)
-                return self.convert_mass(dest_unit, "g", dest_g)
-            else:
-                src_g = self.convert_mass("g", src_unit, amt)
-                dest_ml = self.convert_density(src_g, density, dest_is_vol)
-                return self.convert_volume(dest_unit, "ml", dest_ml)
-        elif src_is_vol:
-            return self.convert_volume(dest_unit, src_unit, amt)
-        else:
-            return self.convert_mass(dest_unit, src_unit, amt)
+        return UNITS.convert(amt, src_unit, dest_unit, density)
     
     def convert_metric(self):
-        if self.is_mass_unit():
-            amt = self.convert_mass("gram", self.unit, self.amount)
-            self.amount = amt
-            self.unit = "gram"
-        elif self.is_volume_unit():
-            amt = self.convert_volume("ml", self.unit, self.amount)
-            self.amount = amt
-            self.unit = "ml"
-        else:
+        converted = UNITS.to_metric(self.amount, self.unit)
+        if converted is None:
             #non-convertible unit
             return
+        self.amount, self.unit = converted
 
 # class RecipeNode:
 #     next_node:RecipeNode
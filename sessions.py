@@ -0,0 +1,97 @@
+from collections import OrderedDict
+from pathlib import Path
+
+from recipe import Recipe
+from stats import STATS
+
+class Session:
+    """A named open recipe: where it comes from, and its parsed Recipe while it is cached"""
+    __slots__ = ("name", "path", "key", "recipe", "signature")
+
+    def __init__(self, name:str, path:Path, key:str=None):
+        self.name = name
+        self.path = Path(path)
+        #key of the recipe inside a cookbook file, None for plain recipe files
+        self.key = key
+        self.recipe = None
+        #file_signature when the recipe was loaded or last saved
+        self.signature = None
+
+    def file_signature(self):
+        """locking.file_version of the file, which covers its journal"""
+        from locking import file_version
+        return file_version(self.path)
+
+    def is_stale(self):
+        """True if the file changed since the recipe was loaded or saved"""
+        return self.recipe is not None and self.file_signature() != self.signature
+
+    def is_dirty(self):
+        return self.recipe is not None and self.recipe.modified
+
+    def load(self):
+        """Parses the recipe from its file"""
+        if self.key is None:
+            #lazy, so commands like `get title` don't decode the whole recipe
+            self.recipe = Recipe(self.path, lazy=True)
+        else:
+            from cookbook import Cookbook
+            book = Cookbook(self.path)
+            self.recipe = book.get(self.key)
+            book.close()
+            if self.recipe is None:
+                self.recipe = Recipe()
+        self.signature = self.file_signature()
+        return self.recipe
+
+    def mark_saved(self):
+        self.signature = self.file_signature()
+
+class RecipeCache:
+    """Bounded LRU of sessions holding a parsed recipe.
+
+    Sessions pushed out by newer ones are handed to on_evict, which writes back
+    or drops their recipe; the session keeps its name and path and is parsed again
+    the next time it is used. A session on_evict returns False for keeps its recipe
+    and stays cached, over capacity, so unsaved changes are never dropped.
+    """
+    def __init__(self, capacity:int, on_evict=None):
+        self.capacity = capacity
+        self.on_evict = on_evict
+        #K:V = session name:Session, least recently used first
+        self.entries = OrderedDict()
+
+    def __contains__(self, name:str):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, name:str):
+        """Returns a cached session and marks it most recently used, or None"""
+        session = self.entries.get(name)
+        if session is None:
+            STATS.count("cache_misses")
+            return None
+        STATS.count("cache_hits")
+        self.entries.move_to_end(name)
+        return session
+
+    def put(self, session:Session):
+        """Caches a session as the most recently used, evicting the least recently used ones over capacity"""
+        self.entries[session.name] = session
+        self.entries.move_to_end(session.name)
+        kept = []
+        while len(self.entries) > self.capacity:
+            _, evicted = self.entries.popitem(last=False)
+            if self.on_evict is not None and self.on_evict(evicted) is False:
+                kept.append(evicted)
+                continue
+            evicted.recipe = None
+        #back in their place, least recently used first
+        for session in reversed(kept):
+            self.entries[session.name] = session
+            self.entries.move_to_end(session.name, last=False)
+
+    def pop(self, name:str):
+        return self.entries.pop(name, None)
@@ -0,0 +1,65 @@
+import sys
+import time
+import builtins
+
+class StartupReport:
+    """Times the phases of startup, and every module imported while installed.
+
+    Imports are timed by wrapping builtins.__import__, so a module's time
+    includes the modules it imports; its own time excludes them.
+    """
+    def __init__(self, start:float=None):
+        #perf_counter when the program started
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start
+        #(phase name, seconds)
+        self.phases = []
+        #(module name, depth, total seconds, own seconds) in import order
+        self.imports = []
+        #time spent in nested imports, per level of the import being timed
+        self.nested = []
+        self.original_import = None
+
+    def install(self):
+        self.original_import = builtins.__import__
+        builtins.__import__ = self.timed_import
+
+    def uninstall(self):
+        if self.original_import is not None:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+
+    def timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level != 0 or name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+        entry = len(self.imports)
+        self.imports.append(None)
+        self.nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            total = time.perf_counter() - start
+            nested = self.nested.pop()
+            if self.nested:
+                self.nested[-1] += total
+            self.imports[entry] = (name, len(self.nested), total, total - nested)
+
+    def phase(self, name:str):
+        """Ends the current phase"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def print_report(self, top:int=15, out=None):
+        out = sys.stderr if out is None else out
+        total = self.last - self.start
+        print(f"startup report, {total*1000:.1f} ms since app.py was loaded", file=out)
+        for name, seconds in self.phases:
+            print(f"  {seconds*1000:8.2f} ms  {name}", file=out)
+        imports = [entry for entry in self.imports if entry is not None]
+        if imports:
+            print(f"{len(imports)} module(s) imported, slowest by own time:", file=out)
+            slowest = sorted(imports, key=lambda entry: entry[3], reverse=True)[:top]
+            for name, depth, total, own in slowest:
+                print(f"  {own*1000:8.2f} ms own {total*1000:8.2f} ms total  {name}", file=out)
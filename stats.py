@@ -0,0 +1,150 @@
+import time
+from bisect import bisect_left
+
+class Histogram:
+    """Latencies counted into fixed buckets, like Prometheus histograms"""
+    __slots__ = ("counts", "total", "count")
+    #bucket upper bounds in seconds, a last bucket counts everything slower
+    BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self):
+        self.counts = [0]*(len(self.BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds:float):
+        self.counts[bisect_left(self.BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q:float):
+        """Upper bound of the bucket holding the q quantile, None if nothing was observed"""
+        if self.count == 0:
+            return None
+        rank = q*self.count
+        seen = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def get_dict(self):
+        return {"counts": self.counts, "sum": self.total, "count": self.count}
+
+    def merge(self, my_dict:dict):
+        for i, count in enumerate(my_dict["counts"]):
+            self.counts[i] += count
+        self.total += my_dict["sum"]
+        self.count += my_dict["count"]
+
+class PhaseTimer:
+    """Context manager adding the time spent inside it to a histogram"""
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram:Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class Stats:
+    """Counters, and latency histograms per command and per phase of the work.
+
+    Phases are what commands spend their time on: reading files, parsing JSON,
+    rendering recipes as text, and saving.
+    """
+    COUNTERS = ("bytes_read", "bytes_written", "recipes_parsed", "cache_hits", "cache_misses",
+        "index_hits", "index_parsed")
+    PHASES = ("read", "parse", "render", "save")
+    PREFIX = "rcp"
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        #K:V = command name:Histogram
+        self.commands = {}
+        #K:V = phase:Histogram
+        self.phases = {phase: Histogram() for phase in self.PHASES}
+        self.started = time.time()
+
+    def count(self, name:str, amount:int=1):
+        self.counters[name] += amount
+
+    def observe(self, command:str, seconds:float):
+        histogram = self.commands.get(command)
+        if histogram is None:
+            histogram = self.commands[command] = Histogram()
+        histogram.observe(seconds)
+
+    def timer(self, phase:str):
+        """Returns a context manager timing a phase"""
+        return PhaseTimer(self.phases[phase])
+
+    def get_dict(self):
+        return {
+            "started": self.started,
+            "buckets": list(Histogram.BUCKETS),
+            "counters": dict(self.counters),
+            "commands": {name: histogram.get_dict() for name, histogram in self.commands.items()},
+            "phases": {phase: histogram.get_dict() for phase, histogram in self.phases.items()}
+        }
+
+    def merge(self, my_dict:dict):
+        """Adds the stats of another process, as returned by its get_dict"""
+        for name, amount in my_dict["counters"].items():
+            self.counters[name] = self.counters.get(name, 0) + amount
+        for name, histogram in my_dict["commands"].items():
+            self.commands.setdefault(name, Histogram()).merge(histogram)
+        for phase, histogram in my_dict["phases"].items():
+            self.phases.setdefault(phase, Histogram()).merge(histogram)
+
+    def to_prometheus(self):
+        """Returns the stats in the Prometheus text exposition format"""
+        prefix = self.PREFIX
+        lines = []
+        for name, amount in self.counters.items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {amount}")
+        for family, label, histograms in (("command_seconds", "command", self.commands),
+                ("phase_seconds", "phase", self.phases)):
+            lines.append(f"# TYPE {prefix}_{family} histogram")
+            for key, histogram in histograms.items():
+                value = key.replace("\\", "\\\\").replace("\"", "\\\"")
+                seen = 0
+                for bound, count in zip(Histogram.BUCKETS + ("+Inf",), histogram.counts):
+                    seen += count
+                    lines.append(f"{prefix}_{family}_bucket{{{label}=\"{value}\",le=\"{bound}\"}} {seen}")
+                lines.append(f"{prefix}_{family}_sum{{{label}=\"{value}\"}} {histogram.total}")
+                lines.append(f"{prefix}_{family}_count{{{label}=\"{value}\"}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Writes the stats to a file, in the Prometheus format for `.prom` files, JSON otherwise"""
+        import json
+        with open(path, "w") as outfile:
+            if str(path).endswith(".prom"):
+                outfile.write(self.to_prometheus())
+            else:
+                json.dump(self.get_dict(), outfile, indent=4)
+
+    def report_lines(self):
+        """Human readable summary, for the stats command"""
+        lines = [f"{name:16}{amount}" for name, amount in self.counters.items()]
+        for title, histograms in (("command", self.commands), ("phase", self.phases)):
+            lines.append(f"{title:16}{'count':>8}{'total ms':>12}{'mean ms':>10}{'p50 <=':>10}{'p99 <=':>10}")
+            for key, histogram in histograms.items():
+                if histogram.count == 0:
+                    continue
+                mean = histogram.total/histogram.count
+                lines.append(f"{key:16}{histogram.count:8}{histogram.total*1000:12.2f}{mean*1000:10.3f}"
+                    f"{histogram.quantile(0.5)*1000:10.2f}{histogram.quantile(0.99)*1000:10.2f}")
+        return lines
+
+#the process' stats, instrumented code adds to them
+STATS = Stats()
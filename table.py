@@ -0,0 +1,221 @@
+import sys
+from array import array
+
+from recipe import IngredientAmount
+from units import UNITS
+
+#numpy is optional, the table falls back to plain array operations without it
+try:
+    import numpy
+except ModuleNotFoundError:
+    numpy = None
+
+class IngredientTable:
+    """Columnar store for the ingredients of one or many recipes.
+
+    Amounts live in a float array and units in a small integer array of unit codes,
+    so scaling and unit conversion run as one batched operation over every row
+    instead of one IngredientAmount at a time.
+    Rows of recipe i are in range(offsets[i], offsets[i+1]).
+    """
+    #dimension codes
+    NONE = UNITS.NONE
+    VOLUME = UNITS.VOLUME
+    MASS = UNITS.MASS
+
+    #base units of each dimension, what convert_metric produces
+    BASE_UNIT = UNITS.BASE_UNIT
+
+    def __init__(self):
+        self.names = []
+        self.amounts = array("d")
+        self.units = array("H")
+        #1 if the stored amount was an int, so untouched rows round-trip exactly
+        self.int_flags = array("B")
+        self.offsets = array("L", [0])
+
+        #per-table unit codes, the registry's canonical units first.
+        #other spellings get their own code so untouched rows keep them.
+        self.unit_names = []
+        self.unit_codes = {}
+        self.dims = array("B")
+        #registry ID of each code, -1 if not convertible
+        self.unit_ids = array("h")
+        for unit in UNITS.names:
+            self.add_unit(unit)
+
+    def add_unit(self, unit:str):
+        """Returns the code of a unit spelling, registering it if it's new"""
+        code = self.unit_codes.get(unit)
+        if code is not None:
+            return code
+        code = len(self.unit_names)
+        unit = sys.intern(unit)
+        self.unit_names.append(unit)
+        self.unit_codes[unit] = code
+        unit_id = UNITS.lookup(unit)
+        if unit_id is None:
+            self.dims.append(self.NONE)
+            self.unit_ids.append(-1)
+        else:
+            self.dims.append(UNITS.dims[unit_id])
+            self.unit_ids.append(unit_id)
+        return code
+
+    #building and unpacking
+
+    def append_ingredients(self, ingredients:dict):
+        """Appends one recipe's ingredient dict (name:IngredientAmount) as a new block of rows"""
+        for name, amt in ingredients.items():
+            self.names.append(name)
+            self.amounts.append(amt.amount)
+            self.int_flags.append(1 if isinstance(amt.amount, int) else 0)
+            self.units.append(self.add_unit(amt.unit))
+        self.offsets.append(len(self.names))
+
+    @classmethod
+    def from_recipes(cls, recipes):
+        table = cls()
+        for my_recipe in recipes:
+            table.append_ingredients(my_recipe.ingredients)
+        return table
+
+    @classmethod
+    def from_ingredients(cls, ingredients:dict):
+        table = cls()
+        table.append_ingredients(ingredients)
+        return table
+
+    def __len__(self):
+        return len(self.names)
+
+    def recipe_count(self):
+        return len(self.offsets) - 1
+
+    def row_range(self, recipe:int=None):
+        """Rows of one recipe, or of the whole table if recipe is None"""
+        if recipe is None:
+            return 0, len(self.names)
+        return self.offsets[recipe], self.offsets[recipe+1]
+
+    def get_amount(self, row:int):
+        amount = self.amounts[row]
+        if self.int_flags[row] and amount.is_integer():
+            return int(amount)
+        return amount
+
+    def to_ingredients(self, recipe:int=0):
+        """Returns a fresh name:IngredientAmount dict for one recipe"""
+        lo, hi = self.row_range(recipe)
+        unit_names = self.unit_names
+        return {self.names[row]: IngredientAmount(self.get_amount(row), unit_names[self.units[row]])
+            for row in range(lo, hi)}
+
+    #batched operations
+
+    def scale(self, factor:float, recipe:int=None):
+        """Multiplies every amount of one recipe, or of the whole table"""
+        lo, hi = self.row_range(recipe)
+        if numpy is not None:
+            numpy.frombuffer(self.amounts, dtype=numpy.float64)[lo:hi] *= factor
+            numpy.frombuffer(self.int_flags, dtype=numpy.uint8)[lo:hi] = 0
+        else:
+            self.amounts[lo:hi] = array("d", map(float(factor).__mul__, self.amounts[lo:hi]))
+            self.int_flags[lo:hi] = array("B", bytes(hi - lo))
+
+    def to_metric(self, recipe:int=None):
+        """Converts every convertible amount to ml or gram, like IngredientAmount.convert_metric"""
+        base_codes = array("H", range(len(self.unit_names)))
+        factors = array("d", [1.0]*len(self.unit_names))
+        for code, dim in enumerate(self.dims):
+            if dim != self.NONE:
+                base_id = UNITS.base_ids[dim]
+                #canonical units are registered first, so their code is their ID
+                base_codes[code] = base_id
+                factors[code] = UNITS.factors[self.unit_ids[code]][base_id]
+        self.apply_unit_map(base_codes, factors, recipe)
+
+    def convert(self, dest_unit:str, density:float=1, recipe:int=None):
+        """Converts every convertible amount to dest_unit, going between volume
+        and mass through density (g/ml). Non-convertible rows are left alone.
+        Returns False if dest_unit isn't a convertible unit.
+        """
+        dest_id = UNITS.lookup(dest_unit)
+        if dest_id is None:
+            return False
+        dest_codes = array("H", range(len(self.unit_names)))
+        factors = array("d", [1.0]*len(self.unit_names))
+        for code, dim in enumerate(self.dims):
+            if dim == self.NONE:
+                continue
+            dest_codes[code] = dest_id
+            factors[code] = UNITS.factor(self.unit_ids[code], dest_id, density)
+        self.apply_unit_map(dest_codes, factors, recipe)
+        return True
+
+    def apply_unit_map(self, code_map:array, factors:array, recipe:int=None):
+        """For every row in a convertible unit: amount *= factors[unit], unit = code_map[unit].
+        Rows in non-convertible units are left untouched.
+        """
+        lo, hi = self.row_range(recipe)
+        #only unit codes that existed when the maps were built are in the table
+        if numpy is not None:
+            units = numpy.frombuffer(self.units, dtype=numpy.uint16)[lo:hi]
+            amounts = numpy.frombuffer(self.amounts, dtype=numpy.float64)[lo:hi]
+            flags = numpy.frombuffer(self.int_flags, dtype=numpy.uint8)[lo:hi]
+            np_map = numpy.frombuffer(code_map, dtype=numpy.uint16)
+            np_factors = numpy.frombuffer(factors, dtype=numpy.float64)
+            np_dims = numpy.frombuffer(self.dims, dtype=numpy.uint8)[:len(code_map)]
+            touched = np_dims[units] != self.NONE
+            amounts[touched] *= np_factors[units[touched]]
+            flags[touched] = 0
+            units[:] = np_map[units]
+        else:
+            amounts = self.amounts
+            units = self.units
+            flags = self.int_flags
+            dims = self.dims
+            for row in range(lo, hi):
+                code = units[row]
+                if dims[code] != self.NONE:
+                    amounts[row] *= factors[code]
+                    units[row] = code_map[code]
+                    flags[row] = 0
+
+    def scale_recipes(self, factors):
+        """Multiplies the amounts of each recipe by its own factor, factors[i] for recipe i"""
+        if len(self.names) == 0:
+            return
+        if numpy is not None:
+            counts = numpy.diff(numpy.frombuffer(self.offsets, dtype=self.offsets.typecode)).astype(numpy.intp)
+            row_factors = numpy.repeat(numpy.asarray(factors, dtype=numpy.float64), counts)
+            numpy.frombuffer(self.amounts, dtype=numpy.float64)[:] *= row_factors
+            numpy.frombuffer(self.int_flags, dtype=numpy.uint8)[row_factors != 1] = 0
+        else:
+            for recipe, factor in enumerate(factors):
+                if factor != 1:
+                    self.scale(factor, recipe)
+
+    def totals(self):
+        """Sums the rows with the same ingredient name, ignoring case and spacing, and the same unit.
+        Convert first (to_metric) so that units of a dimension add up.
+        Returns a dict of name:{unit:amount}, with names as first spelled.
+        """
+        #K:V = name as spelled:name as first spelled, so each spelling is normalized once
+        spellings = {}
+        normalized = {}
+        sums = {}
+        unit_keys = [" ".join(unit.lower().split()) for unit in self.unit_names]
+        amounts = self.amounts
+        units = self.units
+        for row, name in enumerate(self.names):
+            display = spellings.get(name)
+            if display is None:
+                key = " ".join(name.lower().split())
+                display = spellings[name] = normalized.setdefault(key, name)
+            by_unit = sums.get(display)
+            if by_unit is None:
+                by_unit = sums[display] = {}
+            unit = unit_keys[units[row]]
+            by_unit[unit] = by_unit.get(unit, 0.0) + amounts[row]
+        return sums
@@ -0,0 +1,23 @@
+"""Command line options of app.py"""
+import sys
+import subprocess
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+
+class BatchOptionsTest(unittest.TestCase):
+    def run_app(self, *args):
+        return subprocess.run([sys.executable, str(ROOT/"app.py"), "-b", *args],
+            cwd=ROOT, capture_output=True, text=True)
+
+    def test_bad_jobs(self):
+        for jobs in ("x", "0", "-2", "1.5"):
+            result = self.run_app("--batch", "missing.txt", "-j", jobs)
+            self.assertEqual(result.returncode, 2, jobs)
+            self.assertIn("positive whole number", result.stderr)
+            self.assertNotIn("Traceback", result.stderr)
+
+if __name__ == "__main__":
+    unittest.main()
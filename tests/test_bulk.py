@@ -0,0 +1,51 @@
+"""Bulk conversion of recipe trees"""
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import bulk
+from recipe import Recipe
+
+class BulkTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        for name in ("a.json", "b.json"):
+            shutil.copy(ROOT/"bread.json", self.dir/name)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def convert(self, out_root:Path=None):
+        return bulk.bulk_convert(self.dir, "scale", 2, out_root, jobs=1, out=lambda line: None)
+
+    def test_output_tree_under_root(self):
+        out_root = self.dir/"out"
+        for _ in range(2):
+            counts, failures = self.convert(out_root)
+            self.assertEqual(counts, {bulk.DONE: 2, bulk.SKIPPED: 0, bulk.FAILED: 0})
+            self.assertEqual(failures, [])
+        self.assertEqual(sorted(path.name for path in out_root.iterdir() if not path.name.startswith(".")),
+            ["a.json", "b.json"])
+        yeast = Recipe(self.dir/"a.json").ingredients["yeast"].amount
+        self.assertEqual(Recipe(out_root/"a.json").ingredients["yeast"].amount, yeast*2)
+
+    def test_in_place_drops_journal(self):
+        my_recipe = Recipe(self.dir/"a.json")
+        yeast = my_recipe.ingredients["yeast"].amount
+        my_recipe.cli_scale(2)
+        my_recipe.cli_add_step("extra")
+        my_recipe.save()
+        steps = len(my_recipe.steps)
+        self.convert()
+        saved = Recipe(self.dir/"a.json")
+        self.assertEqual(saved.ingredients["yeast"].amount, yeast*4)
+        self.assertEqual(len(saved.steps), steps)
+
+if __name__ == "__main__":
+    unittest.main()
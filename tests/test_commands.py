@@ -0,0 +1,134 @@
+"""Tokenizing command lines and looking commands up"""
+import io
+import sys
+import shutil
+import tempfile
+import contextlib
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from commands import tokenize, words_of, Param, CommandRegistry, UsageError, REST, ARGS
+from frontend import Frontend
+
+class TokenizeTest(unittest.TestCase):
+    def test_plain_words(self):
+        self.assertEqual(tokenize("add ingredient flour 2 cup\n"), (["add", "ingredient", "flour", "2", "cup"], ""))
+        #without a newline the last word is the rest
+        self.assertEqual(tokenize("open a.json"), (["open"], "a.json"))
+        self.assertEqual(tokenize("   \n"), ([], "   \n"))
+
+    def test_quoted(self):
+        tokens, rest = tokenize('add ingredient "canola oil" 2 tbsp\n')
+        self.assertEqual(tokens, ["add", "ingredient", "canola oil", "2", "tbsp"])
+        self.assertEqual(rest, "")
+        tokens, rest = tokenize("open 'my recipe.json'\n")
+        self.assertEqual(tokens, ["open", "my recipe.json"])
+
+    def test_escaped(self):
+        tokens, _ = tokenize(r'set title "say \"hi\" \\ bye"' + "\n")
+        self.assertEqual(tokens, ["set", "title", r'say "hi" \ bye'])
+        tokens, _ = tokenize(r"set title 'it\'s'" + "\n")
+        self.assertEqual(tokens[-1], "it's")
+        #other backslashes are kept
+        tokens, _ = tokenize(r'open "a\b.json"' + "\n")
+        self.assertEqual(tokens[-1], r"a\b.json")
+
+    def test_unterminated_quote(self):
+        tokens, rest = tokenize('set title "Rye bread\n')
+        self.assertEqual(tokens, ["set", "title"])
+        self.assertEqual(rest, "Rye bread\n")
+
+    def test_words_of(self):
+        self.assertEqual(words_of(*tokenize("open a.json")), ["open", "a.json"])
+        self.assertEqual(words_of(*tokenize("ls \n")), ["ls"])
+
+class RegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = CommandRegistry()
+        @self.registry.command("scale", params=(Param("factor", float),))
+        def scale(owner, factor):
+            pass
+        @self.registry.command("add", "step", params=(Param("step", REST),))
+        def add_step(owner, step):
+            pass
+        @self.registry.command("ls", params=(Param("flags", ARGS),), aliases=("dir",))
+        def ls(owner, flags):
+            pass
+        @self.registry.command("help", params=(Param("command", required=False, default="all"),))
+        def help_command(owner, verb):
+            pass
+
+    def parse(self, line:str):
+        tokens, rest = tokenize(line)
+        cmd, start = self.registry.lookup(words_of(tokens, rest))
+        return cmd, cmd.parse(tokens, rest, start)
+
+    def test_lookup(self):
+        self.assertEqual(self.registry.lookup(["add", "step", "x"])[0].name, "add step")
+        self.assertEqual(self.registry.lookup(["add", "step"])[1], 2)
+        self.assertIs(self.registry.lookup(["dir"])[0], self.registry.lookup(["ls"])[0])
+
+    def test_unknown(self):
+        self.assertEqual(self.registry.lookup(["frobnicate"]), (None, 1))
+        self.assertEqual(self.registry.lookup(["add", "nothing"]), (None, 1))
+        self.assertEqual(self.registry.lookup([]), (None, 0))
+
+    def test_arguments(self):
+        self.assertEqual(self.parse("scale 2.5\n")[1], [2.5])
+        self.assertEqual(self.parse("add step mix it well")[1], ["mix it well"])
+        self.assertEqual(self.parse("ls -l 'a b'\n")[1], [["-l", "a b"]])
+        self.assertEqual(self.parse("help\n")[1], ["all"])
+
+    def test_missing_arguments(self):
+        for line in ("scale\n", "add step\n", "scale"):
+            with self.assertRaises(UsageError) as caught:
+                self.parse(line)
+            self.assertEqual(str(caught.exception), self.registry.lookup(line.split())[0].usage())
+        self.assertEqual(self.parse("ls\n")[1], [[]])
+
+    def test_not_a_number(self):
+        with self.assertRaises(ValueError):
+            self.parse("scale lots\n")
+
+class FrontendTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        shutil.copy(ROOT/"bread.json", self.dir/"a.json")
+        self.frontend = Frontend(self.dir)
+        self.frontend.interactive = False
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_command(self, cmd:str):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertTrue(self.frontend.interpret_command(cmd))
+        return output.getvalue()
+
+    def test_unknown_command(self):
+        self.assertIn("Command not recognized", self.run_command("frobnicate\n"))
+        self.run_command("open a.json\n")
+        self.assertIn("Command frobnicate not recognized", self.run_command("frobnicate\n"))
+
+    def test_unknown_noun(self):
+        self.run_command("open a.json\n")
+        output = self.run_command("get nothing\n")
+        self.assertIn("invalid get argument", output)
+        self.assertIn("title", output)
+
+    def test_usage_error(self):
+        self.assertIn("Missing arguments. usage: open", self.run_command("open\n"))
+        self.run_command("open a.json\n")
+        self.assertIn("Missing arguments. usage: set title", self.run_command("set title\n"))
+
+    def test_not_a_number(self):
+        self.run_command("open a.json\n")
+        self.assertIn("Expected numeric argument", self.run_command("scale lots\n"))
+
+if __name__ == "__main__":
+    unittest.main()
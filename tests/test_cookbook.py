@@ -0,0 +1,118 @@
+"""Cookbooks: tombstones, compaction and the sidecar index"""
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from cookbook import Cookbook
+from recipe import Recipe
+
+class CookbookTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.path = self.dir/"book.jsonl"
+        self.book = Cookbook(self.path)
+        self.bread = Recipe(ROOT/"bread.json")
+
+    def tearDown(self):
+        self.book.close()
+        shutil.rmtree(self.dir)
+
+    def fill(self, keys:list):
+        for key in keys:
+            self.bread.title = key
+            self.book.append(self.bread, key)
+
+    def reopened(self):
+        """The book as another process sees it, its index rebuilt from the data file"""
+        self.book.close()
+        self.book.index_path.unlink()
+        return Cookbook(self.path)
+
+    def test_tombstone_in_place(self):
+        self.fill(["a", "b", "c"])
+        size = self.path.stat().st_size
+        offsets = dict(self.book.offsets)
+        self.assertTrue(self.book.remove("b"))
+        self.assertFalse(self.book.remove("b"))
+        self.assertEqual(self.path.stat().st_size, size)
+        self.assertEqual(self.book.dead_bytes, offsets["b"][1])
+        #the other lines don't move
+        self.assertEqual(self.book.offsets, {"a": offsets["a"], "c": offsets["c"]})
+        #the tombstone is a line of the same length that still parses
+        offset, length = offsets["b"]
+        line = self.path.read_bytes()[offset:offset+length]
+        self.assertEqual(json.loads(line), {Cookbook.TOMBSTONE_KEY: True})
+        self.assertTrue(line.endswith(b"\n"))
+        rebuilt = self.reopened()
+        self.assertEqual(sorted(rebuilt.keys()), ["a", "c"])
+        self.assertEqual(rebuilt.dead_bytes, offsets["b"][1])
+        rebuilt.close()
+
+    def test_compact_offsets(self):
+        self.fill(["a", "b", "c", "d"])
+        lengths = {key:length for key, (_, length) in self.book.offsets.items()}
+        self.book.remove("a")
+        self.book.remove("c")
+        self.assertEqual(self.book.compact(), lengths["a"] + lengths["c"])
+        self.assertEqual(self.book.dead_bytes, 0)
+        self.assertEqual(self.book.offsets, {"b": [0, lengths["b"]], "d": [lengths["b"], lengths["d"]]})
+        self.assertEqual(self.path.stat().st_size, lengths["b"] + lengths["d"])
+        for key in ("b", "d"):
+            self.assertEqual(self.book.get(key).title, key)
+        self.assertEqual(self.reopened().offsets, self.book.offsets)
+
+    def test_rebuild_after_torn_append(self):
+        self.fill(["a", "b"])
+        with open(self.path, "ab") as outfile:
+            outfile.write(b'{"title": "c", "ingredi')
+        rebuilt = self.reopened()
+        self.assertEqual(sorted(rebuilt.keys()), ["a", "b"])
+        #the next append drops the torn line instead of gluing onto it
+        self.bread.title = "c"
+        rebuilt.append(self.bread, "c")
+        rebuilt.close()
+        again = self.reopened()
+        self.assertEqual(sorted(again.keys()), ["a", "b", "c"])
+        self.assertEqual(again.get("c").title, "c")
+        self.assertEqual(again.dead_bytes, 0)
+        again.close()
+
+    def test_duplicate_keys(self):
+        self.fill(["a", "b"])
+        first = self.book.offsets["a"]
+        self.bread.cli_set_title("a again")
+        self.book.append(self.bread, "a")
+        self.assertEqual(len(self.book), 2)
+        self.assertEqual(self.book.get("a").title, "a again")
+        self.assertEqual(self.book.dead_bytes, first[1])
+        #a copy appended without tombstoning the older one, as a crash between the two would leave
+        with open(self.path, "ab") as outfile:
+            record = self.bread.get_dict()
+            record["title"] = "b again"
+            record[Cookbook.KEY_KEY] = "b"
+            outfile.write((json.dumps(record) + "\n").encode("utf-8"))
+        rebuilt = self.reopened()
+        self.assertEqual(len(rebuilt), 2)
+        self.assertEqual(rebuilt.get("b").title, "b again")
+        self.assertEqual(rebuilt.dead_bytes, first[1] + self.book.offsets["b"][1])
+        self.assertEqual(sorted(key for key, _ in rebuilt.items()), ["a", "b"])
+        rebuilt.close()
+
+    def test_other_writer_seen(self):
+        self.fill(["a"])
+        other = Cookbook(self.path)
+        self.bread.title = "b"
+        other.append(self.bread, "b")
+        other.close()
+        self.book.remove("a")
+        self.assertEqual(list(self.book.keys()), ["b"])
+
+if __name__ == "__main__":
+    unittest.main()
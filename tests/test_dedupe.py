@@ -0,0 +1,41 @@
+"""Finding near-duplicate recipes"""
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from cookbook import Cookbook
+from dedupe import find_duplicates
+from recipe import Recipe
+
+class DedupeTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        bread = Recipe(ROOT/"bread.json")
+        book = Cookbook(self.dir/"book.jsonl")
+        book.append(bread, "a")
+        bread.cli_add_step("let it cool")
+        book.append(bread, "b")
+        book.close()
+        shutil.copy(ROOT/"bread.json", self.dir/"c.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_caches_hidden(self):
+        for _ in range(2):
+            groups, count = find_duplicates([self.dir, self.dir/"book.jsonl"], self.dir)
+            self.assertEqual(count, 3)
+            self.assertEqual(len(groups), 1)
+            self.assertEqual(len(groups[0]), 3)
+        visible = sorted(path.name for path in self.dir.iterdir() if not path.name.startswith("."))
+        self.assertEqual(visible, ["book.jsonl", "book.jsonl.idx", "c.json"])
+        self.assertTrue((self.dir/".book.jsonl.rcpdedupe.json").exists())
+
+if __name__ == "__main__":
+    unittest.main()
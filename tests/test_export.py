@@ -0,0 +1,48 @@
+"""Exporting recipes and cookbooks as Markdown and HTML"""
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import export
+from recipe import Recipe
+from cookbook import Cookbook
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.book_path = self.dir/"book.jsonl"
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def add(self, title:str):
+        my_recipe = Recipe(ROOT/"bread.json")
+        my_recipe.cli_set_title(title)
+        book = Cookbook(self.book_path)
+        book.append(my_recipe)
+        book.close()
+
+    def test_cookbook_changed_between_exports(self):
+        """Books aren't kept open across exports in one process"""
+        out_root = self.dir/"out"
+        for titles in (["one"], ["one", "two"], ["one", "two", "three"]):
+            self.add(titles[-1])
+            counts, failures = export.export_recipes(self.book_path, out_root, jobs=1)
+            self.assertEqual(failures, [])
+            self.assertEqual(counts[export.DONE], len(titles))
+        book = Cookbook(self.book_path)
+        book.compact()
+        book.close()
+        counts, failures = export.export_recipes(self.book_path, out_root, (export.HTML,), jobs=1)
+        self.assertEqual((counts[export.DONE], failures), (3, []))
+        with open(out_root/"three.md") as infile:
+            self.assertIn("three", infile.read())
+
+if __name__ == "__main__":
+    unittest.main()
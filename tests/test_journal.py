@@ -0,0 +1,140 @@
+"""Journaled saves: replaying, torn writes and compaction"""
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from journal import Journal
+from recipe import Recipe
+
+def amounts(my_recipe:Recipe):
+    return {ingr:amt.get_tuple() for ingr, amt in my_recipe.ingredients.items()}
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.path = self.dir/"a.json"
+        shutil.copy(ROOT/"bread.json", self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def assert_replays(self, my_recipe:Recipe):
+        self.assertEqual(my_recipe.save(), Recipe.SAVE_JOURNAL)
+        loaded = Recipe(self.path)
+        self.assertEqual(amounts(loaded), amounts(my_recipe))
+        self.assertEqual(loaded.get_dict(), my_recipe.get_dict())
+        return loaded
+
+    def test_scale_and_metric(self):
+        my_recipe = Recipe(self.path)
+        my_recipe.cli_scale(2)
+        my_recipe.cli_to_metric()
+        my_recipe.cli_scale(0.5)
+        self.assert_replays(my_recipe)
+
+    def test_metric_one_ingredient(self):
+        my_recipe = Recipe(self.path)
+        my_recipe.cli_scale(3)
+        my_recipe.cli_to_metric("flour")
+        self.assert_replays(my_recipe)
+
+    def test_pinned_ingredients(self):
+        """Ingredients added under a view keep their amounts as given through later scaling"""
+        my_recipe = Recipe(self.path)
+        my_recipe.cli_scale(2)
+        my_recipe.cli_to_metric()
+        my_recipe.cli_add_ingredient("honey", 2, "tbsp")
+        my_recipe.cli_to_metric()
+        my_recipe.cli_scale(3)
+        loaded = self.assert_replays(my_recipe)
+        self.assertEqual(loaded.ingredients["honey"].amount, my_recipe.ingredients["honey"].amount)
+
+    def test_saves_accumulate(self):
+        my_recipe = Recipe(self.path)
+        for factor in (2, 3):
+            my_recipe.cli_scale(factor)
+            self.assert_replays(my_recipe)
+        self.assertEqual(Journal(self.path).read_ops(), [["cli_scale", 2], ["cli_scale", 3]])
+
+class TornTailTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.journal = Journal(self.dir/"a.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def tear(self, text:str):
+        with open(self.journal.path, "a") as outfile:
+            outfile.write(text)
+
+    def test_torn_line_ignored(self):
+        self.journal.append([["cli_scale", 2]])
+        self.tear('[["cli_set_title", "Ha')
+        self.assertEqual(self.journal.read_ops(), [["cli_scale", 2]])
+
+    def test_append_truncates_torn_line(self):
+        self.journal.append([["cli_scale", 2]])
+        self.tear('[["cli_set_title", "Ha')
+        self.journal.append([["cli_scale", 3]])
+        self.assertEqual(self.journal.read_ops(), [["cli_scale", 2], ["cli_scale", 3]])
+        self.assertEqual(self.journal.path.read_text().count("\n"), 2)
+
+    def test_only_torn_line(self):
+        self.tear("[")
+        self.assertEqual(self.journal.read_ops(), [])
+        self.journal.append([["cli_scale", 2]])
+        self.assertEqual(self.journal.read_ops(), [["cli_scale", 2]])
+
+class CompactTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.path = self.dir/"a.json"
+        shutil.copy(ROOT/"bread.json", self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def edited(self):
+        my_recipe = Recipe(self.path)
+        my_recipe.cli_scale(2)
+        my_recipe.cli_to_metric()
+        my_recipe.cli_add_ingredient("honey", 2, "tbsp")
+        my_recipe.cli_set_title("Honey Bread")
+        my_recipe.cli_add_step("glaze")
+        my_recipe.save()
+        return my_recipe
+
+    def test_compact_keeps_state(self):
+        my_recipe = self.edited()
+        before = Recipe(self.path).get_dict()
+        self.assertTrue(my_recipe.compact())
+        self.assertFalse(Journal(self.path).exists())
+        self.assertEqual(Recipe(self.path).get_dict(), before)
+
+    def test_long_journal_rewrites(self):
+        my_recipe = self.edited()
+        while my_recipe.journal_ops + 1 < Recipe.COMPACT_OPS:
+            my_recipe.cli_add_step("knead")
+            self.assertEqual(my_recipe.save(), Recipe.SAVE_JOURNAL)
+        my_recipe.cli_scale(2)
+        self.assertEqual(my_recipe.save(), Recipe.SAVE_FULL)
+        self.assertFalse(Journal(self.path).exists())
+        self.assertEqual(Recipe(self.path).get_dict(), my_recipe.get_dict())
+
+    def test_stale_compact_does_nothing(self):
+        my_recipe = self.edited()
+        other = Recipe(self.path)
+        other.cli_set_title("Other")
+        other.save()
+        self.assertFalse(my_recipe.compact())
+        self.assertEqual(Recipe(self.path).title, "Other")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Importing schema.org recipes from saved web pages"""
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import jsonld
+from recipe import Recipe
+
+RECIPE = {
+    "@context": "https://schema.org",
+    "@type": "Recipe",
+    "name": "Tomato &amp; Bean Soup",
+    "author": {"@type": "Person", "name": "Ann"},
+    "recipeYield": ["4", "4 servings"],
+    "recipeIngredient": [
+        "1 1/2 cups dried beans",
+        "½ tsp salt",
+        "2 (14 oz) cans tomatoes",
+        "1¼ Tablespoons olive oil",
+        "3 cloves garlic, minced",
+        "pepper to taste"
+    ],
+    "recipeInstructions": [
+        {"@type": "HowToSection", "name": "Beans", "itemListElement": [
+            {"@type": "HowToStep", "text": "Soak the beans <b>overnight</b> ."}
+        ]},
+        {"@type": "HowToStep", "text": "Simmer everything for 1 hour."}
+    ]
+}
+
+def page(*recipes, url="https://example.com/soup"):
+    document = json.dumps({"@graph": list(recipes)})
+    return (f'<html><head><link rel="canonical" href="{url}">'
+        f'<script type="application/ld+json">{document}</script></head></html>')
+
+class ImportTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.pages = self.dir/"pages"
+        self.pages.mkdir()
+        self.out = self.dir/"out"
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def import_all(self, source:Path=None):
+        results = list(jsonld.import_pages(self.pages if source is None else source, self.out, jobs=1))
+        self.assertTrue(all(status != jsonld.FAILED for _, status, _ in results), results)
+        return results
+
+    def test_fields(self):
+        (self.pages/"soup.html").write_text(page(RECIPE), encoding="utf-8")
+        self.import_all(self.pages/"soup.html")
+        my_recipe = Recipe(self.out/"soup.html.json")
+        self.assertEqual(my_recipe.title, "Tomato & Bean Soup")
+        amounts = {name:amt.get_tuple() for name, amt in my_recipe.ingredients.items()}
+        self.assertEqual(amounts, {
+            "dried beans": (1.5, "cup"),
+            "salt": (0.5, "tsp"),
+            "tomatoes (14 oz)": (2.0, "can"),
+            "olive oil": (1.25, "tbsp"),
+            "garlic, minced": (3.0, "clove"),
+            "pepper to taste": (0, "")
+        })
+        self.assertEqual(list(my_recipe.steps), ["Soak the beans overnight.", "Simmer everything for 1 hour."])
+        self.assertEqual(my_recipe.metadata[Recipe.META_AUTHOR], "Ann")
+        self.assertEqual(my_recipe.metadata[Recipe.META_SERVES], 4)
+        self.assertEqual(my_recipe.metadata[Recipe.META_SRCURL], "https://example.com/soup")
+
+    def test_names_dont_collide(self):
+        other = dict(RECIPE, name="Other Soup")
+        (self.pages/"a.html").write_text(page(RECIPE, other), encoding="utf-8")
+        (self.pages/"a.htm").write_text(page(dict(RECIPE, name="Htm Soup")), encoding="utf-8")
+        (self.pages/"a-2.html").write_text(page(dict(RECIPE, name="Dash Soup")), encoding="utf-8")
+        (self.pages/"sub").mkdir()
+        (self.pages/"sub"/"a.html").write_text(page(dict(RECIPE, name="Sub Soup")), encoding="utf-8")
+        (self.pages/"none.html").write_text("<html></html>", encoding="utf-8")
+        results = self.import_all()
+        self.assertEqual(sorted(status for _, status, _ in results),
+            sorted([jsonld.DONE]*4 + [jsonld.SKIPPED]))
+        titles = {path.relative_to(self.out).as_posix():Recipe(path).title for path in self.out.rglob("*.json")}
+        self.assertEqual(titles, {
+            "a.html.json": "Tomato & Bean Soup",
+            "a.html-2.json": "Other Soup",
+            "a.htm.json": "Htm Soup",
+            "a-2.html.json": "Dash Soup",
+            "sub/a.html.json": "Sub Soup"
+        })
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+"""Recipe file locks and concurrent saves.
+
+usage: python -m unittest discover tests   (or pytest tests)
+"""
+import io
+import sys
+import shutil
+import contextlib
+import tempfile
+import threading
+import subprocess
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from recipe import Recipe
+from frontend import Frontend
+from locking import FileLock, LockTimeout, SaveConflict
+
+def locked_elsewhere(path:Path):
+    """True if another process can't take path's lock right away"""
+    code = ("import sys; sys.path.insert(0, sys.argv[1]); from locking import FileLock, LockTimeout\n"
+        "try:\n    FileLock(sys.argv[2], timeout=0).acquire()\nexcept LockTimeout:\n    sys.exit(1)\n")
+    return subprocess.run([sys.executable, "-c", code, str(ROOT), str(path)]).returncode == 1
+
+class LockTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.path = self.dir/"a.json"
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_timeout(self):
+        with FileLock(self.path):
+            with self.assertRaises(LockTimeout):
+                FileLock(self.path, timeout=0.05).acquire()
+        #free again once released
+        with FileLock(self.path, timeout=0):
+            pass
+
+    def test_threads_exclude(self):
+        errors = []
+        def other():
+            try:
+                FileLock(self.path, timeout=0.05).acquire()
+            except LockTimeout as e:
+                errors.append(e)
+        with FileLock(self.path):
+            thread = threading.Thread(target=other)
+            thread.start()
+            thread.join()
+        self.assertEqual(len(errors), 1)
+
+    def test_processes_exclude(self):
+        with FileLock(self.path):
+            self.assertTrue(locked_elsewhere(self.path))
+        self.assertFalse(locked_elsewhere(self.path))
+
+    def test_release_keeps_other_locks(self):
+        """Releasing or failing to take one lock of a directory doesn't drop the others"""
+        other_path = self.dir/"b.json"
+        with FileLock(other_path):
+            with FileLock(self.path):
+                pass
+            with self.assertRaises(LockTimeout):
+                FileLock(other_path, timeout=0).acquire()
+            self.assertTrue(locked_elsewhere(other_path))
+
+class SaveTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.path = self.dir/"a.json"
+        shutil.copy(ROOT/"bread.json", self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_merging_saves(self):
+        ours = Recipe(self.path)
+        theirs = Recipe(self.path)
+        theirs.cli_set_title("Theirs")
+        theirs.save()
+        ours.cli_add_step("ours")
+        ours.save()
+        saved = Recipe(self.path)
+        self.assertEqual(saved.title, "Theirs")
+        self.assertEqual(saved.steps[-1], "ours")
+        self.assertEqual(len(saved.steps), len(Recipe(ROOT/"bread.json").steps) + 1)
+
+    def test_merging_after_compaction(self):
+        """The base is kept from the first change, so their rewriting the file doesn't lose it"""
+        ours = Recipe(self.path)
+        theirs = Recipe(self.path)
+        self.assertIsNone(ours.base_text)
+        ours.cli_add_step("ours")
+        theirs.cli_set_title("Theirs")
+        theirs.save()
+        self.assertTrue(theirs.compact())
+        ours.save()
+        saved = Recipe(self.path)
+        self.assertEqual(saved.title, "Theirs")
+        self.assertEqual(saved.steps[-1], "ours")
+        self.assertIsNone(ours.base_text)
+
+    def test_conflicting_saves(self):
+        ours = Recipe(self.path)
+        theirs = Recipe(self.path)
+        theirs.cli_set_title("Theirs")
+        theirs.save()
+        ours.cli_set_title("Ours")
+        with self.assertRaises(SaveConflict) as caught:
+            ours.save()
+        self.assertEqual(caught.exception.fields, ["title"])
+        #nothing is lost: the file keeps their title and ours is still unsaved
+        self.assertEqual(Recipe(self.path).title, "Theirs")
+        self.assertTrue(ours.modified)
+        self.assertEqual(ours.pending, [["cli_set_title", "Ours"]])
+
+    def test_save_waits_for_lock(self):
+        my_recipe = Recipe(self.path)
+        my_recipe.cli_set_title("Mine")
+        with FileLock(self.path):
+            FileLock.TIMEOUT, timeout = 0.05, FileLock.TIMEOUT
+            try:
+                with self.assertRaises(LockTimeout):
+                    my_recipe.save()
+            finally:
+                FileLock.TIMEOUT = timeout
+        self.assertEqual(my_recipe.save(), Recipe.SAVE_JOURNAL)
+        self.assertEqual(Recipe(self.path).title, "Mine")
+
+class FrontendSaveTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        for name in ("a.json", "b.json"):
+            shutil.copy(ROOT/"bread.json", self.dir/name)
+        self.output = io.StringIO()
+        with contextlib.redirect_stdout(self.output):
+            self.ours, self.theirs = Frontend(self.dir), Frontend(self.dir)
+            for frontend in (self.ours, self.theirs):
+                frontend.interactive = False
+                frontend.interpret_command("open a.json")
+            self.theirs.interpret_command("set title Theirs")
+            self.theirs.interpret_command("save")
+            self.ours.interpret_command("set title Ours")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_command(self, cmd:str):
+        with contextlib.redirect_stdout(self.output):
+            self.ours.interpret_command(cmd)
+
+    def test_conflict_stays_unsaved(self):
+        self.run_command("save")
+        self.assertTrue(self.ours.my_recipe.modified)
+        self.run_command("close")
+        self.assertEqual(self.ours.my_recipe.title, "Ours")
+
+    def test_eviction_keeps_unsaved(self):
+        self.ours.recipes.capacity = 1
+        self.run_command("open b.json")
+        session = self.ours.sessions["a.json"]
+        self.assertIn("a.json", self.ours.recipes)
+        self.assertEqual(session.recipe.pending, [["cli_set_title", "Ours"]])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""Compiling scripts into plans and running them"""
+import io
+import sys
+import shutil
+import tempfile
+import contextlib
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from frontend import Frontend
+from plan import Plan, PlanError
+
+class CompileTest(unittest.TestCase):
+    def test_errors_reported_together(self):
+        lines = ["frobnicate\n", "open\n", "ls\n", "open a.json\n", "scale lots\n", "add step\n"]
+        with self.assertRaises(PlanError) as caught:
+            Plan.compile(lines, "s.txt")
+        errors = caught.exception.errors
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(errors[0], "s.txt:1: unknown file explorer command 'frobnicate'")
+        self.assertTrue(errors[1].startswith("s.txt:2: missing arguments, usage: open"))
+        self.assertTrue(errors[2].startswith("s.txt:5: expected a number"))
+        self.assertTrue(errors[3].startswith("s.txt:6: missing arguments, usage: add step"))
+
+    def test_modes_follow_open_and_close(self):
+        with self.assertRaises(PlanError) as caught:
+            Plan.compile(["open a.json\n", "close\n", "scale 2\n"])
+        self.assertIn("unknown file explorer command 'scale", caught.exception.errors[0])
+
+    def test_repeated_saves_collapse(self):
+        plan = Plan.compile(["open a.json\n", "save\n", "save\n", "save b.json\n", "save b.json\n",
+            "scale 2\n", "save b.json\n", "close\n"])
+        self.assertEqual([step.lineno for step in plan.steps], [1, 2, 4, 6, 7, 8])
+
+class RunTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        for name in ("a.json", "b.json"):
+            shutil.copy(ROOT/"bread.json", self.dir/name)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_plan(self, plan:Plan):
+        frontend = Frontend(self.dir)
+        frontend.interactive = False
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            plan.run(frontend)
+        return output.getvalue()
+
+    def test_run_twice(self):
+        """Handlers that consume their arguments don't empty the plan's"""
+        plan = Plan.compile(["ls -l\n", "bulk scale 2 a.json -o out -j 1\n"])
+        first = self.run_plan(plan)
+        second = self.run_plan(plan)
+        self.assertIn("R - a.json", second)
+        self.assertNotIn("usage", second)
+        self.assertEqual(first.count("converted"), second.count("converted"))
+        self.assertEqual(plan.steps[0].args, [["-l"]])
+
+if __name__ == "__main__":
+    unittest.main()
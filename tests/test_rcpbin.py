@@ -0,0 +1,50 @@
+"""The binary recipe format"""
+import sys
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import rcpbin
+from recipe import Recipe
+
+class RoundTripTest(unittest.TestCase):
+    def round_trip(self, my_recipe:Recipe):
+        loaded = rcpbin.loads(rcpbin.dumps(my_recipe))
+        self.assertEqual(loaded.get_dict(), my_recipe.get_dict())
+        return loaded
+
+    def test_bread(self):
+        self.round_trip(Recipe(ROOT/"bread.json"))
+
+    def test_value_types(self):
+        my_recipe = Recipe()
+        my_recipe.cli_add_ingredient("flour", 500, "g")
+        my_recipe.cli_add_ingredient("salt", 7.5, "g")
+        my_recipe.cli_add_ingredient("eggs", 2, "")
+        my_recipe.cli_add_step("mix")
+        my_recipe.metadata.update({"rating": 4.5, "vegan": True, "notes": None, "tags": ["bread", "easy"]})
+        loaded = self.round_trip(my_recipe)
+        self.assertIs(type(loaded.ingredients["flour"].amount), int)
+        self.assertIs(type(loaded.ingredients["salt"].amount), float)
+        self.assertIs(loaded.metadata["vegan"], True)
+
+    def test_nul_in_strings(self):
+        my_recipe = Recipe()
+        my_recipe.cli_add_step("a\0b")
+        my_recipe.cli_add_step("")
+        self.round_trip(my_recipe)
+
+    def test_empty(self):
+        self.round_trip(Recipe())
+
+    def test_truncated(self):
+        data = rcpbin.dumps(Recipe(ROOT/"bread.json"))
+        for size in (4, rcpbin.HEADER.size, len(data) - 1):
+            with self.assertRaises(ValueError):
+                rcpbin.loads(data[:size])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""The full text index, shared by several processes"""
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from recipe import Recipe
+from textindex import TextIndex
+
+class SharedIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        for name in ("a.json", "b.json", "c.json"):
+            shutil.copy(ROOT/"bread.json", self.dir/name)
+        TextIndex(self.dir).refresh()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def retitle(self, name:str, title:str):
+        my_recipe = Recipe(self.dir/name)
+        my_recipe.cli_set_title(title)
+        my_recipe.save()
+
+    def test_interleaved_commits(self):
+        """Two indexes loaded before either commits both end up in the manifest"""
+        ours, theirs = TextIndex(self.dir), TextIndex(self.dir)
+        self.retitle("a.json", "Rye")
+        self.retitle("b.json", "Spelt")
+        theirs.update(self.dir/"b.json")
+        ours.update(self.dir/"a.json")
+        for index in (ours, TextIndex(self.dir)):
+            self.assertEqual(len(index), 3)
+            self.assertEqual([hit[0] for hit in index.search(["rye"])], ["a.json"])
+            self.assertEqual([hit[0] for hit in index.search(["spelt"])], ["b.json"])
+        theirs.close()
+        ours.close()
+
+    def test_same_recipe_twice(self):
+        """A recipe both index again is in the index once"""
+        ours, theirs = TextIndex(self.dir), TextIndex(self.dir)
+        self.retitle("c.json", "Rye")
+        theirs.update(self.dir/"c.json")
+        ours.update(self.dir/"c.json")
+        index = TextIndex(self.dir)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(len(index.search(["rye"])), 1)
+        for other in (ours, theirs, index):
+            other.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+"""Unit spellings and conversions"""
+import sys
+import unittest
+from pathlib import Path
+
+#the tests run from the repository root or from tests/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from units import UNITS, UnitRegistry
+
+class LookupTest(unittest.TestCase):
+    def test_aliases(self):
+        for spelling, name in (("cups", "cup"), ("Tablespoons", "tbsp"), ("  grams ", "gram"), ("g", "gram"),
+                ("fl oz", "fl.oz"), ("LB.", "lbs"), ("l", "liter"), ("kilo", "kg")):
+            self.assertEqual(UNITS.canonical(spelling), name, spelling)
+
+    def test_cased_aliases(self):
+        self.assertEqual(UNITS.canonical("T"), "tbsp")
+        self.assertEqual(UNITS.canonical("t"), "tsp")
+
+    def test_not_convertible(self):
+        for unit in ("", "pinch", "cloves", None, 2, 1.5, ["cup"], {"cup": 1}, b"cup"):
+            self.assertIsNone(UNITS.lookup(unit), unit)
+            self.assertEqual(UNITS.dimension(unit), UnitRegistry.NONE)
+        self.assertIsNone(UNITS.convert(1, ["cup"], "ml"))
+        self.assertIsNone(UNITS.to_metric(1, 3))
+
+    def test_conversions(self):
+        self.assertAlmostEqual(UNITS.convert(1, "cups", "ml"), 236.5875)
+        self.assertAlmostEqual(UNITS.convert(1, "kilogram", "g"), 1000)
+        #across dimensions through the density
+        self.assertAlmostEqual(UNITS.convert(100, "ml", "gram", 0.5), 50)
+        self.assertAlmostEqual(UNITS.convert(50, "gram", "ml", 0.5), 100)
+        amount, unit = UNITS.to_metric(2, "tablespoons")
+        self.assertAlmostEqual(amount, 2*14.7868)
+        self.assertEqual(unit, "ml")
+
+    def test_listing(self):
+        listing = dict(UNITS.units_of(UnitRegistry.VOLUME))
+        self.assertIn("cups", listing["cup"])
+        self.assertIn("T", listing["tbsp"])
+        self.assertNotIn("gram", listing)
+
+if __name__ == "__main__":
+    unittest.main()
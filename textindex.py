@@ -0,0 +1,563 @@
+import os
+import re
+import json
+import math
+import mmap
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+from recipe import Recipe
+from index import scan_recipes
+
+#numpy is optional, ranking falls back to dicts and sets without it
+try:
+    import numpy
+except ModuleNotFoundError:
+    numpy = None
+
+WORD = re.compile(r"\w+")
+
+def tokenize_text(text:str):
+    """Lowercased words, numbers split at punctuation so `8-10` is the two tokens 8 and 10"""
+    return WORD.findall(text.lower())
+
+class SegmentWriter:
+    """Postings of newly indexed recipes, in memory until written out as a segment.
+
+    Per term there are four uint32 arrays: the doc IDs having the term, in order,
+    the term's weight in each doc (occurrences weighted by field), the start of each
+    doc's positions, and the positions themselves.
+    """
+    def __init__(self):
+        #[doc ID, relative path, title, signature, length] of each doc
+        self.docs = []
+        #K:V = term:(docs, weights, position starts, positions)
+        self.postings = {}
+
+    def add(self, doc_id:int, rel:str, title:str, signature:list, fields:list):
+        """Adds one doc. fields is a list of (weight, list of texts); texts don't run into
+        each other, so phrases never match across two steps or from the title into a step."""
+        hits = {}
+        pos = 0
+        length = 0
+        for weight, texts in fields:
+            for text in texts:
+                tokens = WORD.findall(text.lower())
+                for token in tokens:
+                    hit = hits.get(token)
+                    if hit is None:
+                        hit = hits[token] = [0, []]
+                    hit[0] += weight
+                    hit[1].append(pos)
+                    pos += 1
+                length += len(tokens)
+                pos += TextIndex.GAP
+        for term, (weight, positions) in hits.items():
+            self.add_posting(term, doc_id, weight, positions)
+        self.docs.append([doc_id, rel, title, signature, length])
+
+    def add_posting(self, term:str, doc_id:int, weight:int, positions):
+        posting = self.postings.get(term)
+        if posting is None:
+            posting = self.postings[term] = (array("I"), array("I"), array("I", [0]), array("I"))
+        docs, weights, starts, all_positions = posting
+        docs.append(doc_id)
+        weights.append(weight)
+        all_positions.extend(positions)
+        starts.append(len(all_positions))
+
+    def renumber(self, first:int):
+        """Moves the doc IDs to start at first, when another process took the ones they got"""
+        if not self.docs or self.docs[0][0] == first:
+            return
+        shift = first - self.docs[0][0]
+        for doc in self.docs:
+            doc[0] += shift
+        for docs, _, _, _ in self.postings.values():
+            for i in range(len(docs)):
+                docs[i] += shift
+
+    def write(self, path:Path):
+        """Writes the segment: a JSON header line with the docs and each term's offset,
+        padded so the uint32 arrays after it are aligned, then the arrays."""
+        terms = {}
+        offset = 0
+        for term, (docs, weights, starts, positions) in self.postings.items():
+            terms[term] = [offset, len(docs), len(positions)]
+            offset += 4*(3*len(docs) + 1 + len(positions))
+        header = json.dumps({"docs": self.docs, "terms": terms}).encode("utf-8")
+        header += b" "*(-(len(header) + 1) % 4) + b"\n"
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as outfile:
+            outfile.write(header)
+            for docs, weights, starts, positions in self.postings.values():
+                for values in (docs, weights, starts, positions):
+                    outfile.write(values.tobytes())
+        os.replace(tmp_path, path)
+
+class Segment:
+    """A written segment, its arrays read straight out of a memory map"""
+    def __init__(self, path:Path):
+        self.path = path
+        with open(path, "rb") as infile:
+            header = infile.readline()
+            self.map = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        self.base = len(header)
+        my_dict = json.loads(header)
+        self.docs = my_dict["docs"]
+        #K:V = term:[offset, doc count, position count]
+        self.terms = my_dict["terms"]
+
+    def close(self):
+        self.map.close()
+
+    def read_array(self, offset:int, count:int):
+        values = array("I")
+        values.frombytes(self.map[self.base + offset:self.base + offset + 4*count])
+        return values
+
+    def postings(self, term:str):
+        """Returns the (docs, weights) arrays of a term, None if no doc of the segment has it"""
+        entry = self.terms.get(term)
+        if entry is None:
+            return None
+        offset, count, _ = entry
+        return self.read_array(offset, count), self.read_array(offset + 4*count, count)
+
+    def positions(self, term:str, i:int):
+        """Returns the positions of a term in the i-th doc of its postings"""
+        offset, count, _ = self.terms[term]
+        starts = self.base + offset + 8*count
+        start, end = struct.unpack_from("=II", self.map, starts + 4*i)
+        positions = starts + 4*(count + 1)
+        return array("I", self.map[positions + 4*start:positions + 4*end])
+
+    def read_all(self, term:str):
+        """Returns the (docs, weights, starts, positions) arrays of a term"""
+        offset, count, npos = self.terms[term]
+        docs, weights = self.postings(term)
+        starts = self.read_array(offset + 8*count, count + 1)
+        return docs, weights, starts, self.read_array(offset + 4*(3*count + 1), npos)
+
+class TextIndex:
+    """Persisted inverted index over the titles, ingredient names and steps of the recipes
+    under a directory, with positions for phrase queries and BM25 ranking.
+
+    The index is a list of immutable segments in `.rcptext/`, plus a manifest naming
+    the live segments and the deleted doc IDs. Indexing a changed recipe deletes its
+    old doc and writes a small new segment, so saving one recipe costs one recipe's
+    worth of writing; once there are more than MERGE_AT segments, the newest ones
+    are merged into one. Queries only read the postings of their own terms, from
+    memory maps.
+    """
+    DIR_NAME = ".rcptext"
+    MANIFEST = "manifest.json"
+    VERSION = 1
+
+    #term weight of a word in each field
+    TITLE_WEIGHT = 3
+    INGREDIENT_WEIGHT = 2
+    STEP_WEIGHT = 1
+    #positions skipped between two texts, more than any phrase is long
+    GAP = 64
+    MERGE_AT = 16
+    #share of deleted docs past which every segment is merged into one
+    COMPACT_AT = 0.25
+    #BM25 parameters
+    K1 = 1.2
+    B = 0.75
+
+    #fields of a doc
+    REL = 0
+    TITLE = 1
+    SIGNATURE = 2
+    LENGTH = 3
+
+    def __init__(self, root:Path):
+        self.root = Path(root)
+        self.dir = self.root/self.DIR_NAME
+        self.reset()
+        self.load()
+
+    def reset(self):
+        #K:V = segment file name:Segment, oldest first
+        self.segments = {}
+        #K:V = doc ID:[relative path, title, signature, length] of live docs
+        self.docs = {}
+        #K:V = relative path:doc ID
+        self.by_path = {}
+        self.deleted = set()
+        self.next_doc = 0
+        self.next_segment = 0
+        self.total_length = 0
+        self.lengths = None
+        #mtime of the manifest when it was last read or written
+        self.manifest_mtime = None
+
+    @classmethod
+    def exists_at(cls, root:Path):
+        return (Path(root)/cls.DIR_NAME/cls.MANIFEST).exists()
+
+    def __len__(self):
+        return len(self.docs)
+
+    #persistence
+
+    def load(self):
+        """Opens the segments of the manifest. A missing or broken index is just empty."""
+        try:
+            with open(self.dir/self.MANIFEST, "r") as infile:
+                self.manifest_mtime = os.fstat(infile.fileno()).st_mtime_ns
+                manifest = json.load(infile)
+            if manifest["version"] != self.VERSION:
+                return
+            for name in manifest["segments"]:
+                self.segments[name] = Segment(self.dir/name)
+        except (OSError, ValueError, KeyError, TypeError):
+            self.close()
+            self.segments = {}
+            return
+        self.next_doc = manifest["next_doc"]
+        self.next_segment = manifest["next_segment"]
+        self.deleted = set(manifest["deleted"])
+        for segment in self.segments.values():
+            self.add_docs(segment)
+
+    def add_docs(self, segment:Segment):
+        for doc_id, rel, title, signature, length in segment.docs:
+            if doc_id not in self.deleted:
+                self.docs[doc_id] = [rel, title, signature, length]
+                self.by_path[rel] = doc_id
+                self.total_length += length
+        self.lengths = None
+
+    def remove_doc(self, doc_id:int):
+        doc = self.docs.pop(doc_id)
+        del self.by_path[doc[self.REL]]
+        self.total_length -= doc[self.LENGTH]
+        self.deleted.add(doc_id)
+        self.lengths = None
+
+    def save_manifest(self):
+        manifest = {
+            "version": self.VERSION,
+            "segments": list(self.segments),
+            "next_doc": self.next_doc,
+            "next_segment": self.next_segment,
+            "deleted": sorted(self.deleted)
+        }
+        tmp_path = self.dir/(self.MANIFEST + ".tmp")
+        with open(tmp_path, "w") as outfile:
+            json.dump(manifest, outfile)
+        os.replace(tmp_path, self.dir/self.MANIFEST)
+        self.manifest_mtime = os.stat(self.dir/self.MANIFEST).st_mtime_ns
+
+    def is_stale(self):
+        """True if another process changed the index since it was loaded"""
+        try:
+            return os.stat(self.dir/self.MANIFEST).st_mtime_ns != self.manifest_mtime
+        except OSError:
+            return self.manifest_mtime is not None
+
+    def close(self):
+        for segment in self.segments.values():
+            segment.close()
+
+    def commit(self, writer:SegmentWriter, removed:list):
+        """Deletes docs and adds a writer's docs. The manifest is written last, so an
+        interrupted commit leaves the index as it was. The manifest's lock is held from
+        naming the segment to replacing the manifest, and what other processes committed
+        since the index was loaded is read in first."""
+        from locking import FileLock
+        if not writer.docs and not removed:
+            return
+        self.dir.mkdir(exist_ok=True)
+        with FileLock(self.dir/self.MANIFEST):
+            if self.is_stale():
+                removed = self.reload([self.docs[doc_id][self.REL] for doc_id in removed], writer)
+            self.commit_locked(writer, removed)
+
+    def reload(self, removed:list, writer:SegmentWriter):
+        """Loads the manifest again, keeping a writer's docs. Returns the doc IDs to delete
+        now for the relative paths removed and those the writer indexes again."""
+        self.close()
+        self.reset()
+        self.load()
+        writer.renumber(self.next_doc)
+        self.next_doc += len(writer.docs)
+        rels = set(removed)
+        rels.update(doc[1] for doc in writer.docs)
+        return sorted(self.by_path[rel] for rel in rels if rel in self.by_path)
+
+    def commit_locked(self, writer:SegmentWriter, removed:list):
+        """commit, with the manifest's lock held"""
+        for doc_id in removed:
+            self.remove_doc(doc_id)
+        if writer.docs:
+            name = f"{self.next_segment:08d}.seg"
+            self.next_segment += 1
+            writer.write(self.dir/name)
+            segment = self.segments[name] = Segment(self.dir/name)
+            self.add_docs(segment)
+        self.save_manifest()
+        if self.segments and len(self.deleted) > len(self.docs)*self.COMPACT_AT:
+            self.merge(list(self.segments))
+        elif len(self.segments) > self.MERGE_AT:
+            self.merge(list(self.segments)[-self.MERGE_AT:])
+
+    def rebuild(self):
+        """Drops the index and indexes every recipe again"""
+        from locking import FileLock
+        self.close()
+        if self.dir.exists():
+            with FileLock(self.dir/self.MANIFEST):
+                #the lock files stay, other processes may be waiting on them
+                for path in self.dir.iterdir():
+                    if not path.name.startswith("."):
+                        path.unlink()
+        self.reset()
+        return self.refresh()
+
+    def merge(self, names:list):
+        """Rewrites some consecutive segments as one, without their deleted docs.
+        Only called by commit_locked, with the manifest's lock held."""
+        merging = [self.segments[name] for name in names]
+        writer = SegmentWriter()
+        for segment in merging:
+            writer.docs.extend(doc for doc in segment.docs if doc[0] not in self.deleted)
+        terms = {}
+        for segment in merging:
+            for term in segment.terms:
+                terms[term] = None
+        for term in terms:
+            for segment in merging:
+                if term not in segment.terms:
+                    continue
+                docs, weights, starts, positions = segment.read_all(term)
+                for i, doc_id in enumerate(docs):
+                    if doc_id not in self.deleted:
+                        writer.add_posting(term, doc_id, weights[i], positions[starts[i]:starts[i+1]])
+        name = f"{self.next_segment:08d}.seg"
+        self.next_segment += 1
+        writer.write(self.dir/name)
+        merged_ids = set()
+        for segment in merging:
+            merged_ids.update(doc[0] for doc in segment.docs)
+        #keep the order of the segments, the merged one takes the place of the first
+        segments = {}
+        for old_name, segment in self.segments.items():
+            if old_name == names[0]:
+                segments[name] = Segment(self.dir/name)
+            if old_name not in names:
+                segments[old_name] = segment
+        self.segments = segments
+        self.deleted -= merged_ids
+        self.save_manifest()
+        for segment in merging:
+            segment.close()
+            try:
+                segment.path.unlink()
+            except OSError:
+                pass
+
+    #indexing
+
+    def signature(self, dir_entry, journal_entry=None):
+        stat = dir_entry.stat()
+        signature = [stat.st_mtime_ns, stat.st_size]
+        if journal_entry is not None:
+            journal_stat = journal_entry.stat()
+            signature.extend((journal_stat.st_mtime_ns, journal_stat.st_size))
+        return signature
+
+    def add_file(self, writer:SegmentWriter, rel:str, path:Path, signature:list):
+        """Indexes one recipe file. Unreadable files are added without any text,
+        so they are not read again until they change."""
+        doc_id = self.next_doc
+        self.next_doc += 1
+        try:
+            my_recipe = Recipe(path)
+            title = str(my_recipe.title)
+            fields = [
+                (self.TITLE_WEIGHT, [title]),
+                (self.INGREDIENT_WEIGHT, list(my_recipe.stored_ingredients.keys())),
+                (self.STEP_WEIGHT, [str(step) for step in my_recipe.steps])
+            ]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            title = ""
+            fields = []
+        writer.add(doc_id, rel, title, signature, fields)
+
+    def refresh(self):
+        """Brings the index up to date with the directory, reading only recipes whose
+        file or journal changed. Returns a tuple (files indexed, files dropped)"""
+        journals = {}
+        writer = SegmentWriter()
+        removed = []
+        seen = set()
+        for rel, dir_entry in list(scan_recipes(self.root, True, journals)):
+            seen.add(rel)
+            try:
+                signature = self.signature(dir_entry, journals.get(rel))
+            except OSError:
+                continue
+            doc_id = self.by_path.get(rel)
+            if doc_id is not None:
+                if self.docs[doc_id][self.SIGNATURE] == signature:
+                    continue
+                removed.append(doc_id)
+            self.add_file(writer, rel, Path(dir_entry.path), signature)
+        dropped = [doc_id for rel, doc_id in self.by_path.items() if rel not in seen]
+        self.commit(writer, removed + dropped)
+        return len(writer.docs), len(dropped)
+
+    def update(self, path:Path):
+        """Re-indexes one recipe file after it was saved. Returns False if it isn't under the root."""
+        try:
+            rel = Path(os.path.abspath(path)).relative_to(os.path.abspath(self.root)).as_posix()
+        except ValueError:
+            return False
+        if any(part.startswith(".") for part in rel.split("/")):
+            return False
+        journal_path = str(path) + ".journal"
+        writer = SegmentWriter()
+        removed = [] if rel not in self.by_path else [self.by_path[rel]]
+        try:
+            stat = os.stat(path)
+            signature = [stat.st_mtime_ns, stat.st_size]
+            if os.path.exists(journal_path):
+                journal_stat = os.stat(journal_path)
+                signature.extend((journal_stat.st_mtime_ns, journal_stat.st_size))
+        except OSError:
+            self.commit(writer, removed)
+            return True
+        self.add_file(writer, rel, Path(path), signature)
+        self.commit(writer, removed)
+        return True
+
+    #searching
+
+    def term_postings(self, term:str):
+        """Returns (docs, weights, bounds, segments) of a term over every segment, docs in order.
+        The postings of segments[i] start at bounds[i]."""
+        docs = array("I")
+        weights = array("I")
+        bounds = []
+        segments = []
+        for segment in self.segments.values():
+            postings = segment.postings(term)
+            if postings is not None:
+                bounds.append(len(docs))
+                segments.append(segment)
+                docs.extend(postings[0])
+                weights.extend(postings[1])
+        return docs, weights, bounds, segments
+
+    def length_array(self):
+        if self.lengths is None:
+            lengths = array("I", bytes(4*self.next_doc))
+            for doc_id, doc in self.docs.items():
+                lengths[doc_id] = doc[self.LENGTH]
+            self.lengths = lengths
+        return self.lengths
+
+    def idf(self, df:int):
+        """Inverse document frequency of a term in df live docs"""
+        count = len(self.docs)
+        return math.log(1 + (count - df + 0.5)/(df + 0.5))
+
+    def rank(self, postings:dict, limit:int):
+        """Generator, yields (doc ID, BM25 score) of the docs having every term, best first.
+        With numpy, only the best `limit` docs are sorted, then 4 times as many if the caller
+        wants more (phrases ruling docs out), so common terms don't sort the whole corpus."""
+        average = self.total_length/len(self.docs) if self.docs else 1.0
+        average = average or 1.0
+        k1, b = self.K1, self.B
+        terms = sorted(postings, key=lambda term: len(postings[term][0]))
+        if numpy is not None:
+            lengths = numpy.frombuffer(self.length_array(), dtype=numpy.uint32)
+            candidates = numpy.frombuffer(postings[terms[0]][0], dtype=numpy.uint32)
+            for term in terms[1:]:
+                candidates = numpy.intersect1d(candidates, numpy.frombuffer(postings[term][0], dtype=numpy.uint32),
+                    assume_unique=True)
+            deleted = numpy.fromiter(self.deleted, dtype=numpy.uint32)
+            if self.deleted:
+                candidates = candidates[~numpy.isin(candidates, deleted)]
+            norm = k1*(1 - b + b*lengths[candidates]/average)
+            scores = numpy.zeros(len(candidates))
+            for term in terms:
+                docs, weights = postings[term][0], postings[term][1]
+                np_docs = numpy.frombuffer(docs, dtype=numpy.uint32)
+                tf = numpy.frombuffer(weights, dtype=numpy.uint32)[numpy.searchsorted(np_docs, candidates)]
+                df = len(docs) - (int(numpy.isin(np_docs, deleted).sum()) if self.deleted else 0)
+                scores += self.idf(df)*tf*(k1 + 1)/(tf + norm)
+            done = 0
+            while done < len(scores):
+                if limit >= len(scores):
+                    best = numpy.argsort(-scores, kind="stable")
+                else:
+                    best = numpy.argpartition(-scores, limit)[:limit]
+                    best = best[numpy.argsort(-scores[best], kind="stable")]
+                best = best[done:]
+                yield from zip(candidates[best].tolist(), scores[best].tolist())
+                done = min(limit, len(scores))
+                limit *= 4
+            return
+        lengths = self.length_array()
+        weight_maps = {term: dict(zip(postings[term][0], postings[term][1])) for term in terms}
+        candidates = set(weight_maps[terms[0]])
+        for term in terms[1:]:
+            candidates.intersection_update(weight_maps[term])
+        candidates -= self.deleted
+        idfs = {term: self.idf(len(weight_maps[term].keys() - self.deleted)) for term in terms}
+        scored = []
+        for doc_id in sorted(candidates):
+            norm = k1*(1 - b + b*lengths[doc_id]/average)
+            score = 0.0
+            for term in terms:
+                tf = weight_maps[term][doc_id]
+                score += idfs[term]*tf*(k1 + 1)/(tf + norm)
+            scored.append((doc_id, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        yield from scored
+
+    def has_phrase(self, postings:dict, phrase:list, doc_id:int):
+        """True if the phrase's tokens are at consecutive positions in the doc"""
+        first = self.doc_positions(postings, phrase[0], doc_id)
+        others = [set(self.doc_positions(postings, term, doc_id)) for term in phrase[1:]]
+        return any(all(start + i + 1 in positions for i, positions in enumerate(others)) for start in first)
+
+    def doc_positions(self, postings:dict, term:str, doc_id:int):
+        docs, _, bounds, segments = postings[term]
+        i = bisect_left(docs, doc_id)
+        part = bisect_right(bounds, i) - 1
+        return segments[part].positions(term, i - bounds[part])
+
+    def search(self, words:list, phrases:list=(), limit:int=20):
+        """Returns up to limit (relative path, title, score) of the recipes having every word
+        and every phrase, best first. Words and phrases are tokenized like the recipes."""
+        phrases = [tokenize_text(phrase) for phrase in phrases]
+        phrases = [phrase for phrase in phrases if phrase]
+        terms = set()
+        for word in words:
+            terms.update(tokenize_text(word))
+        for phrase in phrases:
+            terms.update(phrase)
+        if not terms or not self.docs:
+            return []
+        postings = {}
+        for term in terms:
+            postings[term] = self.term_postings(term)
+            if len(postings[term][0]) == 0:
+                return []
+        results = []
+        long_phrases = [phrase for phrase in phrases if len(phrase) > 1]
+        for doc_id, score in self.rank(postings, limit):
+            if all(self.has_phrase(postings, phrase, doc_id) for phrase in long_phrases):
+                doc = self.docs[doc_id]
+                results.append((doc[self.REL], doc[self.TITLE], score))
+                if len(results) >= limit:
+                    break
+        return results
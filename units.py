@@ -0,0 +1,168 @@
+import sys
+
+#keys are lowercase, and some are abbreviated
+VOLUME_CONV:dict = {
+    "ml": 1,
+    "liter":1000,
+    "cup":236.5875,
+    "tbsp":14.7868,
+    "tsp":4.92892,
+    "fl.oz": 29.5735
+}
+
+MASS_CONV:dict = {
+    "gram":1 ,
+    "g":1 ,
+    "kg":1000,
+    "lbs": 453.592,
+    "oz":28.3495
+}
+
+#K:V = alias:canonical unit. Matched case-insensitively, after CASED_ALIASES.
+ALIASES:dict = {
+    "milliliter":"ml", "milliliters":"ml", "millilitre":"ml", "millilitres":"ml", "mls":"ml",
+    "l":"liter", "liters":"liter", "litre":"liter", "litres":"liter",
+    "cups":"cup", "c":"cup",
+    "tablespoon":"tbsp", "tablespoons":"tbsp", "tbs":"tbsp", "tbl":"tbsp", "tbsps":"tbsp",
+    "teaspoon":"tsp", "teaspoons":"tsp", "tsps":"tsp",
+    "fl oz":"fl.oz", "floz":"fl.oz", "fl. oz":"fl.oz", "fl.oz.":"fl.oz",
+    "fluid ounce":"fl.oz", "fluid ounces":"fl.oz",
+    "g":"gram", "grams":"gram", "gr":"gram", "gm":"gram", "gms":"gram",
+    "kilogram":"kg", "kilograms":"kg", "kgs":"kg", "kilo":"kg", "kilos":"kg",
+    "lb":"lbs", "lb.":"lbs", "lbs.":"lbs", "pound":"lbs", "pounds":"lbs",
+    "ounce":"oz", "ounces":"oz", "oz.":"oz",
+}
+
+#aliases where case matters, checked first
+CASED_ALIASES:dict = {
+    "T":"tbsp",
+    "t":"tsp",
+}
+
+class UnitRegistry:
+    """Maps unit spellings to canonical IDs and holds a dense src->dst factor table.
+
+    Volume and mass units convert into each other through a density in g/ml:
+    factor[src][dst] is the factor at density 1, and power[src][dst] is the
+    exponent the density is raised to (0 within a dimension, 1 volume to mass,
+    -1 mass to volume).
+
+    The tables are built the first time one of them is used, so importing
+    the module costs nothing for commands that never convert a unit.
+    """
+    NONE = 0
+    VOLUME = 1
+    MASS = 2
+
+    #what convert_metric produces for each dimension
+    BASE_UNIT = {VOLUME: "ml", MASS: "gram"}
+
+    #attributes build() makes
+    TABLES = frozenset(("names", "dims", "to_base", "ids", "cased_ids", "base_ids", "factors", "powers"))
+
+    def __init__(self, volume_conv:dict, mass_conv:dict, aliases:dict, cased_aliases:dict):
+        self.sources = (volume_conv, mass_conv, aliases, cased_aliases)
+
+    def __getattr__(self, name:str):
+        #only called for attributes that don't exist yet
+        if name in self.TABLES and "names" not in self.__dict__:
+            self.build(*self.sources)
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def build(self, volume_conv:dict, mass_conv:dict, aliases:dict, cased_aliases:dict):
+        #canonical names by ID, their dimension, and factor to the dimension's base unit
+        self.names = []
+        self.dims = []
+        self.to_base = []
+        #K:V = spelling:ID
+        self.ids = {}
+        self.cased_ids = {}
+
+        for dim, conv in ((self.VOLUME, volume_conv), (self.MASS, mass_conv)):
+            base = conv[self.BASE_UNIT[dim]]
+            for unit, factor in conv.items():
+                if unit in aliases:
+                    continue
+                self.ids[unit.lower()] = len(self.names)
+                self.names.append(sys.intern(unit))
+                self.dims.append(dim)
+                self.to_base.append(factor/base)
+        #aliases, including ones that are also keys of the conversion tables ("g")
+        for alias, unit in aliases.items():
+            self.ids[alias.lower()] = self.ids[unit]
+        for alias, unit in cased_aliases.items():
+            self.cased_ids[alias] = self.ids[unit]
+
+        self.base_ids = {dim: self.ids[unit] for dim, unit in self.BASE_UNIT.items()}
+
+        #dense tables, kept as the ratio of the source tables' factors so that
+        #conversions within a dimension match dividing the tables directly
+        raw = {}
+        for dim, conv in ((self.VOLUME, volume_conv), (self.MASS, mass_conv)):
+            for unit, factor in conv.items():
+                raw.setdefault(self.ids[unit.lower()], factor)
+        count = len(self.names)
+        self.factors = [[0.0]*count for _ in range(count)]
+        self.powers = [[0]*count for _ in range(count)]
+        for src in range(count):
+            for dst in range(count):
+                if self.dims[src] == self.dims[dst]:
+                    self.factors[src][dst] = raw[src]/raw[dst]
+                else:
+                    self.factors[src][dst] = self.to_base[src]/self.to_base[dst]
+                    self.powers[src][dst] = 1 if self.dims[src] == self.VOLUME else -1
+
+    def lookup(self, unit:str):
+        """Returns the canonical ID of a unit spelling, or None if it isn't convertible"""
+        #units come from recipe files too, where they can be numbers, lists or null
+        if not isinstance(unit, str):
+            return None
+        unit_id = self.cased_ids.get(unit)
+        if unit_id is None:
+            unit_id = self.ids.get(unit.strip().lower())
+        return unit_id
+
+    def canonical(self, unit:str):
+        """Returns the canonical spelling of a unit, or None if it isn't convertible"""
+        unit_id = self.lookup(unit)
+        return None if unit_id is None else self.names[unit_id]
+
+    def dimension(self, unit:str):
+        unit_id = self.lookup(unit)
+        return self.NONE if unit_id is None else self.dims[unit_id]
+
+    def factor(self, src_id:int, dst_id:int, density:float=1):
+        power = self.powers[src_id][dst_id]
+        if power == 0:
+            return self.factors[src_id][dst_id]
+        return self.factors[src_id][dst_id]*density**power
+
+    def convert(self, amt:float, src_unit:str, dest_unit:str, density:float=1):
+        """Returns amt converted from src_unit to dest_unit, or None if either isn't convertible"""
+        src_id = self.lookup(src_unit)
+        dst_id = self.lookup(dest_unit)
+        if src_id is None or dst_id is None:
+            return None
+        return amt*self.factor(src_id, dst_id, density)
+
+    def to_metric(self, amt:float, unit:str):
+        """Returns (amount, unit) in ml or gram, or None if the unit isn't convertible"""
+        unit_id = self.lookup(unit)
+        if unit_id is None:
+            return None
+        base_id = self.base_ids[self.dims[unit_id]]
+        return amt*self.factors[unit_id][base_id], self.names[base_id]
+
+    def units_of(self, dim:int):
+        """Returns a list of (canonical name, [aliases]) of one dimension"""
+        listing = []
+        for unit_id, name in enumerate(self.names):
+            if self.dims[unit_id] != dim:
+                continue
+            aliases = [alias for alias, alias_id in self.ids.items() if alias_id == unit_id and alias != name]
+            aliases.extend(alias for alias, alias_id in self.cased_ids.items() if alias_id == unit_id)
+            listing.append((name, aliases))
+        return listing
+
+UNITS = UnitRegistry(VOLUME_CONV, MASS_CONV, ALIASES, CASED_ALIASES)